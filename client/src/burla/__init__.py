@@ -228,6 +228,7 @@ def _release_head_for_job(handle: _HeadHandle):
 
 
 from burla._auth import login
+from burla._broadcast import broadcast
 from burla._deploy import deploy
 from burla._remote_parallel_map import remote_parallel_map
 
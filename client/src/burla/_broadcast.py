@@ -0,0 +1,92 @@
+import hashlib
+import mmap
+import threading
+from contextlib import contextmanager
+
+import cloudpickle
+
+from burla._frames import dump_frames, load_frames
+
+# Where nodes keep uploaded payloads, bind-mounted into every worker container
+# (see PAYLOAD_CACHE_DIR in node_service/job_endpoints.py).
+PAYLOAD_CACHE_DIR = "/worker_service_storage/payload_cache"
+
+# Values already loaded by this (worker) process, so every input sharing a
+# broadcast reuses one copy. Cleared by worker_server.py between jobs.
+_loaded_values = {}
+_collecting = threading.local()
+_NOT_LOADED = object()
+
+
+@contextmanager
+def collect_broadcasts():
+    """Yields a dict that fills with {hash: Broadcast} for every broadcast
+    pickled inside the block by this thread."""
+    _collecting.broadcasts = {}
+    try:
+        yield _collecting.broadcasts
+    finally:
+        _collecting.broadcasts = None
+
+
+def _load_broadcast(broadcast_hash: str):
+    broadcast = Broadcast.__new__(Broadcast)
+    broadcast.hash = broadcast_hash
+    broadcast.pickled = None
+    broadcast._value = _NOT_LOADED
+    return broadcast
+
+
+class Broadcast:
+    """Read-only value shared by every call of a job, see `burla.broadcast`."""
+
+    def __init__(self, value):
+        self.pickled = b"".join(dump_frames(value, cloudpickle))
+        self.hash = hashlib.sha256(self.pickled).hexdigest()
+        self._value = value
+
+    @property
+    def value(self):
+        if self._value is not _NOT_LOADED:
+            return self._value
+        if self.hash not in _loaded_values:
+            path = f"{PAYLOAD_CACHE_DIR}/{self.hash}.pkl"
+            try:
+                with open(path, "rb") as file:
+                    data = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+            except FileNotFoundError:
+                msg = "This broadcast was never uploaded to this node. "
+                msg += "Broadcasts must be referenced by the function passed to "
+                msg += "`remote_parallel_map`, not passed in as inputs."
+                raise RuntimeError(msg)
+            # Out-of-band buffers (numpy arrays) stay views of the mapped
+            # file: read-only, and shared through the page cache by every
+            # worker on the node instead of copied into each one.
+            _loaded_values[self.hash] = load_frames(data)
+        return _loaded_values[self.hash]
+
+    def __reduce__(self):
+        broadcasts = getattr(_collecting, "broadcasts", None)
+        if broadcasts is not None:
+            broadcasts[self.hash] = self
+        return _load_broadcast, (self.hash,)
+
+
+def broadcast(value) -> Broadcast:
+    """Wraps `value` so it is uploaded once per node instead of inside the
+    function or every input.
+
+    Reference the returned handle from the function passed to
+    `remote_parallel_map` and read it with `.value`: each worker loads it
+    from its node's disk the first time it is read, then reuses it for every
+    later input. Numpy arrays inside `value` are memory-mapped from that
+    file, so they are read-only on workers. Values referenced this way do not
+    count towards the 0.1GB function size limit.
+
+    Args:
+        value: Any picklable object, typically a large model or lookup table.
+
+    Returns:
+        A `Broadcast` handle whose `.value` is `value`.
+    """
+    return Broadcast(value)
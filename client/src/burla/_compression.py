@@ -0,0 +1,53 @@
+import lz4.frame
+import zstandard
+
+# Same codecs as node_service/helpers.py (keep them in sync). A compressed
+# body is labelled with its codec: the `compression` form field on uploads,
+# the `X-Burla-Compression` header on node responses. Anything unlabelled is
+# raw, so chunks under the threshold skip compression on either side.
+COMPRESSION_HEADER = "X-Burla-Compression"
+DEFAULT_LEVELS = {"zstd": 3, "lz4": 0}
+DEFAULT_COMPRESSION_THRESHOLD_BYTES = 64 * 1024
+
+
+def compress(data, codec: str, level: int) -> bytes:
+    if codec == "zstd":
+        return zstandard.ZstdCompressor(level=level).compress(data)
+    return lz4.frame.compress(data, compression_level=level)
+
+
+def decompress(data, codec: str) -> bytes:
+    if codec == "zstd":
+        return zstandard.ZstdDecompressor().decompress(data)
+    return lz4.frame.decompress(data)
+
+
+class Compression:
+    """A job's compression settings, sent to every node at assignment, plus
+    the bytes it saved in each direction."""
+
+    def __init__(self, codec: str, level: int | None, threshold_bytes: int):
+        self.codec = codec
+        self.level = DEFAULT_LEVELS[codec] if level is None else level
+        self.threshold_bytes = threshold_bytes
+        self.bytes_before = {"inputs": 0, "results": 0}
+        self.bytes_after = {"inputs": 0, "results": 0}
+
+    def settings(self) -> dict:
+        return {
+            "codec": self.codec,
+            "level": self.level,
+            "threshold_bytes": self.threshold_bytes,
+        }
+
+    def record(self, direction: str, n_bytes_before: int, n_bytes_after: int):
+        self.bytes_before[direction] += n_bytes_before
+        self.bytes_after[direction] += n_bytes_after
+
+    def summary(self) -> str:
+        summary = f"{self.codec} level {self.level} compressed"
+        for direction in ("inputs", "results"):
+            megabytes_before = self.bytes_before[direction] / 1_000_000
+            megabytes_after = self.bytes_after[direction] / 1_000_000
+            summary += f" {direction} {megabytes_before:.1f}MB to {megabytes_after:.1f}MB,"
+        return summary.rstrip(",")
@@ -0,0 +1,35 @@
+import pickle
+import struct
+
+# The one copy of the wire format: node_service/_frames.py is a symlink to this
+# file and worker containers get it mounted as `burla_frames`, so it only uses
+# the standard library. A frame count, every frame's length, then the frames.
+# Frame 0 is a protocol 5 pickle, the rest are its out-of-band buffers (numpy
+# arrays, arrow buffers, `PickleBuffer`s), so large buffers are never copied
+# into a pickle stream and unpickle as views of the bytes they arrived in.
+
+
+def dump_frames(obj, pickler=pickle) -> list:
+    """Header followed by frames, to be written out in order or joined."""
+    buffers = []
+    pickled = pickler.dumps(obj, protocol=5, buffer_callback=buffers.append)
+    frames = [pickled, *(buffer.raw() for buffer in buffers)]
+    lengths = [len(frame) for frame in frames]
+    header = struct.pack(f">I{len(frames)}Q", len(frames), *lengths)
+    return [header, *frames]
+
+
+def load_frames(data):
+    """Objects built on out-of-band buffers are views of `data`, so they are
+    only writable when `data` is (a bytearray, not bytes)."""
+    data = memoryview(data)
+    n_frames = struct.unpack_from(">I", data)[0]
+    lengths = struct.unpack_from(f">{n_frames}Q", data, 4)
+    offset = 4 + 8 * n_frames
+    frames = []
+    for length in lengths:
+        frames.append(data[offset : offset + length])
+        offset += length
+    if offset > len(data):
+        raise pickle.UnpicklingError("Frames truncated in transit.")
+    return pickle.loads(frames[0], buffers=frames[1:])
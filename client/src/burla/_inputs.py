@@ -0,0 +1,304 @@
+import asyncio
+import bisect
+import hashlib
+import math
+import os
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from threading import Lock
+from time import time
+from typing import Callable, Hashable, Iterable, Optional
+
+import cloudpickle
+
+from burla._frames import dump_frames
+
+# How far pickling may run ahead of the node uploads. Bounds client memory the
+# same way MAX_CHUNK_SIZE_BYTES bounds a single upload.
+MAX_PICKLED_BYTES_BUFFERED = 1_000_000 * 64  # 64MB
+# Most inputs one pickling batch takes; fewer when they're big (see
+# `InputStream._pickle_batch_size`).
+PICKLE_BATCH_SIZE = 64
+DEFAULT_SERIALIZATION_THREADS = min(8, os.cpu_count() or 1)
+# Points each node gets on the affinity ring: enough that keys split about
+# evenly between nodes, and a node joining or leaving only moves its share.
+AFFINITY_RING_POINTS_PER_NODE = 64
+
+
+def _ring_position(value) -> int:
+    digest = hashlib.blake2b(str(value).encode(), digest_size=8).digest()
+    return int.from_bytes(digest, "big")
+
+
+def _affinity_hash(key) -> int:
+    try:
+        return hash(key)
+    except TypeError:
+        msg = f"`affinity` must return a hashable key, not {type(key).__name__}: {key!r}"
+        raise TypeError(msg) from None
+
+
+def _finite_cost(value) -> float:
+    # NaN compares false both ways, which breaks the node's priority queue.
+    cost = float(value)
+    if not math.isfinite(cost):
+        raise ValueError(f"`cost` must return a finite number, not {value!r}.")
+    return cost
+
+
+def _pickle_inputs(
+    inputs_with_indicies: list,
+    affinity: Optional[Callable],
+    cost: Optional[Callable],
+):
+    started_at = time()
+    pickled = [
+        (input_index, b"".join(dump_frames(input_, cloudpickle)))
+        for input_index, input_ in inputs_with_indicies
+    ]
+    affinity_keys = None
+    if affinity:
+        affinity_keys = [
+            _ring_position(_affinity_hash(affinity(*input_)))
+            for _, input_ in inputs_with_indicies
+        ]
+    costs = None
+    if cost:
+        costs = [_finite_cost(cost(*input_)) for _, input_ in inputs_with_indicies]
+    return pickled, affinity_keys, costs, time() - started_at
+
+
+class InputStream:
+    """Hands `(input_index, input_pkl)` pairs to the node upload loops as they
+    ask for them, so the client only ever holds the inputs it is currently
+    pickling and uploading instead of the whole dataset.
+
+    With `affinity`, inputs are routed instead: consistent hashing of each
+    input's affinity key over the nodes uploading picks the one node whose
+    loop gets it, so inputs sharing a key (reading the same data) run on the
+    same machine.
+
+    With `cost`, each input's estimated cost goes to its node with it, which
+    starts the most expensive inputs first."""
+
+    def __init__(
+        self,
+        inputs: Iterable,
+        n_inputs_hint: Optional[int] = None,
+        affinity: Optional[Callable[..., Hashable]] = None,
+        cost: Optional[Callable[..., float]] = None,
+    ):
+        self._iterator = enumerate(inputs)
+        self._iterator_lock = Lock()
+        self._iterator_done = False
+        self._raw_pending = []  # pulled from the iterable, not yet pickled
+        self._n_pickling = 0
+        self._pickled = deque()
+        self._pickled_bytes = 0
+        self._returned = []  # popped, but didn't fit in the chunk being built
+        self.affinity = affinity
+        self._affinity_keys = {}  # input_index -> ring position of its key
+        self._ring = []  # sorted ring positions of the nodes' points
+        self._ring_nodes = {}  # ring position -> node instance name
+        self._routed = {}  # node instance name -> deque of its inputs
+        self.cost = cost
+        self._costs = {}  # input_index -> cost
+        self.n_consumed = 0
+        self.n_inputs_hint = n_inputs_hint
+        # Exact count; for unsized iterables this is unknown until exhausted.
+        self.n_inputs = len(inputs) if hasattr(inputs, "__len__") else None
+        self.pickle_thread_seconds = 0.0
+        self.pickle_wall_seconds = 0.0
+        self.n_pickled_bytes = 0
+        self.n_pickled_inputs = 0
+        self.n_upload_waits = 0
+
+    @property
+    def exhausted(self) -> bool:
+        nothing_buffered = not (self._raw_pending or self._pickled or self._returned)
+        nothing_buffered = nothing_buffered and not any(self._routed.values())
+        return self._iterator_done and nothing_buffered and self._n_pickling == 0
+
+    @property
+    def n_inputs_estimate(self) -> Optional[int]:
+        if self.n_inputs is not None:
+            return self.n_inputs
+        if self.n_inputs_hint is None:
+            return None
+        # A hint that turned out too small must not show more done than exist.
+        return max(self.n_inputs_hint, self.n_consumed)
+
+    def _take_raw(self, max_inputs: int) -> list:
+        batch = self._raw_pending[:max_inputs]
+        del self._raw_pending[:max_inputs]
+        while len(batch) < max_inputs and not self._iterator_done:
+            try:
+                input_index, input_ = next(self._iterator)
+            except StopIteration:
+                self._iterator_done = True
+                self.n_inputs = self.n_consumed
+                break
+            self.n_consumed += 1
+            args_tuple = input_ if isinstance(input_, tuple) else (input_,)
+            batch.append((input_index, args_tuple))
+        return batch
+
+    def is_empty(self) -> bool:
+        self._raw_pending.extend(self._take_raw(1))
+        return not self._raw_pending
+
+    def add_node(self, node_name: str):
+        """Puts a node that is starting to upload on the affinity ring."""
+        for point in range(AFFINITY_RING_POINTS_PER_NODE):
+            position = _ring_position(f"{node_name}-{point}")
+            bisect.insort(self._ring, position)
+            self._ring_nodes[position] = node_name
+        self._routed[node_name] = deque()
+        self._unroute()
+
+    def remove_node(self, node_name: str):
+        """Takes a node that stopped uploading off the ring, its inputs go to
+        the others."""
+        self._ring = [p for p in self._ring if self._ring_nodes[p] != node_name]
+        self._ring_nodes = {p: self._ring_nodes[p] for p in self._ring}
+        self._unroute()
+        del self._routed[node_name]
+
+    def _unroute(self):
+        # Back to the front of the line, to be routed over the changed ring.
+        for routed in self._routed.values():
+            self._pickled.extendleft(reversed(routed))
+            routed.clear()
+
+    def _route_pickled(self):
+        while self._pickled and self._ring:
+            input_with_index = self._pickled.popleft()
+            key_position = self._affinity_keys[input_with_index[0]]
+            ring_index = bisect.bisect(self._ring, key_position) % len(self._ring)
+            node_name = self._ring_nodes[self._ring[ring_index]]
+            self._routed[node_name].append(input_with_index)
+
+    def affinity_keys(self, input_chunk: list) -> Optional[list]:
+        """The affinity keys of an uploaded chunk's inputs, for its node."""
+        if not self.affinity:
+            return None
+        return [self._affinity_keys.pop(input_index) for input_index, _ in input_chunk]
+
+    def costs(self, input_chunk: list) -> Optional[list]:
+        """The costs of an uploaded chunk's inputs, for its node."""
+        if not self.cost:
+            return None
+        return [self._costs.pop(input_index) for input_index, _ in input_chunk]
+
+    def pop(self, node_name: str) -> Optional[tuple]:
+        if self.affinity:
+            return self._pop_routed(node_name)
+        if self._returned:
+            return self._returned.pop()
+        if self._pickled:
+            input_with_index = self._pickled.popleft()
+            self._pickled_bytes -= len(input_with_index[1])
+            return input_with_index
+        if not self.exhausted:
+            # An upload loop wanted more than pickling had ready.
+            self.n_upload_waits += 1
+        return None
+
+    def _pop_routed(self, node_name: str) -> Optional[tuple]:
+        self._route_pickled()
+        routed = self._routed[node_name]
+        if not routed and self._pickled_bytes >= MAX_PICKLED_BYTES_BUFFERED:
+            # Pickling waits for room the other nodes' inputs are taking up,
+            # so this node would stay idle: locality isn't worth that.
+            routed = max(self._routed.values(), key=len)
+        if routed:
+            input_with_index = routed.popleft()
+            self._pickled_bytes -= len(input_with_index[1])
+            return input_with_index
+        if not self.exhausted:
+            self.n_upload_waits += 1
+        return None
+
+    def push_back(self, input_with_index: tuple, node_name: str):
+        if self.affinity:
+            self._routed[node_name].appendleft(input_with_index)
+            self._pickled_bytes += len(input_with_index[1])
+            return
+        self._returned.append(input_with_index)
+
+    def _pickle_batch_size(self) -> int:
+        """A batch is only counted once it's all pickled, so it's sized by
+        bytes: as many inputs as fit under MAX_PICKLED_BYTES_BUFFERED at the
+        average pickled size so far, counting batches still pickling. One at a
+        time until that size is known, so a few huge inputs can't overshoot
+        the bound by a whole batch each."""
+        if not self.n_pickled_inputs:
+            return 1
+        average_bytes = self.n_pickled_bytes / self.n_pickled_inputs
+        room_bytes = MAX_PICKLED_BYTES_BUFFERED - self._pickled_bytes
+        room_bytes -= self._n_pickling * average_bytes
+        return max(0, min(PICKLE_BATCH_SIZE, int(room_bytes // average_bytes)))
+
+    def _take_and_pickle(self, max_inputs: int):
+        # A generator's items can be slow to produce (I/O, parsing), so they
+        # are pulled here on the pickling threads rather than on the event
+        # loop, one thread at a time: generators can't be advanced from two.
+        with self._iterator_lock:
+            batch = self._take_raw(max_inputs)
+        return _pickle_inputs(batch, self.affinity, self.cost)
+
+    async def serialize(self, n_threads: int):
+        """Pulls inputs from the iterable and pickles them on a thread pool
+        ahead of the node upload loops, so the event loop that also polls
+        results only moves finished bytes."""
+        loop = asyncio.get_running_loop()
+        executor = ThreadPoolExecutor(n_threads, thread_name_prefix="burla-pickle")
+        started_at = time()
+        in_flight = {}  # future -> how many inputs it may take
+        try:
+            while True:
+                while len(in_flight) < n_threads and not self._iterator_done:
+                    batch_size = self._pickle_batch_size()
+                    if not batch_size:
+                        break
+                    self._n_pickling += batch_size
+                    future = loop.run_in_executor(
+                        executor, self._take_and_pickle, batch_size
+                    )
+                    in_flight[future] = batch_size
+                if not in_flight:
+                    if self._iterator_done and not self._raw_pending:
+                        return
+                    await asyncio.sleep(0.01)
+                    continue
+                done, _ = await asyncio.wait(
+                    in_flight, return_when=asyncio.FIRST_COMPLETED
+                )
+                for future in done:
+                    self._n_pickling -= in_flight.pop(future)
+                    pickled, affinity_keys, costs, seconds = future.result()
+                    input_indexes = [input_index for input_index, _ in pickled]
+                    if affinity_keys:
+                        self._affinity_keys.update(zip(input_indexes, affinity_keys))
+                    if costs:
+                        self._costs.update(zip(input_indexes, costs))
+                    batch_bytes = sum(len(input_pkl) for _, input_pkl in pickled)
+                    self._pickled.extend(pickled)
+                    self._pickled_bytes += batch_bytes
+                    self.n_pickled_bytes += batch_bytes
+                    self.n_pickled_inputs += len(pickled)
+                    self.pickle_thread_seconds += seconds
+        finally:
+            self.pickle_wall_seconds = time() - started_at
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def serialization_summary(self) -> str:
+        megabytes = self.n_pickled_bytes / 1_000_000
+        wall_seconds = self.pickle_wall_seconds or float("inf")
+        thread_seconds = self.pickle_thread_seconds or float("inf")
+        wall_rate = megabytes / wall_seconds
+        thread_rate = megabytes / thread_seconds
+        summary = f"pickled {self.n_consumed} inputs ({megabytes:.1f}MB) at "
+        summary += f"{wall_rate:.1f}MB/s ({thread_rate:.1f}MB/s per thread), "
+        summary += f"uploads waited on pickling {self.n_upload_waits} times"
+        return summary
@@ -3,27 +3,41 @@ import json
 import pickle
 import random
 import sys
+from collections import deque
 from queue import Queue
 from threading import Event
 from pickle import UnpicklingError
 from time import time
 import aiohttp
-import cloudpickle
 from aiohttp import ClientConnectorError, ClientError, ClientOSError, ClientTimeout
 from tblib import Traceback
 from yaspin import Spinner
 
 from burla import get_cluster_dashboard_url
 from burla._auth import get_auth_headers
+from burla._broadcast import Broadcast
 from burla._cluster_client import ClusterClient, _local_host_from
+from burla._compression import COMPRESSION_HEADER, Compression, compress, decompress
+from burla._frames import dump_frames, load_frames
+from burla._inputs import InputStream
 from burla._reporting import RemoteParallelMapReporter, safe_print, safe_spinner_write
+from burla._results import NO_RESULT, OrderedResults
 
 NODE_SILENCE_TIMEOUT_SECONDS = 2 * 60
 RESULT_POLL_SILENCE_TIMEOUT_SECONDS = 3 * 60
+# Nodes hold a /results request open this long waiting for results to send.
+RESULT_LONG_POLL_SEC = 1
 NODE_BOOT_DEADLINE_SEC = 10 * 60
 LOGIN_TIMEOUT_SEC = 10
 MAX_INPUT_SIZE_BYTES = 1_000_000 * 200  # 200MB
 MAX_CHUNK_SIZE_BYTES = 1_000_000 * 2  # 2MB
+# Inputs are fed to each node so it holds about this many seconds of queued
+# work at its observed completion rate (never less than one per worker):
+# enough to hide upload round trips, little enough that slow inputs are not
+# front-loaded onto whichever node asked first.
+TARGET_QUEUED_WORK_SEC = 2
+COMPLETION_RATE_WINDOW_SEC = 10
+MAX_QUEUED_INPUT_BYTES_PER_NODE = 1_000_000 * 256  # 256MB
 NETWORK_RETRY_ATTEMPTS = 5
 NETWORK_RETRY_DELAY_SECONDS = 1
 NETWORK_ERROR_TYPES = (
@@ -284,11 +298,20 @@ class Node:
         self.session = session
         self.job_id = None
         self.udf_error_event = None
+        self.compression = None
         self.current_parallelism = 0
         self.installing_packages = False
         self.currently_installing_package = None
         self.result_count = 0
         self.result_batch_id_to_ack = None
+        # Adaptive chunking state, see `_inputs_wanted`.
+        self.queued_inputs = 0  # as of the node's last /results response
+        self.uploaded_since_report = 0
+        self.uploaded_input_count = 0
+        self.uploaded_input_bytes = 0
+        self.recent_completions = deque()  # (timestamp, n_results)
+        self.started_uploading_at = None
+        self.logged_queue_target = None
         self.dynamic_worker_reduction = None
         self.last_reply_timestamp = time()
         self.last_result_poll_timestamp = None
@@ -447,6 +470,30 @@ class Node:
             msg = f"Failed to mark node {self.instance_name} as FAILED: {error}"
             self.spinner_compatible_print(msg)
 
+    async def _cache_payload(self, payload: bytes, payload_hash: str):
+        # Nodes keep recently used payloads on disk, so resubmitting the same
+        # function (the usual notebook loop) or broadcast skips the upload.
+        url = f"{self.host}/payloads/{payload_hash}"
+        async with self.session.get(url, headers=self.auth_headers) as response:
+            self.last_reply_timestamp = time()
+            if response.status == 200:
+                return
+            elif response.status == 401:
+                raise UnauthorizedError()
+
+        data = aiohttp.FormData()
+        data.add_field("payload", payload)
+        timeout = aiohttp.ClientTimeout(total=1800, connect=30)
+        async with self.session.post(
+            url, data=data, headers=self.auth_headers, timeout=timeout
+        ) as response:
+            self.last_reply_timestamp = time()
+            if response.status == 401:
+                raise UnauthorizedError()
+            elif response.status != 200:
+                msg = f"Failed to upload to {self.instance_name}: {response.status}"
+                raise Exception(msg)
+
     async def _assign_job(
         self,
         job_id: str,
@@ -457,7 +504,16 @@ class Node:
         func_ram: int | str,
         start_time: float,
         function_pkl: bytes,
+        function_hash: str,
+        broadcasts: list[Broadcast],
         udf_error_event: Event,
+        compression: Compression | None,
+        batch_size: int | None,
+        func_concurrency: int,
+        result_sink: str | None,
+        retries: int,
+        retry_on: list[str],
+        speculative: bool,
     ):
         request_json = {
             "parallelism": self.target_parallelism,
@@ -469,6 +525,15 @@ class Node:
             "func_ram": func_ram,
             "start_time": start_time,
             "cluster_dashboard_url": self.client._url,
+            "function_hash": function_hash,
+            "broadcast_hashes": [broadcast.hash for broadcast in broadcasts],
+            "compression": compression.settings() if compression else None,
+            "batch_size": batch_size,
+            "func_concurrency": func_concurrency,
+            "result_sink": result_sink,
+            "retries": retries,
+            "retry_on": retry_on,
+            "speculative": speculative,
         }
         url = f"{self.host}/jobs/{job_id}"
         # Assignment blocks while the node installs the client's environment,
@@ -478,9 +543,11 @@ class Node:
         self.last_reply_timestamp = time()
 
         async def request_function():
+            await self._cache_payload(function_pkl, function_hash)
+            for broadcast in broadcasts:
+                await self._cache_payload(broadcast.pickled, broadcast.hash)
             data = aiohttp.FormData()
             data.add_field("request_json", json.dumps(request_json))
-            data.add_field("function_pkl", function_pkl)
             async with self.session.post(
                 url,
                 data=data,
@@ -491,6 +558,7 @@ class Node:
                 if response.status == 200:
                     self.job_id = job_id
                     self.udf_error_event = udf_error_event
+                    self.compression = compression
                     self.state = "RUNNING"
                     return self
                 elif response.status == 401:
@@ -550,7 +618,7 @@ class Node:
         url = f"{self.host}/jobs/{self.job_id}/results"
         self.last_result_poll_timestamp = time()
         result_batch_id_to_ack = self.result_batch_id_to_ack
-        params = {}
+        params = {"wait_sec": RESULT_LONG_POLL_SEC}
         if result_batch_id_to_ack:
             params["ack_result_batch_id"] = result_batch_id_to_ack
 
@@ -579,13 +647,26 @@ class Node:
                     raise Exception(
                         f"Result-check failed for node: {self.instance_name}"
                     )
+                response_bytes = await response.content.read()
+                codec = response.headers.get(COMPRESSION_HEADER)
+                if self.compression:
+                    n_wire_bytes = len(response_bytes)
+                    if codec:
+                        response_bytes = await asyncio.to_thread(
+                            decompress, response_bytes, codec
+                        )
+                    self.compression.record("results", len(response_bytes), n_wire_bytes)
                 try:
-                    node_results = pickle.loads(await response.content.read())
+                    # A bytearray so results built on out-of-band buffers
+                    # (numpy arrays) come back writable without another copy.
+                    response_bytes = bytearray(response_bytes)
+                    node_results = load_frames(response_bytes)
                     self.last_reply_timestamp = time()
                     if result_batch_id_to_ack:
                         self.result_batch_id_to_ack = None
                 except UnpicklingError as error:
-                    if "Memo value not found at index" not in str(error):
+                    truncated_messages = ["Memo value not found at index", "truncated"]
+                    if not any(msg in str(error) for msg in truncated_messages):
                         raise error
                     job_doc = await self.client.get_job(self.job_id)
                     if job_doc and job_doc.get("status") == "CANCELED":
@@ -614,9 +695,32 @@ class Node:
         self._print_logs(node_results.get("logs", []))
         return node_results
 
-    async def _upload_input_chunk(self, input_chunk: list):
+    async def _upload_input_chunk(
+        self,
+        input_chunk: list,
+        chunk_plan: dict | None = None,
+        affinity_keys: list | None = None,
+        costs: list | None = None,
+    ):
         data = aiohttp.FormData()
-        data.add_field("inputs_pkl_with_idx", pickle.dumps(input_chunk))
+        # Each input goes out-of-band, so it's copied into the request body
+        # once and the node can slice it back out without copying.
+        chunk = [(index, pickle.PickleBuffer(pkl)) for index, pkl in input_chunk]
+        chunk_bytes = b"".join(dump_frames(chunk))
+        if self.compression:
+            n_raw_bytes = len(chunk_bytes)
+            if n_raw_bytes >= self.compression.threshold_bytes:
+                codec, level = self.compression.codec, self.compression.level
+                chunk_bytes = await asyncio.to_thread(compress, chunk_bytes, codec, level)
+                data.add_field("compression", codec.encode())
+            self.compression.record("inputs", n_raw_bytes, len(chunk_bytes))
+        data.add_field("inputs_pkl_with_idx", chunk_bytes)
+        if chunk_plan:
+            data.add_field("chunk_plan", json.dumps(chunk_plan).encode())
+        if affinity_keys:
+            data.add_field("affinity", json.dumps(affinity_keys).encode())
+        if costs:
+            data.add_field("costs", json.dumps(costs).encode())
         status = 409
         retry_count = 0
         while status in [404, 409]:
@@ -635,6 +739,21 @@ class Node:
             elif status >= 400:
                 raise Exception(response_text)
 
+    def _user_function_exception(self, input_index: int, error_info: dict):
+        traceback = Traceback.from_dict(error_info["traceback_dict"]).as_traceback()
+        exc = error_info["exception"].with_traceback(traceback)
+        # Preserve the failing input index on the exception so callers
+        # can identify the bad item in a large batch; add a 3.11+
+        # note so it is visible in the default traceback. Guarded
+        # because some exception types disallow attribute writes.
+        try:
+            exc.burla_input_index = input_index
+            if hasattr(exc, "add_note"):
+                exc.add_note(f"[burla] failed on input index {input_index}")
+        except Exception:
+            pass
+        return exc
+
     async def _poll_installing_package(self, job_id: str):
         """Assignment blocks for the whole environment install; this side
         channel is the only live progress during that window."""
@@ -652,6 +771,171 @@ class Node:
                 # Cosmetic channel: assignment itself decides the node's fate.
                 pass
 
+    async def _deliver_results(
+        self,
+        node_results: dict,
+        return_queue: Queue,
+        ordered_results: OrderedResults | None,
+        collect_errors: bool,
+        completed_inputs: set | None,
+    ):
+        result_batch_id = node_results.get("result_batch_id")
+        return_values = []
+        # Partial results are items a generator UDF yielded while its input
+        # was still running, which then ends with an empty result.
+        for input_index, is_error, result_pkl, is_partial in node_results["results"]:
+            if completed_inputs is not None:
+                if input_index in completed_inputs:
+                    continue  # the losing copy of a speculated input
+                completed_inputs.add(input_index)
+            if is_error:
+                error_info = pickle.loads(result_pkl)
+                if error_info.get("is_infrastructure_error"):
+                    msg = f"Worker on node {self.instance_name} failed "
+                    msg += f"while executing input index {input_index}:\n\n"
+                    msg += error_info["traceback_str"]
+                    raise NodeDisconnected(self, await self._failure_message(msg))
+                exc = self._user_function_exception(input_index, error_info)
+                if collect_errors:
+                    return_values.append((input_index, exc, False))
+                    continue
+                self.udf_error_event.set()
+                log_error = RemoteParallelMapReporter.log_user_function_error_async
+                await log_error(self.job_id, self.session)
+                raise exc
+            elif result_pkl:
+                return_value = load_frames(result_pkl)
+                return_values.append((input_index, return_value, is_partial))
+            else:
+                return_values.append((input_index, NO_RESULT, False))
+
+        self.current_parallelism = node_results["current_parallelism"]
+        self.dynamic_worker_reduction = node_results.get("dynamic_worker_reduction")
+        if "queued_inputs" in node_results:
+            self.queued_inputs = node_results["queued_inputs"]
+            self.uploaded_since_report = 0
+        n_completed = sum(not is_partial for _, _, is_partial in return_values)
+        if n_completed:
+            self.recent_completions.append((time(), n_completed))
+
+        for input_index, return_value, is_partial in return_values:
+            if collect_errors and return_value is not NO_RESULT:
+                return_value = (input_index, return_value)
+            if ordered_results and is_partial:
+                ordered_results.put_item(input_index, return_value)
+            elif ordered_results:
+                ordered_results.put(input_index, return_value)
+            elif return_value is not NO_RESULT:
+                return_queue.put_nowait(return_value)
+            if not is_partial:
+                self.result_count += 1
+        if result_batch_id:
+            self.result_batch_id_to_ack = result_batch_id
+
+    def _inputs_wanted(self) -> tuple[int, dict]:
+        """How many more inputs to send this node right now, and the numbers
+        that decided it."""
+        now = time()
+        while (
+            self.recent_completions
+            and now - self.recent_completions[0][0] > COMPLETION_RATE_WINDOW_SEC
+        ):
+            self.recent_completions.popleft()
+        window_sec = min(COMPLETION_RATE_WINDOW_SEC, now - self.started_uploading_at)
+        n_completed = sum(n_results for _, n_results in self.recent_completions)
+        inputs_per_sec = n_completed / max(window_sec, 0.1)
+        avg_input_bytes = self.uploaded_input_bytes / max(self.uploaded_input_count, 1)
+
+        max_queued_inputs = MAX_QUEUED_INPUT_BYTES_PER_NODE // max(avg_input_bytes, 1)
+        queue_target = int(inputs_per_sec * TARGET_QUEUED_WORK_SEC)
+        queue_target = max(min(queue_target, max_queued_inputs), self.target_parallelism)
+        queued = self.queued_inputs + self.uploaded_since_report
+        plan = {
+            "queue_target": queue_target,
+            "queued": queued,
+            "inputs_per_sec": round(inputs_per_sec, 2),
+            "avg_input_bytes": int(avg_input_bytes),
+        }
+        return max(0, queue_target - queued), plan
+
+    async def _upload_inputs(
+        self,
+        input_stream: InputStream,
+        ordered_results: OrderedResults | None,
+        first_chunk_barrier: asyncio.Barrier | None,
+    ):
+        """Runs beside the result loop, so a long-polled /results request
+        never holds up feeding this node more inputs."""
+        self.started_uploading_at = time()
+        input_stream.add_node(self.instance_name)
+        try:
+            await self._upload_input_chunks(
+                input_stream, ordered_results, first_chunk_barrier
+            )
+        finally:
+            input_stream.remove_node(self.instance_name)
+
+    async def _upload_input_chunks(
+        self,
+        input_stream: InputStream,
+        ordered_results: OrderedResults | None,
+        first_chunk_barrier: asyncio.Barrier | None,
+    ):
+        while True:
+            input_chunksize, chunk_plan = self._inputs_wanted()
+            input_chunk = []
+            chunk_size_bytes = 0
+            while len(input_chunk) < input_chunksize:
+                input_with_index = input_stream.pop(self.instance_name)
+                if input_with_index is None:
+                    break
+                input_index, input_pkl = input_with_index
+                if ordered_results and not ordered_results.accepts(input_index):
+                    input_stream.push_back(input_with_index, self.instance_name)
+                    break
+                if len(input_pkl) > MAX_INPUT_SIZE_BYTES:
+                    raise InputTooBig(input_index)
+                if (
+                    input_chunk
+                    and chunk_size_bytes + len(input_pkl) > MAX_CHUNK_SIZE_BYTES
+                ):
+                    input_stream.push_back(input_with_index, self.instance_name)
+                    break
+                input_chunk.append(input_with_index)
+                chunk_size_bytes += len(input_pkl)
+
+            if input_chunk:
+                # Logged node-side only when the target moves a lot, it is
+                # recomputed before every chunk.
+                last = self.logged_queue_target
+                target = chunk_plan["queue_target"]
+                if last is None or not last / 2 <= target <= last * 2:
+                    chunk_plan["chunk_size"] = len(input_chunk)
+                    self.logged_queue_target = target
+                else:
+                    chunk_plan = None
+                await self._upload_input_chunk(
+                    input_chunk,
+                    chunk_plan,
+                    input_stream.affinity_keys(input_chunk),
+                    input_stream.costs(input_chunk),
+                )
+                self.uploaded_since_report += len(input_chunk)
+                self.uploaded_input_count += len(input_chunk)
+                self.uploaded_input_bytes += chunk_size_bytes
+
+            if first_chunk_barrier:
+                try:
+                    await first_chunk_barrier.wait()
+                except asyncio.BrokenBarrierError:
+                    pass
+                first_chunk_barrier = None
+
+            if input_stream.exhausted:
+                return
+            if not input_chunk:
+                await asyncio.sleep(0.05)
+
     async def execute_job(
         self,
         job_id: str,
@@ -662,10 +946,21 @@ class Node:
         func_ram: int | str,
         start_time: float,
         function_pkl: bytes,
+        function_hash: str,
+        broadcasts: list[Broadcast],
         udf_error_event: Event,
-        inputs_with_indicies: list,
+        compression: Compression | None,
+        batch_size: int | None,
+        func_concurrency: int,
+        result_sink: str | None,
+        retries: int,
+        retry_on: list[str],
+        speculative: bool,
+        input_stream: InputStream,
         return_queue: Queue,
-        nodes: list["Node"],
+        ordered_results: OrderedResults | None,
+        collect_errors: bool,
+        completed_inputs: set | None,
         first_chunk_barrier: asyncio.Barrier | None,
     ):
         was_initially_ready = self.state == "READY"
@@ -703,7 +998,16 @@ class Node:
                 func_ram,
                 start_time,
                 function_pkl,
+                function_hash,
+                broadcasts,
                 udf_error_event,
+                compression,
+                batch_size,
+                func_concurrency,
+                result_sink,
+                retries,
+                retry_on,
+                speculative,
             )
         finally:
             self.installing_packages = False
@@ -715,85 +1019,30 @@ class Node:
                 await first_chunk_barrier.abort()
             return
 
-        while True:
-            total_parallelism = (
-                sum(
-                    node.target_parallelism
-                    for node in nodes
-                    if node.state in ("READY", "RUNNING")
-                )
-                or 1
-            )
-            input_chunksize = max(
-                self.target_parallelism,
-                (n_inputs * self.target_parallelism) // total_parallelism,
+        upload_task = asyncio.create_task(
+            self._upload_inputs(
+                input_stream,
+                ordered_results,
+                first_chunk_barrier if was_initially_ready else None,
             )
-            input_chunk = []
-            chunk_size_bytes = 0
-            while inputs_with_indicies and len(input_chunk) < input_chunksize:
-                input_index, input_ = inputs_with_indicies.pop()
-                input_pkl = cloudpickle.dumps(input_)
-                if len(input_pkl) > MAX_INPUT_SIZE_BYTES:
-                    raise InputTooBig(input_index)
-                if (
-                    input_chunk
-                    and chunk_size_bytes + len(input_pkl) > MAX_CHUNK_SIZE_BYTES
-                ):
-                    inputs_with_indicies.append((input_index, input_))
-                    break
-                input_chunk.append((input_index, input_pkl))
-                chunk_size_bytes += len(input_pkl)
-
-            if input_chunk:
-                await self._upload_input_chunk(input_chunk)
-
-            if was_initially_ready and first_chunk_barrier:
-                try:
-                    await first_chunk_barrier.wait()
-                except asyncio.BrokenBarrierError:
-                    pass
-                first_chunk_barrier = None
-
-            node_results = await self._gather_results()
-            result_batch_id = node_results.get("result_batch_id")
-            return_values = []
-            for input_index, is_error, result_pkl in node_results["results"]:
-                if is_error:
-                    error_info = pickle.loads(result_pkl)
-                    if error_info.get("is_infrastructure_error"):
-                        msg = f"Worker on node {self.instance_name} failed "
-                        msg += f"while executing input index {input_index}:\n\n"
-                        msg += error_info["traceback_str"]
-                        raise NodeDisconnected(self, await self._failure_message(msg))
-                    traceback = Traceback.from_dict(
-                        error_info["traceback_dict"]
-                    ).as_traceback()
-                    self.udf_error_event.set()
-                    log_error = RemoteParallelMapReporter.log_user_function_error_async
-                    await log_error(self.job_id, self.session)
-                    exc = error_info["exception"].with_traceback(traceback)
-                    # Preserve the failing input index on the exception so callers
-                    # can identify the bad item in a large batch; add a 3.11+
-                    # note so it is visible in the default traceback. Guarded
-                    # because some exception types disallow attribute writes.
-                    try:
-                        exc.burla_input_index = input_index
-                        if hasattr(exc, "add_note"):
-                            exc.add_note(f"[burla] failed on input index {input_index}")
-                    except Exception:
-                        pass
-                    raise exc
-                else:
-                    return_values.append(cloudpickle.loads(result_pkl))
-
-            self.current_parallelism = node_results["current_parallelism"]
-            self.dynamic_worker_reduction = node_results.get("dynamic_worker_reduction")
-
-            for return_value in return_values:
-                return_queue.put_nowait(return_value)
-                self.result_count += 1
-            if result_batch_id:
-                self.result_batch_id_to_ack = result_batch_id
-            if self.state == "DONE":
-                return
-            await asyncio.sleep(0.05)
+        )
+        try:
+            while True:
+                if upload_task.done() and upload_task.exception():
+                    raise upload_task.exception()
+                node_results = await self._gather_results()
+                await self._deliver_results(
+                    node_results,
+                    return_queue,
+                    ordered_results,
+                    collect_errors,
+                    completed_inputs,
+                )
+                if self.state == "DONE":
+                    return
+                if not node_results["results"]:
+                    # Empty despite the long poll: the node errored or is too
+                    # old to hold the request, don't spin on it.
+                    await asyncio.sleep(0.05)
+        finally:
+            upload_task.cancel()
@@ -1,8 +1,10 @@
 import asyncio
 import base64
+import hashlib
+import inspect
 import io
 import pickle
-import random
+import posixpath
 import ssl
 import sys
 import traceback
@@ -12,11 +14,12 @@ from queue import Empty, Queue
 from threading import Event, Lock, Thread
 from time import time
 from types import ModuleType
-from typing import Callable, Literal, Optional, Union
+from typing import Callable, Hashable, Iterable, Literal, Optional, Union
 
 FuncGpu = Literal["T4", "A100", "A100_40G", "A100_80G", "H100", "H100_80G"]
 FuncRam = Union[int, Literal["dynamic"]]
 FuncCpu = Union[int, Literal["dynamic"]]
+Codec = Literal["zstd", "lz4"]
 from uuid import uuid4
 
 _N_FOUR_STANDARD_CPU_TO_RAM = {
@@ -36,7 +39,13 @@ import cloudpickle
 from yaspin import Spinner, yaspin
 
 from burla import __version__
+from burla._broadcast import collect_broadcasts
 from burla._cluster_client import ClusterClient, NodesBusy, _local_host_from
+from burla._compression import (
+    DEFAULT_COMPRESSION_THRESHOLD_BYTES,
+    DEFAULT_LEVELS,
+    Compression,
+)
 from burla._env_scan import (
     local_module_source_zip,
     modules_to_pickle_by_value,
@@ -45,6 +54,7 @@ from burla._env_scan import (
 )
 from burla._heartbeat import run_in_subprocess, send_alive_pings
 from burla._helpers import install_signal_handlers, restore_signal_handlers
+from burla._inputs import DEFAULT_SERIALIZATION_THREADS, InputStream
 from burla._node import (
     AllNodesBusy,
     ClusterRestarted,
@@ -68,9 +78,16 @@ from burla._reporting import (
     log_job_failure_telemetry,
     stdio_supports_spinner,
 )
+from burla._results import MIN_ORDERED_RESULTS_WINDOW, OrderedResults
 
 _FUNCTION_PAYLOAD_MAGIC = b"BURLA_FUNCTION_V2\0"
 _FUNCTION_PICKLE_LOCK = Lock()
+# Jobs over an iterable of unknown length run at most this many calls at once
+# unless `max_parallelism` says otherwise: it could hold a handful of items,
+# which isn't worth taking (or with `grow=True`, booting) a whole cluster for.
+UNSIZED_INPUTS_MAX_PARALLELISM = 64
+# Where every worker mounts the cluster's shared workspace bucket.
+SHARED_WORKSPACE_PATH = "/workspace/shared"
 
 
 def _pickle_function(function_: Callable, local_module_names: set) -> bytes:
@@ -182,7 +199,8 @@ class FunctionTooBig(Exception):
         )
         msg += "Functions submitted to Burla, including objects they reference that are defined elsewhere, must be less than 0.1GB.\n"
         msg += "Does your function reference any big numpy arrays, dataframes, or other objects defined elsewhere?\n"
-        msg += "Please pass these as inputs to your function, or download them from the internet once inside the function.\n"
+        msg += "Please wrap these in `burla.broadcast(...)` so they are uploaded once per node, pass them as inputs\n"
+        msg += "to your function, or download them from the internet once inside the function.\n"
         msg += "We apologize for this temporary limitation! If this is confusing or blocking you, please tell us! (jake@burla.dev)\n\n"
         super().__init__(msg)
 
@@ -231,7 +249,7 @@ async def _execute_job(
     job_id: str,
     return_queue: Queue,
     function_: Callable,
-    inputs: list,
+    inputs: InputStream,
     packages: dict,
     by_value_module_names: set,
     func_cpu: FuncCpu,
@@ -248,6 +266,16 @@ async def _execute_job(
     func_gpu: Optional[FuncGpu],
     region: Optional[str],
     disk_gb: Optional[int],
+    serialization_threads: int,
+    ordered: bool,
+    on_error: Literal["raise", "collect"],
+    compression: Optional[Compression],
+    batch_size: Optional[int],
+    func_concurrency: int,
+    result_sink: Optional[str],
+    retries: int,
+    retry_on: list[str],
+    speculative: bool,
     session: aiohttp.ClientSession,
     session_stack: AsyncExitStack,
     reporter: RemoteParallelMapReporter,
@@ -279,18 +307,23 @@ async def _execute_job(
     if background:
         reporter.print_detach_mode_enabled_message()
 
-    function_pkl = _pickle_function(function_, by_value_module_names)
+    with collect_broadcasts() as broadcasts:
+        function_pkl = _pickle_function(function_, by_value_module_names)
     function_size_gb = len(function_pkl) / (1024**3)
     reporter.function_size_gb = function_size_gb
     if function_size_gb > 0.1:
         raise FunctionTooBig(function_.__name__)
+    function_hash = hashlib.sha256(function_pkl).hexdigest()
 
+    # Only a planning number while the count is unknown; the exact count is
+    # sent along with `all_inputs_uploaded` once the iterable runs out.
+    n_inputs = inputs.n_inputs_estimate or max_parallelism
     # Single round-trip: picks nodes from the server's in-memory cache,
     # grows the cluster if `grow=True` and capacity falls short, writes the
     # job doc, and returns the nodes + booting names. Replaces what used to
     # be three separate HTTP calls here.
     start_job_config = {
-        "n_inputs": len(inputs),
+        "n_inputs": n_inputs,
         "func_cpu": func_cpu,
         "func_ram": func_ram,
         "max_parallelism": max_parallelism,
@@ -369,12 +402,17 @@ async def _execute_job(
     session_stack.callback(job_start_telemetry_task.cancel)
     reporter.set_uploading_function_message(nodes)
 
+    serialize_task = create_task(inputs.serialize(serialization_threads))
+    session_stack.callback(serialize_task.cancel)
+    ordered_results = None
+    if ordered:
+        # Wide enough that every slot in the job can stay busy behind one slow input.
+        window = max(MIN_ORDERED_RESULTS_WINDOW, 4 * max_parallelism)
+        ordered_results = OrderedResults(return_queue, window)
+    # Speculative copies of an input can run on two nodes: the first result
+    # for an index is kept, the other is dropped.
+    completed_inputs = set() if speculative else None
     node_tasks = []
-    n_inputs = len(
-        inputs
-    )  # <- inputs will be popped from so len(inputs) will start changing
-    inputs_with_indicies = list(enumerate(inputs))
-    random.shuffle(inputs_with_indicies)
     n_ready_nodes = len(nodes) - len(booting_nodes)
     first_chunk_barrier = asyncio.Barrier(n_ready_nodes) if n_ready_nodes else None
     for node in nodes:
@@ -389,10 +427,21 @@ async def _execute_job(
                     func_ram=func_ram,
                     start_time=start_time,
                     function_pkl=function_pkl,
+                    function_hash=function_hash,
+                    broadcasts=list(broadcasts.values()),
                     udf_error_event=udf_error_event,
-                    inputs_with_indicies=inputs_with_indicies,
+                    compression=compression,
+                    batch_size=batch_size,
+                    func_concurrency=func_concurrency,
+                    result_sink=result_sink,
+                    retries=retries,
+                    retry_on=retry_on,
+                    speculative=speculative,
+                    input_stream=inputs,
                     return_queue=return_queue,
-                    nodes=nodes,
+                    ordered_results=ordered_results,
+                    collect_errors=on_error == "collect",
+                    completed_inputs=completed_inputs,
                     first_chunk_barrier=first_chunk_barrier,
                 )
             )
@@ -441,10 +490,21 @@ async def _execute_job(
                             func_ram=func_ram,
                             start_time=start_time,
                             function_pkl=function_pkl,
+                            function_hash=function_hash,
+                            broadcasts=list(broadcasts.values()),
                             udf_error_event=udf_error_event,
-                            inputs_with_indicies=inputs_with_indicies,
+                            compression=compression,
+                            batch_size=batch_size,
+                            func_concurrency=func_concurrency,
+                            result_sink=result_sink,
+                            retries=retries,
+                            retry_on=retry_on,
+                            speculative=speculative,
+                            input_stream=inputs,
                             return_queue=return_queue,
-                            nodes=nodes,
+                            ordered_results=ordered_results,
+                            collect_errors=on_error == "collect",
+                            completed_inputs=completed_inputs,
                             first_chunk_barrier=None,
                         )
                     )
@@ -467,7 +527,7 @@ async def _execute_job(
         last_status_message_update_time = 0.0
         last_loop_at = time()
         total_result_count = sum(node.result_count for node in nodes)
-        while total_result_count < n_inputs:
+        while not (inputs.exhausted and total_result_count >= inputs.n_inputs):
             await asyncio.sleep(0.05)
             last_loop_at = reset_silence_clocks_after_suspend(nodes, last_loop_at)
 
@@ -483,6 +543,9 @@ async def _execute_job(
             if booting_nodes_all_failed and no_node_started_work:
                 raise await _nodes_failed_to_boot_exception(booting_nodes)
 
+            if serialize_task.done() and serialize_task.exception():
+                raise serialize_task.exception()
+
             for task, node in zip(node_tasks, nodes):
                 exception = task.exception() if task.done() else None
                 if node.state == "FAILED":
@@ -537,9 +600,10 @@ async def _execute_job(
                     )
                 last_status_message_update_time = current_time
 
-            if len(inputs_with_indicies) == 0 and not inputs_done_event.is_set():
+            if inputs.exhausted and not inputs_done_event.is_set():
                 inputs_done_event.set()
-                await client.patch_job(job_id, {"all_inputs_uploaded": True})
+                updates = {"all_inputs_uploaded": True, "n_inputs": inputs.n_inputs}
+                await client.patch_job(job_id, updates)
                 if background:
                     reporter.print_inputs_done_message()
 
@@ -565,14 +629,15 @@ async def _execute_job(
                 raise Exception(f"Heartbeat process failed!\n{stderr}")
 
             total_result_count = sum(node.result_count for node in nodes)
-            if (
-                all([task.done() for task in node_tasks])
-                and total_result_count < n_inputs
-            ):
+            all_results_received = (
+                inputs.exhausted and total_result_count >= inputs.n_inputs
+            )
+            if all([task.done() for task in node_tasks]) and not all_results_received:
                 summary = "\n".join([await n._stall_summary_line() for n in nodes])
+                n_expected = inputs.n_inputs_estimate or "?"
                 msg = (
                     f"Job ended before all results were received "
-                    f"({total_result_count}/{n_inputs}).\n"
+                    f"({total_result_count}/{n_expected}).\n"
                     f"Final node states:\n{summary}\n"
                 )
                 raise JobStalled(msg)
@@ -595,9 +660,18 @@ async def _execute_job(
         [task.cancel() for task in node_tasks]
 
 
+def _key_lookup(key: Hashable) -> Callable:
+    # `affinity="shard"` / `cost="size"`: look the key up in each input.
+    return lambda input_, *args: input_[key]
+
+
+def _batch_argument(args_tuples: list) -> list:
+    return [args[0] if len(args) == 1 else args for args in args_tuples]
+
+
 def remote_parallel_map(
     function_: Callable,
-    inputs: list,
+    inputs: Iterable,
     func_cpu: FuncCpu = "dynamic",
     func_ram: FuncRam = "dynamic",
     func_gpu: Optional[FuncGpu] = None,
@@ -609,6 +683,21 @@ def remote_parallel_map(
     spinner: bool = True,
     region: Optional[str] = None,
     disk_gb: Optional[int] = None,
+    n_inputs: Optional[int] = None,
+    serialization_threads: Optional[int] = None,
+    ordered: bool = False,
+    on_error: Literal["raise", "collect"] = "raise",
+    compression: Optional[Codec] = None,
+    compression_level: Optional[int] = None,
+    compression_threshold_bytes: int = DEFAULT_COMPRESSION_THRESHOLD_BYTES,
+    batch_size: Optional[int] = None,
+    func_concurrency: int = 1,
+    result_sink: Optional[str] = None,
+    retries: int = 0,
+    retry_on: Iterable[type[BaseException]] = (),
+    speculative: bool = False,
+    affinity: Union[Callable[..., Hashable], Hashable, None] = None,
+    cost: Union[Callable[..., float], Hashable, None] = None,
 ):
     """
     Run a Python function on many remote computers in parallel.
@@ -622,10 +711,16 @@ def remote_parallel_map(
         function_ (Callable):
             A Python function that accepts a single input argument. For example, calling
             `function_(inputs[0])` should not raise an exception.
-        inputs (List[Any]):
+            If `function_` is a generator (it uses `yield`), every item it yields is
+            an output of its own, sent back while the call is still running. Outputs
+            of one input stay in the order they were yielded.
+        inputs (Iterable[Any]):
             An iterable of objects that will be passed to `function_`.
             If the iterable contains tuples, they will be unpacked!
             Example: `inputs=[(1, 2)]` -> `function_(1, 2)`
+            Generators and other lazy iterables are consumed incrementally as
+            nodes accept more work, so the full input set never has to fit in
+            memory on this machine.
         func_cpu (int | "dynamic", optional):
             The number of CPUs allocated for each instance of `function_`.
             Defaults to "dynamic": Burla starts with one parallel call per CPU,
@@ -653,7 +748,9 @@ def remote_parallel_map(
             as possible. Adds up to 2560 cpus. Defaults to False.
         max_parallelism (int, optional):
             The maximum number of `function_` instances allowed to be running at the same time.
-            Defaults to the number of provided inputs.
+            Defaults to the number of provided inputs (or `n_inputs`). For inputs
+            without a `len()` and no `n_inputs`, defaults to 64: pass a higher
+            `max_parallelism` to use more of the cluster.
         detach (bool, optional):
             If True, job will continue running on cluster, when canceled locally.
             Requires a deployed cluster (`burla deploy`): a dashboard running
@@ -662,6 +759,7 @@ def remote_parallel_map(
         generator (bool, optional):
             If True, returns a generator that yields outputs as they are produced; otherwise,
             returns a list of outputs once all have been processed. Defaults to False.
+            Pairs with a generator `function_` to process its items as they stream in.
         spinner (bool, optional):
             If set to False, disables the display of the status indicator/spinner. Defaults to True.
         region (str, optional):
@@ -675,15 +773,103 @@ def remote_parallel_map(
             Boot disk size in GB for any nodes booted for this job. Defaults to
             None: nodes use the disk size from the cluster settings page. Idle
             nodes are eligible regardless of their disk size.
+        n_inputs (int, optional):
+            How many items `inputs` will yield, when it has no `len()` (e.g. a
+            generator). Only used to size the job and show progress, the job
+            still runs every item `inputs` yields. Defaults to None: the job is
+            sized as if `max_parallelism` calls can run at once.
+        serialization_threads (int, optional):
+            Number of threads pickling inputs ahead of the uploads to each node.
+            Defaults to None: one per local CPU, up to 8.
+        ordered (bool, optional):
+            If True, outputs are returned (or yielded, with `generator=True`) in
+            the same order as `inputs`. Results that finish ahead of a slower
+            earlier input are held locally, and uploads pause once too many
+            are waiting. Defaults to False.
+        on_error ("raise" | "collect", optional):
+            "raise" (default) re-raises the first exception from `function_` here
+            and ends the job. "collect" keeps the job running and returns every
+            output as an `(input_index, result_or_exception)` tuple instead, where
+            a failed input's exception carries its remote traceback.
+        compression ("zstd" | "lz4", optional):
+            Compress input uploads, result downloads and inputs moved between
+            nodes with this codec. Worth it for text or JSON-heavy inputs and
+            results, which often shrink 5-10x. Defaults to None (no compression).
+        compression_level (int, optional):
+            Codec compression level. Defaults to None: 3 for zstd, 0 for lz4.
+        compression_threshold_bytes (int, optional):
+            Chunks of inputs or results smaller than this are sent uncompressed.
+            Defaults to 64KB.
+        batch_size (int, optional):
+            Call `function_` on lists of up to this many inputs instead of one
+            input at a time, for vectorized (numpy / pandas) functions that are
+            much faster per batch. `function_` must return one result per input,
+            in order (any sequence: list, tuple, array, or a DataFrame / Series
+            with one row per input). Tuple inputs are passed as tuples, not
+            unpacked. Each input still gets its own result; if the call raises,
+            every input in that batch gets the exception.
+            Defaults to None (one input per call).
+        func_concurrency (int, optional):
+            How many calls each worker runs at once, on a thread pool. Raise it
+            for I/O-bound functions (HTTP requests, S3 reads) that otherwise
+            leave their CPU idle while they wait. `function_` must be
+            thread-safe. If `function_` is an `async def`, this is how many of
+            its coroutines each worker keeps running on its event loop, which
+            can be thousands. Calls running at once across the cluster are then
+            up to `max_parallelism` x `func_concurrency`. Defaults to 1.
+        result_sink (str, optional):
+            A directory in the shared workspace bucket (`/workspace/shared/...`, or
+            a path relative to it) that workers write each output to, instead of
+            sending it back here. Outputs are then the paths of those files:
+            `<dir>/<input index>` for `bytes` outputs, written as-is, and
+            `<dir>/<input index>.pkl` for anything else, pickled (a generator
+            `function_`'s items are `<input index>-<item number>`). Keeps large
+            outputs (images, parquet shards) off this machine. Defaults to None.
+        retries (int, optional):
+            How many more times to run an input whose call failed in a retryable
+            way, each after a longer wait (1s, 2s, 4s, ... up to a minute), before
+            giving up on it. Infrastructure failures (a worker running out of
+            memory or crashing, its container stopping) are always retryable:
+            the input reruns on a fresh worker instead of failing the job.
+            Defaults to 0 (no retries).
+        retry_on (Iterable[type[BaseException]], optional):
+            Exception types raised by `function_` (subclasses included) that
+            are retryable too, e.g. `(TimeoutError, ConnectionError)` for flaky
+            network calls. Defaults to () (exceptions from `function_` are never
+            retried).
+        speculative (bool, optional):
+            Once every input has started, rerun the calls that are taking much
+            longer than usual on idle workers and keep whichever copy finishes
+            first, so a few slow machines or unlucky inputs don't hold up the
+            whole job. `function_` may run more than once for those inputs, so
+            its side effects should be safe to repeat. Can't be used with a
+            generator function or `detach=True`. Defaults to False.
+        affinity (Callable | Hashable, optional):
+            Keeps inputs that share a key on the same node, e.g. inputs that
+            read the same shard from the shared workspace bucket, so each node
+            only reads the shards its inputs need. Either a function called
+            with each input's arguments (like `function_`) that returns its
+            key, or a key to look up in each input (`affinity="shard"` for
+            dict inputs). Idle nodes still take work from busy ones, whole
+            keys at a time where they can. Defaults to None (inputs go to
+            whichever node asks first).
+        cost (Callable | Hashable, optional):
+            How expensive each input is, relative to the others (e.g. its file
+            size or row count), the same way as `affinity`: a function of its
+            arguments or a key to look up in it. Nodes start the most
+            expensive inputs they hold first and idle nodes take the cheapest
+            from busy ones, so a few long calls don't start last and hold up
+            the end of a skewed job. Defaults to None (inputs start in order).
 
     Returns:
         List[Any] or Generator[Any, None, None]:
-            A list containing the objects returned by `function_` in no particular order.
+            A list containing the objects returned by `function_`, in no particular
+            order unless `ordered=True`.
             If `generator=True`, returns a generator that yields results as they are produced.
 
     Raises:
-        Any exception raised by `function_` on a worker is re-raised here on the
-        client. The raised exception has ``exc.burla_input_index`` set to the
+        Unless `on_error="collect"`, any exception raised by `function_` on a
+        worker is re-raised here on the client. The raised exception has ``exc.burla_input_index`` set to the
         index (in ``inputs``) of the item that triggered the failure, so you
         can identify which input broke without wrapping your UDF in try/except:
 
@@ -696,23 +882,86 @@ def remote_parallel_map(
         For more info see our overview: https://docs.burla.dev/overview
         or API-Reference: https://docs.burla.dev/api-reference
     """
+    streams_results = inspect.isgeneratorfunction(function_)
+    streams_results = streams_results or inspect.isasyncgenfunction(function_)
+    if func_concurrency < 1:
+        raise ValueError("`func_concurrency` must be at least 1.")
+    if batch_size is not None and batch_size < 1:
+        raise ValueError("`batch_size` must be at least 1.")
+    if batch_size and streams_results:
+        raise ValueError("`batch_size` can't be used with a generator function.")
+    if speculative and streams_results:
+        raise ValueError("`speculative` can't be used with a generator function.")
+    if speculative and detach:
+        raise ValueError("`speculative` can't be used with `detach=True`.")
+    if compression and compression not in DEFAULT_LEVELS:
+        raise ValueError(f"`compression` must be one of {list(DEFAULT_LEVELS)}.")
+
     start_time = time()
     udf_error_event = Event()
 
-    inputs = [(i,) if not isinstance(i, tuple) else i for i in inputs]
-    if not inputs:
+    if affinity is not None and not callable(affinity):
+        affinity = _key_lookup(affinity)
+    if cost is not None and not callable(cost):
+        cost = _key_lookup(cost)
+    inputs = InputStream(inputs, n_inputs, affinity, cost)
+    if inputs.is_empty():
         return iter([]) if generator else []
 
     if grow and image is None:
         image = f"python:3.{sys.version_info.minor}"
 
+    if result_sink and not result_sink.startswith(SHARED_WORKSPACE_PATH + "/"):
+        result_sink = f"{SHARED_WORKSPACE_PATH}/{result_sink.strip('/')}"
+    if result_sink:
+        # Worker paths, so POSIX whatever this machine is. Workers also resolve
+        # symlinks before writing (see worker_server.run_job).
+        result_sink = posixpath.normpath(result_sink)
+        if not result_sink.startswith(SHARED_WORKSPACE_PATH + "/"):
+            raise ValueError(f"`result_sink` must be in {SHARED_WORKSPACE_PATH}.")
+
+    # By name: workers match them against the type of each exception raised.
+    retry_on = [f"{type_.__module__}.{type_.__qualname__}" for type_ in retry_on]
+
     # TODO: rename internally
     background = detach
 
     # ------------------------------------------------
     # TODO: implement internally instead of wrapping:
-    def wrapped_function_(args_tuple):
-        return function_(*args_tuple)
+    # Workers call batch_size wrappers once per batch and split the return
+    # value back into per-input results. Async and generator wrappers stay
+    # coroutine/generator functions so workers know to run them on their event
+    # loop and stream what they yield.
+    if inspect.isasyncgenfunction(function_):
+
+        async def wrapped_function_(args_tuple):
+            async for item in function_(*args_tuple):
+                yield item
+
+    elif inspect.isgeneratorfunction(function_):
+
+        def wrapped_function_(args_tuple):
+            yield from function_(*args_tuple)
+
+    elif batch_size and inspect.iscoroutinefunction(function_):
+
+        async def wrapped_function_(args_tuples):
+            return await function_(_batch_argument(args_tuples))
+
+    elif batch_size:
+
+        def wrapped_function_(args_tuples):
+            return function_(_batch_argument(args_tuples))
+
+    elif inspect.iscoroutinefunction(function_):
+
+        async def wrapped_function_(args_tuple):
+            return await function_(*args_tuple)
+
+    else:
+
+        def wrapped_function_(args_tuple):
+            return function_(*args_tuple)
 
     wrapped_function_.__name__ = function_.__name__
 
@@ -726,7 +975,13 @@ def remote_parallel_map(
     raise_on_call_time_local_imports(function_, scan, by_value_module_names)
     # ------------------------------------------------
 
-    max_parallelism = max_parallelism if max_parallelism else len(inputs)
+    if not max_parallelism:
+        max_parallelism = inputs.n_inputs_estimate or UNSIZED_INPUTS_MAX_PARALLELISM
+    serialization_threads = serialization_threads or DEFAULT_SERIALIZATION_THREADS
+    if compression:
+        compression = Compression(
+            compression, compression_level, compression_threshold_bytes
+        )
     uid = base64.urlsafe_b64encode(uuid4().bytes[:9]).decode()
     job_id = f"{function_.__name__}-{uid}"
 
@@ -740,8 +995,9 @@ def remote_parallel_map(
             sigmap={}
         )  # <- .start will overwrite my handlers without sigmap={}
         spinner.start()
+        n_inputs_text = inputs.n_inputs_estimate or "?"
         spinner.text = (
-            f"Preparing to call `{function_.__name__}` on {len(inputs)} inputs ..."
+            f"Preparing to call `{function_.__name__}` on {n_inputs_text} inputs ..."
         )
     terminal_cancel_event = Event()
     inputs_done_event = Event()
@@ -774,6 +1030,16 @@ def remote_parallel_map(
                     func_gpu=func_gpu,
                     region=region,
                     disk_gb=disk_gb,
+                    serialization_threads=serialization_threads,
+                    ordered=ordered,
+                    on_error=on_error,
+                    compression=compression,
+                    batch_size=batch_size,
+                    func_concurrency=func_concurrency,
+                    result_sink=result_sink,
+                    retries=retries,
+                    retry_on=retry_on,
+                    speculative=speculative,
                 )
             )
         except BaseException:
@@ -827,13 +1093,17 @@ def remote_parallel_map(
     def _output_generator():
         try:
             n_results = 0
-            while n_results != len(inputs):
+            # A generator function's inputs have any number of outputs each, so
+            # its outputs run until the job is done and all of them are out.
+            while streams_results or not (
+                inputs.exhausted and n_results == inputs.n_inputs
+            ):
                 try:
                     output = return_queue.get(timeout=0.1)
                 except Empty:
                     # Only stop waiting once the job itself is done: it
                     # ended early, and the checks below say why.
-                    if job_thread.is_alive():
+                    if job_thread.is_alive() or not return_queue.empty():
                         continue
                     break
                 yield output
@@ -859,7 +1129,7 @@ def remote_parallel_map(
 
             if spinner:
                 spinner.text = (
-                    f"Done! {len(inputs)} `{function_.__name__}` calls completed."
+                    f"Done! {inputs.n_inputs} `{function_.__name__}` calls completed."
                 )
                 spinner.ok("OK")
         except BaseException as e:
@@ -127,7 +127,7 @@ class RemoteParallelMapReporter:
     def __init__(self, **kwargs):
         self.spinner = kwargs["spinner"]
         self.function_name = kwargs["function_"].__name__
-        self.input_count = len(kwargs["inputs"])
+        self.inputs = kwargs["inputs"]
         self.function_size_gb = kwargs.get("function_size_gb", 0.0)
         self.function_cpu = kwargs["func_cpu"]
         self.function_ram = kwargs["func_ram"]
@@ -135,11 +135,16 @@ class RemoteParallelMapReporter:
         self.generator = kwargs["generator"]
         self.grow = kwargs["grow"]
         self.max_parallelism = kwargs["max_parallelism"]
+        self.compression = kwargs["compression"]
         self.job_id = kwargs["job_id"]
         self.session = kwargs["session"]
         self.project_id = _get_project_id()
         self.spinner_enabled = bool(self.spinner)
 
+    @property
+    def input_count(self):
+        return self.inputs.n_inputs_estimate or "?"
+
     def _write_message(self, message: str):
         if self.spinner:
             safe_spinner_write(self.spinner, message)
@@ -217,7 +222,10 @@ class RemoteParallelMapReporter:
         if not self.spinner:
             return
         # Due to status lag, remaining inputs can briefly be lower than reported parallelism.
-        running_inputs = min(total_parallelism, self.input_count - completed_inputs)
+        running_inputs = total_parallelism
+        if self.inputs.n_inputs_estimate is not None:
+            remaining_inputs = self.inputs.n_inputs_estimate - completed_inputs
+            running_inputs = min(total_parallelism, remaining_inputs)
         message = (
             f"Calling `{self.function_name}`: {completed_inputs}/{self.input_count} done, "
             f"{running_inputs} running."
@@ -233,7 +241,11 @@ class RemoteParallelMapReporter:
         self.spinner.text = message
 
     async def log_job_success_telemetry(self, total_runtime: float):
-        message = f"Job {self.job_id} completed successfully, total_runtime={total_runtime:.2f}s."
+        message = f"Job {self.job_id} completed successfully, total_runtime={total_runtime:.2f}s, "
+        message += f"{self.inputs.serialization_summary()}"
+        if self.compression:
+            message += f", {self.compression.summary()}"
+        message += "."
         await self._log_telemetry_async(message, self.session, project_id=self.project_id)
 
     def set_preparing_message(self):
@@ -0,0 +1,45 @@
+from queue import Queue
+
+# Results that may wait for a slower, earlier input before being released.
+MIN_ORDERED_RESULTS_WINDOW = 10_000
+
+# What a generator UDF's input returns: its outputs are the items it yielded.
+NO_RESULT = object()
+
+
+class OrderedResults:
+    """Releases results to `return_queue` in input order.
+
+    Only inputs inside `window` of the oldest missing result are uploaded (see
+    `accepts`), so however long one input holds up the line, at most `window`
+    finished results ever wait here, and the input holding them up is always
+    uploadable.
+    """
+
+    def __init__(self, return_queue: Queue, window: int):
+        self.return_queue = return_queue
+        self.window = window
+        self.next_index = 0
+        self._waiting = {}
+        self._streamed = {}  # input_index -> items yielded before its turn
+
+    def accepts(self, input_index: int) -> bool:
+        return input_index < self.next_index + self.window
+
+    def put_item(self, input_index: int, item):
+        """An item a generator UDF yielded for `input_index`, released as soon
+        as every earlier input has finished."""
+        if input_index == self.next_index:
+            self.return_queue.put_nowait(item)
+        else:
+            self._streamed.setdefault(input_index, []).append(item)
+
+    def put(self, input_index: int, return_value):
+        self._waiting[input_index] = return_value
+        while self.next_index in self._waiting:
+            return_value = self._waiting.pop(self.next_index)
+            if return_value is not NO_RESULT:
+                self.return_queue.put_nowait(return_value)
+            self.next_index += 1
+            for item in self._streamed.pop(self.next_index, []):
+                self.return_queue.put_nowait(item)
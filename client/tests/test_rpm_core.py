@@ -13,6 +13,8 @@ Covers:
 
 from __future__ import annotations
 
+from uuid import uuid4
+
 import pytest
 
 pytestmark = pytest.mark.e2e
@@ -66,6 +68,34 @@ def test_list_inputs_not_unpacked(rpm_subprocess, local_dev_cluster):
     assert result["outputs"] == [6]
 
 
+def test_unsized_iterable_inputs(rpm_subprocess, local_dev_cluster):
+    source = "def test_function(x):\n    return x * 2\n"
+    # A range iterator has no len() but still pickles into the subprocess.
+    result = rpm_subprocess(source, iter(range(500)), timeout_seconds=60)
+    assert result["ok"], result.get("traceback")
+    assert sorted(result["outputs"]) == [n * 2 for n in range(500)]
+
+
+def test_unsized_iterable_with_n_inputs_hint(rpm_subprocess, local_dev_cluster):
+    source = "def test_function(x):\n    return x\n"
+    # The hint only sizes the job; every yielded item still runs.
+    result = rpm_subprocess(source, iter(range(50)), timeout_seconds=60, n_inputs=10)
+    assert result["ok"], result.get("traceback")
+    assert sorted(result["outputs"]) == list(range(50))
+
+
+def test_broadcast_value_readable_in_function(rpm_subprocess, local_dev_cluster):
+    source = (
+        "import burla\n"
+        "SQUARES = burla.broadcast({n: n * n for n in range(100)})\n"
+        "def test_function(x):\n"
+        "    return SQUARES.value[x]\n"
+    )
+    result = rpm_subprocess(source, list(range(100)), timeout_seconds=60)
+    assert result["ok"], result.get("traceback")
+    assert sorted(result["outputs"]) == sorted(n * n for n in range(100))
+
+
 # -------------------------------------------------------------------- section 2
 # (generator mode is below; order within file kept for readability)
 
@@ -91,6 +121,311 @@ def test_generator_mode_propagates_udf_error(rpm_subprocess, local_dev_cluster):
     assert "boom on 7" in result["exception_message"]
 
 
+def test_ordered_outputs_match_input_order(rpm_subprocess, local_dev_cluster):
+    # How results are held back is covered in tests/test_ordered_results.py.
+    source = "def test_function(x):\n    return x\n"
+    inputs = list(range(60))
+    result = rpm_subprocess(source, inputs, timeout_seconds=60, ordered=True)
+    assert result["ok"], result.get("traceback")
+    assert result["outputs"] == inputs
+
+
+def test_ordered_generator_mode(rpm_subprocess, local_dev_cluster):
+    source = "def test_function(x):\n    return x * 3\n"
+    result = rpm_subprocess(
+        source, list(range(40)), timeout_seconds=60, generator=True, ordered=True
+    )
+    assert result["ok"], result.get("traceback")
+    assert result["outputs"] == [n * 3 for n in range(40)]
+
+
+def test_on_error_collect_keeps_running(rpm_subprocess, local_dev_cluster):
+    source = (
+        "def test_function(x):\n"
+        "    if x % 10 == 3:\n"
+        "        raise ValueError(f'bad {x}')\n"
+        "    return x\n"
+    )
+    result = rpm_subprocess(source, list(range(30)), timeout_seconds=60, on_error="collect")
+    assert result["ok"], result.get("traceback")
+    outputs = dict(result["outputs"])
+    assert sorted(outputs) == list(range(30))
+    for input_index, output in outputs.items():
+        if input_index % 10 == 3:
+            assert isinstance(output, ValueError)
+            assert str(output) == f"bad {input_index}"
+        else:
+            assert output == input_index
+
+
+def test_fast_inputs_pipelined_with_errors(rpm_subprocess, local_dev_cluster):
+    # Sub-millisecond calls get pipelined to each worker in batches; an error
+    # mid-batch must only fail its own input.
+    source = (
+        "def test_function(x):\n"
+        "    if x % 97 == 5:\n"
+        "        raise ValueError(f'bad {x}')\n"
+        "    return x * 2\n"
+    )
+    inputs = list(range(20_000))
+    result = rpm_subprocess(source, inputs, timeout_seconds=120, on_error="collect")
+    assert result["ok"], result.get("traceback")
+    outputs = dict(result["outputs"])
+    assert sorted(outputs) == inputs
+    for input_index, output in outputs.items():
+        if input_index % 97 == 5:
+            assert isinstance(output, ValueError)
+        else:
+            assert output == input_index * 2
+
+
+def test_batch_size_calls_function_on_lists(rpm_subprocess, local_dev_cluster):
+    source = (
+        "def test_function(batch):\n"
+        "    assert isinstance(batch, list) and len(batch) <= 50\n"
+        "    return [x * 2 for x in batch]\n"
+    )
+    inputs = list(range(1_000))
+    result = rpm_subprocess(
+        source, inputs, timeout_seconds=60, ordered=True, batch_size=50
+    )
+    assert result["ok"], result.get("traceback")
+    assert result["outputs"] == [x * 2 for x in inputs]
+
+
+def test_batch_size_splits_dataframe_by_row(rpm_subprocess, local_dev_cluster):
+    source = (
+        "import pandas as pd\n"
+        "def test_function(batch):\n"
+        "    return pd.DataFrame({'x': batch, 'doubled': [x * 2 for x in batch]})\n"
+    )
+    inputs = list(range(100))
+    result = rpm_subprocess(
+        source, inputs, timeout_seconds=60, ordered=True, batch_size=10
+    )
+    assert result["ok"], result.get("traceback")
+    assert [row["doubled"] for row in result["outputs"]] == [x * 2 for x in inputs]
+
+
+def test_batch_size_wrong_result_count_raises(rpm_subprocess, local_dev_cluster):
+    source = "def test_function(batch):\n    return batch[:1]\n"
+    result = rpm_subprocess(source, list(range(10)), timeout_seconds=60, batch_size=5)
+    assert not result["ok"]
+    assert result["exception_type"] == "ValueError"
+    assert "one result per input" in result["exception_message"]
+
+
+def test_func_concurrency_runs_calls_concurrently(rpm_subprocess, local_dev_cluster):
+    # Calls pair up at a barrier, so this only finishes when the one worker
+    # runs calls concurrently. Prints must still land on their own input.
+    source = (
+        "import threading, time\n"
+        "barrier = threading.Barrier(2, timeout=20)\n"
+        "def test_function(x):\n"
+        "    barrier.wait()\n"
+        "    print(f'line-{x}')\n"
+        "    time.sleep(0.1)\n"
+        "    return x\n"
+    )
+    result = rpm_subprocess(
+        source, list(range(40)), timeout_seconds=90, max_parallelism=1, func_concurrency=8
+    )
+    assert result["ok"], result.get("traceback")
+    assert sorted(result["outputs"]) == list(range(40))
+    lines = [line.strip() for line in result["stdout"].splitlines()]
+    for i in range(40):
+        assert f"line-{i}" in lines, f"missing line-{i}"
+
+
+def test_async_function_runs_on_worker_event_loop(rpm_subprocess, local_dev_cluster):
+    # 200 half-second sleeps on one worker only fit the timeout if they
+    # overlap on the worker's event loop.
+    source = (
+        "import asyncio\n"
+        "async def test_function(x):\n"
+        "    await asyncio.sleep(0.5)\n"
+        "    print(f'line-{x}')\n"
+        "    return x + 1\n"
+    )
+    result = rpm_subprocess(
+        source, list(range(200)), timeout_seconds=60, max_parallelism=1, func_concurrency=100
+    )
+    assert result["ok"], result.get("traceback")
+    assert sorted(result["outputs"]) == list(range(1, 201))
+    lines = [line.strip() for line in result["stdout"].splitlines()]
+    for i in range(200):
+        assert f"line-{i}" in lines, f"missing line-{i}"
+
+
+def test_large_payloads_through_shared_ring(rpm_subprocess, local_dev_cluster):
+    # Inputs and results over the 1MB threshold go through the shared ring,
+    # and enough of them that it wraps around (and fills up) several times.
+    # Twice: the same workers reopen the next job's rings after a reset.
+    source = "def test_function(data):\n    return data[::-1]\n"
+    inputs = [bytes([i]) * (3 * 1024**2 + i) for i in range(100)]
+    for _ in range(2):
+        result = rpm_subprocess(
+            source, inputs, timeout_seconds=120, ordered=True, max_parallelism=2
+        )
+        assert result["ok"], result.get("traceback")
+        assert result["outputs"] == [data[::-1] for data in inputs]
+
+
+def test_mid_size_payloads_pipelined_over_socket(rpm_subprocess, local_dev_cluster):
+    # Fast calls with inputs and results between 64KB and the 1MB ring
+    # threshold: deep pipelines of them fill both directions of the worker's
+    # socket at once, which must not stall the node or the worker.
+    source = "def test_function(data):\n    return data[::-1]\n"
+    sizes = [64 * 1024, 256 * 1024, 1024**2 - 4096]
+    inputs = [bytes([i % 256]) * sizes[i % 3] for i in range(300)]
+    result = rpm_subprocess(
+        source, inputs, timeout_seconds=120, ordered=True, max_parallelism=1
+    )
+    assert result["ok"], result.get("traceback")
+    assert result["outputs"] == [data[::-1] for data in inputs]
+
+
+def test_generator_function_streams_each_item(rpm_subprocess, local_dev_cluster):
+    # Input 0 yields nothing; the rest yield one item per unit of their value.
+    source = (
+        "def test_function(n):\n"
+        "    for i in range(n):\n"
+        "        yield (n, i)\n"
+    )
+    result = rpm_subprocess(source, list(range(20)), timeout_seconds=60, ordered=True)
+    assert result["ok"], result.get("traceback")
+    assert result["outputs"] == [(n, i) for n in range(20) for i in range(n)]
+
+
+def test_result_sink_returns_paths(rpm_subprocess, local_dev_cluster):
+    sink = f"burla-tests/result-sink-{uuid4().hex[:8]}"
+    source = "def test_function(i):\n    return bytes([i]) * 1000 if i % 2 else {'i': i}\n"
+    result = rpm_subprocess(
+        source, list(range(10)), timeout_seconds=60, ordered=True, result_sink=sink
+    )
+    assert result["ok"], result.get("traceback")
+    expected = [
+        f"/workspace/shared/{sink}/{i}" if i % 2 else f"/workspace/shared/{sink}/{i}.pkl"
+        for i in range(10)
+    ]
+    assert result["outputs"] == expected
+
+    # Read back where the results were written, the shared mount.
+    source = (
+        "import pickle\n"
+        "def test_function(path):\n"
+        "    with open(path, 'rb') as file:\n"
+        "        data = file.read()\n"
+        "    return data if not path.endswith('.pkl') else pickle.loads(data)\n"
+    )
+    result = rpm_subprocess(source, expected, timeout_seconds=60, ordered=True)
+    assert result["ok"], result.get("traceback")
+    assert result["outputs"] == [
+        bytes([i]) * 1000 if i % 2 else {"i": i} for i in range(10)
+    ]
+
+
+def test_retry_on_reruns_failed_inputs(rpm_subprocess, local_dev_cluster):
+    # Every input fails its first call. The marker is in the shared mount
+    # because the rerun can land on another worker.
+    marker_dir = f"/workspace/shared/burla-tests/retry-{uuid4().hex[:8]}"
+    source = (
+        "import os\n"
+        "def test_function(i):\n"
+        f"    os.makedirs('{marker_dir}', exist_ok=True)\n"
+        f"    marker = '{marker_dir}/' + str(i)\n"
+        "    if not os.path.exists(marker):\n"
+        "        open(marker, 'w').close()\n"
+        "        raise TimeoutError('flaky')\n"
+        "    return i\n"
+    )
+    result = rpm_subprocess(
+        source, list(range(5)), timeout_seconds=60, retries=1, retry_on=[TimeoutError]
+    )
+    assert result["ok"], result.get("traceback")
+    assert sorted(result["outputs"]) == list(range(5))
+
+
+def test_speculative_reruns_stragglers(rpm_subprocess, local_dev_cluster):
+    # Input 0's first call hangs past the timeout, so the job only finishes if
+    # a speculative copy of it wins. Each output must still arrive once.
+    marker_dir = f"/workspace/shared/burla-tests/speculative-{uuid4().hex[:8]}"
+    source = (
+        "import os, time\n"
+        "def test_function(i):\n"
+        f"    os.makedirs('{marker_dir}', exist_ok=True)\n"
+        f"    marker = '{marker_dir}/' + str(i)\n"
+        "    if i == 0 and not os.path.exists(marker):\n"
+        "        open(marker, 'w').close()\n"
+        "        time.sleep(600)\n"
+        "    return i\n"
+    )
+    result = rpm_subprocess(source, list(range(20)), timeout_seconds=90, speculative=True)
+    assert result["ok"], result.get("traceback")
+    assert sorted(result["outputs"]) == list(range(20))
+
+
+def test_affinity_routes_every_input(rpm_subprocess, local_dev_cluster):
+    # Each node's workers share /worker_service_storage: the first to link an
+    # id file there names the node for all of them.
+    source = (
+        "import os, uuid\n"
+        "def test_function(item):\n"
+        "    path = '/worker_service_storage/test-node-id'\n"
+        "    temporary_path = f'{path}.{uuid.uuid4().hex}'\n"
+        "    with open(temporary_path, 'w') as file:\n"
+        "        file.write(uuid.uuid4().hex)\n"
+        "    try:\n"
+        "        os.link(temporary_path, path)\n"
+        "    except FileExistsError:\n"
+        "        pass\n"
+        "    os.remove(temporary_path)\n"
+        "    with open(path) as file:\n"
+        "        return item['shard'], item['i'], file.read()\n"
+    )
+    inputs = [{"shard": i % 4, "i": i} for i in range(40)]
+    result = rpm_subprocess(source, inputs, timeout_seconds=60, affinity="shard")
+    assert result["ok"], result.get("traceback")
+    assert sorted(i for _, i, _ in result["outputs"]) == list(range(40))
+    nodes_by_shard = {}
+    for shard, _, node_id in result["outputs"]:
+        nodes_by_shard.setdefault(shard, set()).add(node_id)
+    assert all(len(node_ids) == 1 for node_ids in nodes_by_shard.values())
+
+
+def test_cost_runs_every_input(rpm_subprocess, local_dev_cluster):
+    # One worker runs one input at a time, so start times give the order the
+    # node handed them out in.
+    source = (
+        "import time\n"
+        "def test_function(item):\n"
+        "    started_at = time.time()\n"
+        "    time.sleep(0.05)\n"
+        "    return started_at, item['cost']\n"
+    )
+    inputs = [{"cost": (i * 7) % 20} for i in range(20)]
+    result = rpm_subprocess(
+        source, inputs, timeout_seconds=60, max_parallelism=1, cost="cost"
+    )
+    assert result["ok"], result.get("traceback")
+    costs_in_start_order = [cost for _, cost in sorted(result["outputs"])]
+    # Every input ran, most expensive first.
+    assert costs_in_start_order == sorted(range(20), reverse=True)
+
+
+@pytest.mark.parametrize("codec", ["zstd", "lz4"])
+def test_compressed_roundtrip(rpm_subprocess, local_dev_cluster, codec):
+    # Repetitive text well over the threshold so chunks and batches really are
+    # compressed both ways.
+    source = "def test_function(text):\n    return text.upper()\n"
+    inputs = [f"input {i} " * 10_000 for i in range(20)]
+    result = rpm_subprocess(
+        source, inputs, timeout_seconds=60, ordered=True, compression=codec
+    )
+    assert result["ok"], result.get("traceback")
+    assert result["outputs"] == [text.upper() for text in inputs]
+
+
 # -------------------------------------------------------------------- section 3 & 4
 
 def test_stdout_surfaced_to_local_terminal(rpm_subprocess, local_dev_cluster):
@@ -29,12 +29,17 @@ NODES: dict[str, dict] = {}
 
 # job_id -> job dict. Same fields the firestore job docs used, plus
 # "assigned_nodes": {instance_name: {"current_num_results", "client_contact_last_1s",
-# "last_push_at"}}. Terminal jobs stay in memory (they're small) and are
+# "queued_inputs", "results_per_sec", "last_push_at"}}. Terminal jobs stay in memory (they're small) and are
 # persisted to history on every durable mutation.
 JOBS: dict[str, dict] = {}
 
 TERMINAL_JOB_STATUSES = ("COMPLETED", "FAILED", "CANCELED")
 NODE_FRESHNESS_SEC = 15
+# Every stealing node of a job reads its peers, whose load is only pushed about
+# once a second: job_id -> (built at, peers_for_job's answer), rebuilt at most
+# this often.
+PEERS_SNAPSHOT_MAX_AGE_SEC = 1
+_peers_snapshots: dict[str, tuple[float, dict]] = {}
 
 _loop: asyncio.AbstractEventLoop | None = None
 _node_event_queues: set[asyncio.Queue] = set()
@@ -384,6 +389,8 @@ def update_job_progress(
     instance_name: str,
     current_num_results: int | None = None,
     client_contact_last_1s: bool | None = None,
+    queued_inputs: int | None = None,
+    results_per_sec: float | None = None,
 ):
     with _lock:
         job = _get_or_load_job(job_id)
@@ -396,6 +403,10 @@ def update_job_progress(
             progress["current_num_results"] = current_num_results
         if client_contact_last_1s is not None:
             progress["client_contact_last_1s"] = client_contact_last_1s
+        if queued_inputs is not None:
+            progress["queued_inputs"] = queued_inputs
+        if results_per_sec is not None:
+            progress["results_per_sec"] = results_per_sec
         now = time()
         progress["last_push_at"] = now
         if now - _counts_flushed_at.get(job_id, 0) >= COUNTS_FLUSH_INTERVAL_SEC:
@@ -481,24 +492,48 @@ def record_replacement_request(
 
 
 def peers_for_job(job_id: str) -> dict:
-    """RUNNING nodes assigned to this job (the input-stealing ring) plus the
-    ids of nodes still BOOTING, so a stealer can tell whether expected nodes
-    might still join."""
+    """RUNNING nodes assigned to this job (the input-stealing ring) with the
+    load each last pushed (the job's load map, None before its first push),
+    plus the ids of nodes still BOOTING, so a stealer can tell whether
+    expected nodes might still join. Up to PEERS_SNAPSHOT_MAX_AGE_SEC old."""
     with _lock:
         now = time()
-        peers = [
-            {"instance_name": name, "host": node.get("host")}
-            for name, node in sorted(NODES.items())
-            if node.get("status") == "RUNNING"
-            and node.get("current_job") == job_id
-            and node_is_fresh(node, now)
-        ]
+        snapshot = _peers_snapshots.get(job_id)
+        if snapshot is not None and now - snapshot[0] < PEERS_SNAPSHOT_MAX_AGE_SEC:
+            return snapshot[1]
+        for stale_job_id in [
+            snapshot_job_id
+            for snapshot_job_id, (built_at, _) in _peers_snapshots.items()
+            if now - built_at >= PEERS_SNAPSHOT_MAX_AGE_SEC
+        ]:
+            del _peers_snapshots[stale_job_id]
+        job = _get_or_load_job(job_id)
+        assigned = job["assigned_nodes"] if job is not None else {}
+        peers = []
+        for name, node in sorted(NODES.items()):
+            if not (
+                node.get("status") == "RUNNING"
+                and node.get("current_job") == job_id
+                and node_is_fresh(node, now)
+            ):
+                continue
+            progress = assigned.get(name, {})
+            peers.append(
+                {
+                    "instance_name": name,
+                    "host": node.get("host"),
+                    "queued_inputs": progress.get("queued_inputs"),
+                    "results_per_sec": progress.get("results_per_sec"),
+                }
+            )
         booting = [
             name
             for name, node in NODES.items()
             if node.get("status") == "BOOTING" and not node.get("loaded_from_history")
         ]
-    return {"peers": peers, "booting_node_ids": booting}
+        peers_and_booting = {"peers": peers, "booting_node_ids": booting}
+        _peers_snapshots[job_id] = (now, peers_and_booting)
+    return peers_and_booting
 
 
 def _job_summary(job: dict) -> dict:
@@ -9,8 +9,8 @@ cluster token. These replace every node -> Firestore write and watch:
 - POST /v1/nodes/{id}/metrics:batch per-second node and task resource samples.
 - POST /v1/nodes/{id}/self_delete node asks the head to delete its VM
                                  (inactivity shutdown, boot failure).
-- GET  /v1/jobs/{id}/peers       input-stealing ring (replaces the firestore
-                                 neighbor query).
+- GET  /v1/jobs/{id}/peers       input-stealing peers and their load (replaces
+                                 the firestore neighbor query).
 - POST /v1/jobs/{id}/logs:batch  UDF log documents from JobLogWriter.
 """
 
@@ -79,6 +79,8 @@ async def push_node_state(instance_name: str, request: Request):
             instance_name,
             current_num_results=progress.get("current_num_results"),
             client_contact_last_1s=progress.get("client_contact_last_1s"),
+            queued_inputs=progress.get("queued_inputs"),
+            results_per_sec=progress.get("results_per_sec"),
         )
 
     job_id = (progress or {}).get("job_id") or merged.get("current_job")
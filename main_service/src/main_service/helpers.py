@@ -14,7 +14,7 @@ from main_service import PROJECT_ID, BURLA_BACKEND_URL
 #  - `/v1/cluster/state`              ~every 10-100ms while waiting for nodes to boot
 #  - `/v1/cluster/nodes/{instance}`   ~every 2-6s per booting node
 #  - `/v1/nodes/{instance}/state`     ~every 1s per node (state push)
-#  - `/v1/jobs/{id}/peers`            ~every 1s per node while stealing
+#  - `/v1/jobs/{id}/peers`            ~every 2s per node while stealing
 # Without filtering these drown real request logs in stdout (uvicorn.access)
 # and our `log_and_time_requests` middleware.
 _CHATTY_CLIENT_PATH_SUBSTRINGS = (
@@ -83,6 +83,9 @@ class LocalDockerProvider:
         host_config = docker_client.create_host_config(
             # Privileged so the node can run its own dockerd for its workers.
             privileged=True,
+            # Workers' SharedRing files live in the node's /dev/shm (two 64MB
+            # rings each), which docker otherwise caps at 64MB.
+            shm_size="4g",
             port_bindings={port: ("127.0.0.1", port)},
             network_mode=LOCAL_DEV_NETWORK,
             # The head runs on the docker host, so nodes reach it (MAIN_SERVICE_URL
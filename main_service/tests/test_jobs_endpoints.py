@@ -118,3 +118,52 @@ def test_patch_job_updates_fields_directly(
         return doc.get("client_has_all_results") if doc else None
 
     assert wait_for_fixture(_flag, timeout=5) is True
+
+
+def test_peers_serve_each_nodes_reported_load(
+    main_http_client,
+    node_push_client,
+    local_dev_cluster,
+    isolated_job_id,
+    cleanup_job,
+    wait_for_fixture,
+):
+    job_id = cleanup_job(isolated_job_id())
+    _seed_running_job(main_http_client, job_id, n_inputs=100)
+    instance_name = f"burla-node-test{int(time.time())%100000}"
+
+    def _push_load(queued_inputs, results_per_sec):
+        state = {
+            "status": "RUNNING",
+            "current_job": job_id,
+            "job_progress": {
+                "job_id": job_id,
+                "current_num_results": 4,
+                "client_contact_last_1s": True,
+                "queued_inputs": queued_inputs,
+                "results_per_sec": results_per_sec,
+            },
+        }
+        resp = node_push_client.put(f"/v1/nodes/{instance_name}/state", json=state)
+        assert resp.status_code == 200, resp.text
+
+    def _served_load():
+        resp = node_push_client.get(f"/v1/jobs/{job_id}/peers")
+        assert resp.status_code == 200, resp.text
+        peers = {peer["instance_name"]: peer for peer in resp.json()["peers"]}
+        peer = peers.get(instance_name)
+        if peer is None:
+            return None
+        return peer["queued_inputs"], peer["results_per_sec"]
+
+    try:
+        _push_load(37, 2.5)
+        wait_for_fixture(lambda: _served_load() == (37, 2.5), timeout=10)
+        # The load map is served from a snapshot, which must pick up the
+        # node's next push within a couple of seconds.
+        _push_load(5, 8.0)
+        wait_for_fixture(lambda: _served_load() == (5, 8.0), timeout=3)
+    finally:
+        node_push_client.put(
+            f"/v1/nodes/{instance_name}/state", json={"status": "DELETED"}
+        )
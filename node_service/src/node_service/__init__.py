@@ -53,7 +53,12 @@ NODE_AUTH_DIR = Path("/opt/burla/node_auth")
 NODE_AUTH_CREDENTIALS_PATH = NODE_AUTH_DIR / "burla_credentials.json"
 AZURE_DELETE_LEASE_PATH = Path("/etc/burla/azure-delete-lease.json")
 
-from node_service.helpers import Logger, ResultsEndpointFilter, SizedQueue
+from node_service.helpers import (
+    Logger,
+    ResultsEndpointFilter,
+    SizedPriorityQueue,
+    SizedQueue,
+)
 
 # Upper bound on how many UDF log documents we'll buffer in memory
 # between /results polls. If the client stops polling this caps
@@ -68,7 +73,10 @@ STATE_PUSH_INTERVAL_SEC = 1
 def REINIT_SELF(SELF):
     SELF["workers"] = []
     SELF["idle_workers"] = []
-    SELF["inputs_queue"] = SizedQueue()
+    # Highest cost first (see input_costs), then in the order they arrived.
+    SELF["inputs_queue"] = SizedPriorityQueue(
+        lambda input_with_index: SELF["input_costs"].get(input_with_index[0], 0)
+    )
     SELF["results_queue"] = SizedQueue()
     SELF["current_job"] = None
     SELF["current_parallelism"] = 0
@@ -105,17 +113,66 @@ def REINIT_SELF(SELF):
     SELF["cpu_pressure_monitor_task"] = None
     SELF["worker_readd_task"] = None
     SELF["last_pressure_retirement_at"] = 0.0
-    # The job's pickled function, kept so workers booted mid-job (re-adds,
-    # slot trades) can be assigned without the client.
-    SELF["function_pkl"] = None
+    # Payload cache file of the current job's function, kept so workers booted
+    # mid-job (re-adds, slot trades) can be assigned without the client.
+    SELF["function_path"] = None
+    SELF["broadcast_paths"] = []
+    # The job's compression settings from the client ({"codec", "level",
+    # "threshold_bytes"}), or None to send everything raw.
+    SELF["compression"] = None
+    # Inputs per call for vectorized UDFs, None to call once per input.
+    SELF["batch_size"] = None
+    # Calls each worker runs at once (on a thread pool when > 1).
+    SELF["func_concurrency"] = 1
+    # Directory in /workspace/shared workers write results to, sending back
+    # only their paths, or None to send results back.
+    SELF["result_sink"] = None
+    # Times an input is rerun after a retryable failure: an infrastructure
+    # failure (worker OOM, crash, container restart) or the function raising
+    # one of the `retry_on` exception types (by qualified name).
+    SELF["retries"] = 0
+    SELF["retry_on"] = []
+    # Retryable failures so far, per input index.
+    SELF["input_failures"] = {}
+    # Failed inputs waiting out their backoff before going back on the queue.
+    SELF["pending_retries"] = 0
+    # Speculative execution: once no node has inputs queued, idle workers
+    # rerun copies of inputs that are taking much longer than usual, and the
+    # first result wins. Indexes of inputs this node has handed out a copy of
+    # (to itself or a peer), those of them it already has a result for, and
+    # copies it got from peers (index -> the peer's host, which decides
+    # whether the copy's result or its own is the one delivered and counted).
+    SELF["speculative"] = False
+    SELF["speculated_inputs"] = set()
+    SELF["speculated_results"] = set()
+    SELF["speculative_copies"] = {}
+    # The job watcher's session to this job's peers (steals, speculative
+    # copies), shared with the workers claiming copies' results.
+    SELF["peer_session"] = None
+    # Affinity key (a hash from the client) per input index, for jobs that
+    # pass `affinity`: inputs sharing one are stolen together.
+    SELF["input_affinity"] = {}
+    # Cost hint from the client per input index, for jobs that pass `cost`:
+    # the most expensive inputs start first, stealers get the cheapest.
+    SELF["input_costs"] = {}
+    # Bytes before / after compression, reported in the slot_state debug event.
+    SELF["transfer_bytes"] = {
+        direction: {"before": 0, "after": 0}
+        for direction in ("inputs_received", "results_sent", "inputs_stolen")
+    }
     SELF["reboot_containers_after_job"] = False
     SELF["num_results_received"] = 0
+    # (timestamp, num_results_received) at each progress push, see head_client.
+    SELF["results_rate_samples"] = deque()
     SELF["pending_transfers"] = {}
     SELF["pending_result_batch"] = None
     SELF["pending_logs"] = deque(maxlen=MAX_PENDING_LOGS)
     SELF["pending_cluster_shutdown"] = False
     SELF["pending_cluster_restarted"] = False
     SELF["pending_dashboard_canceled"] = False
+    # Set whenever one of the above or the results queue gets something, to
+    # wake long-polling /results requests (see get_results).
+    SELF["results_news"] = asyncio.Event()
     SELF["active_client_request_count"] = 0
     SELF["last_client_activity_timestamp"] = time()
     # Whether the client's heartbeat channel has ever been up on this node.
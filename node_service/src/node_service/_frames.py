@@ -0,0 +1 @@
+../../../client/src/burla/_frames.py
\ No newline at end of file
@@ -13,6 +13,7 @@ import asyncio
 import json
 import os
 import ssl
+from time import time
 from typing import Optional
 
 import aiohttp
@@ -37,6 +38,9 @@ _SSL_CONTEXT = ssl.create_default_context(cafile=_CA_PATH) if _CA_PATH else None
 _session: Optional[aiohttp.ClientSession] = None
 _push_lock = asyncio.Lock()
 
+# The results per second pushed with job progress are averaged over this long.
+RESULTS_RATE_WINDOW_SEC = 10
+
 
 def _install_delete_lease(lease: dict):
     temporary_path = AZURE_DELETE_LEASE_PATH.with_suffix(".tmp")
@@ -56,6 +60,18 @@ def _get_session() -> aiohttp.ClientSession:
     return _session
 
 
+def _results_per_sec() -> float:
+    samples = SELF["results_rate_samples"]
+    now = time()
+    samples.append((now, SELF["num_results_received"]))
+    while now - samples[0][0] > RESULTS_RATE_WINDOW_SEC:
+        samples.popleft()
+    first_sample_at, first_num_results = samples[0]
+    if now == first_sample_at:
+        return 0.0
+    return (SELF["num_results_received"] - first_num_results) / (now - first_sample_at)
+
+
 async def push_state(
     status: Optional[str] = None,
     include_job_progress: bool = False,
@@ -73,6 +89,9 @@ async def push_state(
                 "job_id": SELF["current_job"],
                 "current_num_results": SELF["num_results_received"],
                 "client_contact_last_1s": SELF.get("client_contact_last_1s", True),
+                # The job's load map (see get_peers), for other nodes' stealers.
+                "queued_inputs": SELF["inputs_queue"].qsize(),
+                "results_per_sec": round(_results_per_sec(), 2),
             }
         session = _get_session()
         url = f"{MAIN_SERVICE_URL}/v1/nodes/{INSTANCE_NAME}/state"
@@ -94,10 +113,13 @@ def apply_job_signals(job_view: Optional[dict]):
         SELF["all_inputs_uploaded"] = True
     if job_view.get("cluster_shutdown"):
         SELF["pending_cluster_shutdown"] = True
+        SELF["results_news"].set()
     if job_view.get("cluster_restarted"):
         SELF["pending_cluster_restarted"] = True
+        SELF["results_news"].set()
     if job_view.get("dashboard_canceled"):
         SELF["pending_dashboard_canceled"] = True
+        SELF["results_news"].set()
     SELF["job_view"] = job_view
 
 
@@ -132,7 +154,9 @@ async def issue_certificate(csr: str) -> str:
 
 
 async def get_peers(job_id: str) -> dict:
-    """{"peers": [{"instance_name", "host"}, ...], "booting_node_ids": [...]}"""
+    """{"peers": [{"instance_name", "host", "queued_inputs", "results_per_sec"},
+    ...], "booting_node_ids": [...]}. The load fields are as of each peer's
+    last push, None before its first."""
     session = _get_session()
     url = f"{MAIN_SERVICE_URL}/v1/jobs/{job_id}/peers"
     async with session.get(url, headers=_HEADERS) as response:
@@ -1,11 +1,16 @@
 import asyncio
+import heapq
 import os
+import pickle
 import requests
+from collections import deque
 from itertools import groupby
 from typing import Optional
 import logging as python_logging
 from time import time
 
+import lz4.frame
+import zstandard
 from fastapi import Request
 from node_service import PROJECT_ID, BURLA_BACKEND_URL
 
@@ -24,6 +29,8 @@ class ResultsEndpointFilter(python_logging.Filter):
             or "/client-heartbeat" in path
             or "/get_inputs" in path
             or "/ack_transfer" in path
+            or "/stragglers" in path
+            or "/claim_result" in path
             or "/installing_package" in path
         )
 
@@ -51,6 +58,94 @@ class SizedQueue(asyncio.Queue):
         self.size_bytes -= size_bytes
         return item
 
+    def items(self) -> list:
+        """The queued items, in the order they would be taken."""
+        return [item for item, _ in self._queue]
+
+    def take_where(self, predicate) -> list:
+        """Removes the queued items `predicate` is true for, wherever they
+        are in the queue, and returns them in queue order."""
+        taken = []
+        kept = deque()
+        for item, size_bytes in self._queue:
+            if predicate(item):
+                taken.append(item)
+                self.size_bytes -= size_bytes
+            else:
+                kept.append((item, size_bytes))
+        self._queue = kept
+        return taken
+
+
+class SizedPriorityQueue(SizedQueue):
+    """A SizedQueue handing out the item `priority(item)` ranks highest first,
+    and items of equal priority in the order they were put."""
+
+    def __init__(self, priority, *args, **kwargs):
+        self.priority = priority
+        self.n_put = 0
+        super().__init__(*args, **kwargs)
+
+    def _init(self, maxsize):
+        self._queue = []
+
+    def _put(self, item_and_size):
+        item, size_bytes = item_and_size
+        self.n_put += 1
+        entry = (-self.priority(item), self.n_put, item, size_bytes)
+        heapq.heappush(self._queue, entry)
+        self.size_bytes += size_bytes
+
+    def _get(self):
+        _, _, item, size_bytes = heapq.heappop(self._queue)
+        self.size_bytes -= size_bytes
+        return item
+
+    def items(self) -> list:
+        return [item for _, _, item, _ in sorted(self._queue)]
+
+    def take_where(self, predicate) -> list:
+        taken = []
+        kept = []
+        for entry in sorted(self._queue):
+            if predicate(entry[2]):
+                taken.append(entry[2])
+                self.size_bytes -= entry[3]
+            else:
+                kept.append(entry)
+        # Sorted, so already a valid heap.
+        self._queue = kept
+        return taken
+
+
+# Same codecs as the client's burla/_compression.py. Compressed bodies are
+# labelled with their codec: the `compression` form field on uploads, this
+# header on responses.
+COMPRESSION_HEADER = "X-Burla-Compression"
+# On a `get_inputs` response: how many inputs the node has left queued, which
+# the stealer keeps to pick whom to steal from next.
+QUEUE_DEPTH_HEADER = "X-Burla-Queue-Depth"
+
+
+def compress(data, codec: str, level: int) -> bytes:
+    if codec == "zstd":
+        return zstandard.ZstdCompressor(level=level).compress(data)
+    return lz4.frame.compress(data, compression_level=level)
+
+
+def decompress(data, codec: str) -> bytes:
+    if codec == "zstd":
+        return zstandard.ZstdDecompressor().decompress(data)
+    return lz4.frame.decompress(data)
+
+
+def record_transfer_bytes(direction: str, n_bytes_before: int, n_bytes_after: int):
+    # Lazy import: this module is imported before SELF exists.
+    from node_service import SELF
+
+    SELF["transfer_bytes"][direction]["before"] += n_bytes_before
+    SELF["transfer_bytes"][direction]["after"] += n_bytes_after
+
 
 async def debug_log(event: str, **fields):
     """Structured engineering events, the counterpart to Logger.log: they land
@@ -1,5 +1,8 @@
+import hashlib
 import json
+import os
 import pickle
+import re
 from datetime import datetime, timezone
 from time import time
 from typing import Optional
@@ -20,13 +23,24 @@ from node_service import (
     get_request_files,
     head_client,
 )
-from node_service.helpers import Logger, debug_log
+from node_service._frames import dump_frames, load_frames
+from node_service.helpers import (
+    COMPRESSION_HEADER,
+    QUEUE_DEPTH_HEADER,
+    Logger,
+    compress,
+    debug_log,
+    decompress,
+    record_transfer_bytes,
+)
 from node_service.job_watcher import job_watcher_logged
 from node_service.worker_client import (
     READD_PRESSURE_COOLDOWN_SECONDS,
     cpu_pressure_monitor_loop,
     dynamic_ram_monitor_loop,
     dynamic_worker_readd_loop,
+    _is_first_result,
+    take_stragglers,
 )
 
 _LOGS_OVERFLOW_MESSAGE = (
@@ -35,6 +49,9 @@ _LOGS_OVERFLOW_MESSAGE = (
 MAX_LOGS_RESPONSE_BYTES = 1_000_000
 MAX_LOG_DOCUMENTS_PER_RESULTS_RESPONSE = 500
 MAX_RESULTS_RESPONSE_BYTES = 1_000_000
+# Upper bound on how long a /results request may be held open waiting for
+# something to send (the client asks for this via `wait_sec`).
+MAX_RESULTS_WAIT_SEC = 5
 
 # Companion to RESULTS_QUEUE_RAM_LIMIT_BYTES (worker_client.py): together they
 # keep node_service's buffering inside its memory reservation.
@@ -56,6 +73,17 @@ def _log_document_size(log_document: dict) -> int:
     return size
 
 
+def _results_response_has_news() -> bool:
+    return (
+        SELF["pending_result_batch"] is not None
+        or not SELF["results_queue"].empty()
+        or bool(SELF["pending_logs"])
+        or SELF["pending_cluster_shutdown"]
+        or SELF["pending_cluster_restarted"]
+        or SELF["pending_dashboard_canceled"]
+    )
+
+
 def _pop_pending_logs() -> list:
     at_capacity = len(SELF["pending_logs"]) == SELF["pending_logs"].maxlen
     drained_logs = []
@@ -106,6 +134,97 @@ def _get_result_batch() -> tuple[str | None, list]:
     return batch_id, results
 
 
+async def _compress_body(data: bytes) -> tuple[bytes, dict]:
+    """`data` compressed with the job's settings when it's big enough to be
+    worth it, and the headers that tell the receiver how to read it."""
+    settings = SELF["compression"]
+    if not settings or len(data) < settings["threshold_bytes"]:
+        return data, {}
+    codec, level = settings["codec"], settings["level"]
+    data = await asyncio.to_thread(compress, data, codec, level)
+    return data, {COMPRESSION_HEADER: codec}
+
+
+def _is_speculative(input_index: int) -> bool:
+    # Speculative copies, and the originals they copy, stay on the node that
+    # has them: what keeps the input from being counted twice (see
+    # worker_client._is_first_result) only exists there.
+    return (
+        input_index in SELF["speculated_inputs"]
+        or input_index in SELF["speculative_copies"]
+    )
+
+
+def _n_stealable_inputs() -> int:
+    items = SELF["inputs_queue"].items()
+    return sum(not _is_speculative(input_index) for input_index, _ in items)
+
+
+def _take_in_queue_order(target_num: int) -> list:
+    """Up to `target_num` queued inputs (and 3MB) for a stealer, the ones this
+    node would run next first."""
+    wanted = set()
+    total_bytes = 0
+    for input_index, input_pkl in SELF["inputs_queue"].items():
+        if _is_speculative(input_index):
+            continue
+        too_big = wanted and total_bytes + len(input_pkl) > 3_000_000
+        if len(wanted) == target_num or too_big:
+            break
+        wanted.add(input_index)
+        total_bytes += len(input_pkl)
+    return SELF["inputs_queue"].take_where(lambda item: item[0] in wanted)
+
+
+def _take_affinity_groups(target_num: int) -> list:
+    """Up to `target_num` queued inputs (and 3MB) for a stealer, whole
+    affinity groups at a time, so inputs reading the same data stay on one
+    node. Groups this node would reach last go first, it's likely working
+    through the others already. The first group is split when it alone is
+    too big."""
+    groups = {}
+    for input_index, input_pkl in SELF["inputs_queue"].items():
+        if _is_speculative(input_index):
+            continue
+        key = SELF["input_affinity"].get(input_index)
+        groups.setdefault(key, []).append((input_index, len(input_pkl)))
+
+    wanted = set()
+    total_bytes = 0
+    for group in reversed(list(groups.values())):
+        group_bytes = sum(n_bytes for _, n_bytes in group)
+        too_many = len(wanted) + len(group) > target_num
+        too_big = total_bytes + group_bytes > 3_000_000
+        if wanted and (too_many or too_big):
+            continue
+        for input_index, n_bytes in group:
+            too_big = wanted and total_bytes + n_bytes > 3_000_000
+            if len(wanted) == target_num or too_big:
+                break
+            wanted.add(input_index)
+            total_bytes += n_bytes
+        if len(wanted) == target_num:
+            break
+    return SELF["inputs_queue"].take_where(lambda item: item[0] in wanted)
+
+
+def _take_cheapest(target_num: int) -> list:
+    """Up to `target_num` queued inputs (and 3MB) for a stealer, cheapest
+    first: this node keeps the expensive ones it would start next, and the
+    stealer gets calls that are quick to finish anywhere."""
+    wanted = set()
+    total_bytes = 0
+    for input_index, input_pkl in reversed(SELF["inputs_queue"].items()):
+        if _is_speculative(input_index):
+            continue
+        too_big = wanted and total_bytes + len(input_pkl) > 3_000_000
+        if len(wanted) == target_num or too_big:
+            break
+        wanted.add(input_index)
+        total_bytes += len(input_pkl)
+    return SELF["inputs_queue"].take_where(lambda item: item[0] in wanted)
+
+
 @router.get("/jobs/{job_id}/get_inputs")
 async def get_inputs(
     job_id: str = Path(...),
@@ -118,30 +237,64 @@ async def get_inputs(
     if transfer_id in SELF["pending_transfers"]:
         items = SELF["pending_transfers"][transfer_id]
     else:
-        difference = SELF["inputs_queue"].qsize() - requester_queue_size
+        difference = _n_stealable_inputs() - requester_queue_size
         target_num = max(difference, 1) // 2
-        items = []
-        total_bytes = 0
-        while len(items) < target_num:
-            try:
-                input_index, input_pkl = SELF["inputs_queue"].get_nowait()
-            except asyncio.QueueEmpty:
-                break
-            if total_bytes + len(input_pkl) > 3_000_000 and items:
-                SELF["inputs_queue"].put_nowait(
-                    (input_index, input_pkl), len(input_pkl)
-                )
-                break
-            items.append((input_index, input_pkl))
-            total_bytes += len(input_pkl)
+        if SELF["input_affinity"]:
+            items = _take_affinity_groups(target_num)
+        elif SELF["input_costs"]:
+            items = _take_cheapest(target_num)
+        else:
+            items = _take_in_queue_order(target_num)
         SELF["pending_transfers"][transfer_id] = items
 
+    transfer = {
+        "inputs": [(index, pickle.PickleBuffer(pkl)) for index, pkl in items],
+        "affinity": {
+            index: SELF["input_affinity"][index]
+            for index, _ in items
+            if index in SELF["input_affinity"]
+        },
+        "costs": {
+            index: SELF["input_costs"][index]
+            for index, _ in items
+            if index in SELF["input_costs"]
+        },
+    }
+    data, headers = await _compress_body(b"".join(dump_frames(transfer)))
+    headers[QUEUE_DEPTH_HEADER] = str(_n_stealable_inputs())
     return Response(
-        content=pickle.dumps(items),
-        media_type="application/octet-stream",
+        content=data, media_type="application/octet-stream", headers=headers
     )
 
 
+@router.get("/jobs/{job_id}/stragglers")
+async def get_stragglers(job_id: str = Path(...), max_inputs: int = Query(...)):
+    """Copies of inputs running unusually long here, for an idle peer to run
+    too. Unlike get_inputs nothing moves (the originals keep running), so
+    there's nothing to acknowledge: whichever result is claimed first (see
+    claim_result) is delivered, the other is dropped by the node that has it."""
+    if job_id != SELF["current_job"]:
+        return Response("job not found", status_code=404)
+
+    copies = [
+        (index, pickle.PickleBuffer(pkl)) for index, pkl in take_stragglers(max_inputs)
+    ]
+    data, headers = await _compress_body(b"".join(dump_frames(copies)))
+    return Response(
+        content=data, media_type="application/octet-stream", headers=headers
+    )
+
+
+@router.post("/jobs/{job_id}/claim_result")
+async def claim_result(job_id: str = Path(...), input_index: int = Query(...)):
+    """A peer finished its copy of one of this node's stragglers. Whichever
+    of the two results is claimed first is delivered and counted (by the
+    node that has it), the other is dropped."""
+    if job_id != SELF["current_job"]:
+        return Response("job not found", status_code=404)
+    return {"first": _is_first_result(input_index)}
+
+
 @router.post("/jobs/{job_id}/ack_transfer")
 async def ack_transfer(
     job_id: str = Path(...),
@@ -218,6 +371,7 @@ async def trade_slots(
         # replacement node gets drained at birth.
         queue_drained = (
             SELF["inputs_queue"].qsize() == 0
+            and not SELF["pending_retries"]
             and SELF["all_inputs_uploaded"]
             and time() - SELF["job_assigned_at"] > TRADE_IDLE_GRACE_SEC
         )
@@ -272,7 +426,26 @@ async def upload_inputs(
         if job_id != SELF["current_job"]:
             return Response("job not found", status_code=404)
 
-    inputs_pkl_with_idx = pickle.loads(request_files["inputs_pkl_with_idx"])
+    if "chunk_plan" in request_files:
+        await debug_log("input_chunk_plan", **json.loads(request_files["chunk_plan"]))
+    chunk_bytes = request_files["inputs_pkl_with_idx"]
+    n_wire_bytes = len(chunk_bytes)
+    if "compression" in request_files:
+        codec = request_files["compression"].decode()
+        chunk_bytes = await asyncio.to_thread(decompress, chunk_bytes, codec)
+    record_transfer_bytes("inputs_received", len(chunk_bytes), n_wire_bytes)
+    # Each input is an out-of-band frame, so these are views of the request
+    # body rather than copies.
+    inputs_pkl_with_idx = load_frames(chunk_bytes)
+    if "affinity" in request_files:
+        affinity_keys = json.loads(request_files["affinity"])
+        input_indexes = [input_index for input_index, _ in inputs_pkl_with_idx]
+        SELF["input_affinity"].update(zip(input_indexes, affinity_keys))
+    if "costs" in request_files:
+        # Before queueing: the queue ranks inputs by cost as they go in.
+        costs = json.loads(request_files["costs"])
+        input_indexes = [input_index for input_index, _ in inputs_pkl_with_idx]
+        SELF["input_costs"].update(zip(input_indexes, costs))
     await asyncio.sleep(0)
     for input_pkl_with_idx in inputs_pkl_with_idx:
         await SELF["inputs_queue"].put(input_pkl_with_idx, len(input_pkl_with_idx[1]))
@@ -284,6 +457,72 @@ async def upload_inputs(
 INSTALLING_PACKAGE_PATH = "/worker_service_storage/installing_package.txt"
 
 
+# Content-addressed by sha256 (pickled functions and `burla.broadcast` values)
+# and shared with workers through the same bind mount, so a resubmitted
+# payload is never re-uploaded by the client or re-sent to workers over their
+# sockets.
+PAYLOAD_CACHE_DIR = "/worker_service_storage/payload_cache"
+PAYLOAD_CACHE_MAX_BYTES = 4 * 1024**3
+# Payloads are uploaded before the job request that pins them arrives, so
+# anything this fresh may belong to a job that is being assigned right now.
+PAYLOAD_CACHE_MIN_AGE_SEC = 10 * 60
+# The hash becomes a filename, so nothing but a sha256 hexdigest gets that far.
+PAYLOAD_HASH_PATTERN = re.compile("[0-9a-f]{64}")
+
+
+def _payload_cache_path(payload_hash: str) -> str:
+    return f"{PAYLOAD_CACHE_DIR}/{payload_hash}.pkl"
+
+
+def _cache_payload(payload_hash: str, payload: bytes):
+    os.makedirs(PAYLOAD_CACHE_DIR, exist_ok=True)
+    path = _payload_cache_path(payload_hash)
+    temporary_path = f"{path}.{uuid4().hex}"
+    with open(temporary_path, "wb") as file:
+        file.write(payload)
+    os.replace(temporary_path, path)
+
+    # Least recently used first: a cache hit bumps the file's mtime.
+    entries = [entry for entry in os.scandir(PAYLOAD_CACHE_DIR) if entry.is_file()]
+    entries.sort(key=lambda entry: entry.stat().st_mtime)
+    total_bytes = sum(entry.stat().st_size for entry in entries)
+    pinned_paths = [SELF["function_path"], *SELF["broadcast_paths"]]
+    for entry in entries:
+        if total_bytes <= PAYLOAD_CACHE_MAX_BYTES:
+            break
+        too_fresh = time() - entry.stat().st_mtime < PAYLOAD_CACHE_MIN_AGE_SEC
+        if too_fresh or entry.path in pinned_paths:
+            continue
+        total_bytes -= entry.stat().st_size
+        os.remove(entry.path)
+
+
+@router.get("/payloads/{payload_hash}")
+async def get_cached_payload(payload_hash: str = Path(...)):
+    if not PAYLOAD_HASH_PATTERN.fullmatch(payload_hash):
+        return Response("payload hash must be a sha256 hexdigest", status_code=400)
+    path = _payload_cache_path(payload_hash)
+    if not os.path.exists(path):
+        return Response("payload not cached", status_code=404)
+    os.utime(path)
+    return Response(status_code=200)
+
+
+@router.post("/payloads/{payload_hash}")
+async def cache_payload(
+    payload_hash: str = Path(...),
+    request_files: Optional[dict] = Depends(get_request_files),
+):
+    if not PAYLOAD_HASH_PATTERN.fullmatch(payload_hash):
+        return Response("payload hash must be a sha256 hexdigest", status_code=400)
+    payload = request_files["payload"]
+    # Every later job trusts this file by name, never cache a corrupt upload.
+    if hashlib.sha256(payload).hexdigest() != payload_hash:
+        return Response("payload hash mismatch", status_code=400)
+    await asyncio.to_thread(_cache_payload, payload_hash, payload)
+    return Response(status_code=200)
+
+
 @router.get("/jobs/{job_id}/installing_package")
 async def get_installing_package(job_id: str = Path(...)):
     if job_id != SELF["current_job"]:
@@ -300,6 +539,7 @@ async def get_installing_package(job_id: str = Path(...)):
 async def get_results(
     job_id: str = Path(...),
     ack_result_batch_id: str | None = Query(None),
+    wait_sec: float = Query(0),
 ):
     if job_id != SELF["current_job"]:
         print(f"job {job_id} not found, current job: {SELF['current_job']}")
@@ -309,6 +549,21 @@ async def get_results(
     if batch is not None and batch["id"] == ack_result_batch_id:
         SELF["pending_result_batch"] = None
 
+    # Long poll: hold the request until there is something worth sending, so
+    # the client gets results the moment they exist without a stream of
+    # empty responses from idle nodes. Cleared only right after finding no
+    # news, with no await in between, so a set can't be missed.
+    wait_until = time() + min(wait_sec, MAX_RESULTS_WAIT_SEC)
+    while not _results_response_has_news() and time() < wait_until:
+        results_news = SELF["results_news"]
+        results_news.clear()
+        try:
+            await asyncio.wait_for(results_news.wait(), wait_until - time())
+        except asyncio.TimeoutError:
+            pass
+        if job_id != SELF["current_job"]:
+            return Response("job not found", status_code=404)
+
     result_batch_id, results = _get_result_batch()
     drained_logs = _pop_pending_logs()
     original_worker_count = len(SELF["workers"])
@@ -323,8 +578,13 @@ async def get_results(
 
     response_json = {
         "result_batch_id": result_batch_id,
-        "results": results,
+        "results": [
+            (input_index, is_error, pickle.PickleBuffer(result_pkl), is_partial)
+            for input_index, is_error, result_pkl, is_partial in results
+        ],
         "current_parallelism": SELF["current_parallelism"],
+        # Lets the client keep a fixed amount of work queued here.
+        "queued_inputs": SELF["inputs_queue"].qsize(),
         "dynamic_worker_reduction": dynamic_worker_reduction,
         "logs": drained_logs,
         "cluster_shutdown": SELF["pending_cluster_shutdown"],
@@ -332,8 +592,10 @@ async def get_results(
         "dashboard_canceled": SELF["pending_dashboard_canceled"],
     }
 
-    data = pickle.dumps(response_json)
-    headers = {"Content-Disposition": 'attachment; filename="results.pkl"'}
+    raw_data = b"".join(dump_frames(response_json))
+    data, headers = await _compress_body(raw_data)
+    record_transfer_bytes("results_sent", len(raw_data), len(data))
+    headers["Content-Disposition"] = 'attachment; filename="results.pkl"'
     return Response(
         content=data, media_type="application/octet-stream", headers=headers
     )
@@ -344,13 +606,12 @@ async def execute(
     request: Request,
     job_id: str = Path(...),
     request_json: dict = Depends(get_request_json),
-    request_files: Optional[dict] = Depends(get_request_files),
     logger: Logger = Depends(get_logger),
 ):
     await logger.log(f"Executing job {job_id} ...")
-    # The `on_job_start` function in __init__.py is run as soon as upload to this endpoint starts.
-    # It exists to set `SELF["current_job"]` and set this node to RUNNING in the db as soon as
-    # upload starts if the user's function is big.
+    # The `on_job_start` function in __init__.py is run as soon as a request to this endpoint
+    # arrives. It exists to set `SELF["current_job"]` and set this node to RUNNING in the db
+    # before the (possibly long) environment install below.
 
     # determine which workers to call
     workers_to_assign = []
@@ -425,12 +686,35 @@ async def execute(
         install_metrics = await workers_to_assign[0].install_packages(packages)
         await debug_log("environment_install", **install_metrics)
 
-    function_pkl = request_files["function_pkl"]
-    await asyncio.gather(*(w.load_function(function_pkl) for w in workers_to_assign))
+    # Uploaded to the payload cache just before this request, see `cache_payload`.
+    function_path = _payload_cache_path(request_json["function_hash"])
+    batch_size = request_json["batch_size"]
+    func_concurrency = request_json["func_concurrency"]
+    result_sink = request_json["result_sink"]
+    retry_on = request_json["retry_on"]
+    await asyncio.gather(
+        *(
+            w.load_function(
+                function_path, batch_size, func_concurrency, result_sink, retry_on
+            )
+            for w in workers_to_assign
+        )
+    )
     # Kept for the job's lifetime so workers booted mid-job (re-adds after
     # pressure subsides, slot trades) can be handed the function without the
-    # client's involvement.
-    SELF["function_pkl"] = function_pkl
+    # client's involvement. Neither is evicted from the cache while in use.
+    SELF["function_path"] = function_path
+    SELF["batch_size"] = batch_size
+    SELF["func_concurrency"] = func_concurrency
+    SELF["result_sink"] = result_sink
+    SELF["retries"] = request_json["retries"]
+    SELF["retry_on"] = retry_on
+    SELF["speculative"] = request_json["speculative"]
+    SELF["broadcast_paths"] = [
+        _payload_cache_path(broadcast_hash)
+        for broadcast_hash in request_json["broadcast_hashes"]
+    ]
+    SELF["compression"] = request_json["compression"]
 
     SELF["workers"] = workers_to_assign
     SELF["idle_workers"] = workers_to_leave_idle
@@ -463,7 +747,6 @@ async def execute(
 
     SELF["job_watcher_stop_event"].clear()  # is initalized as set by default
     job_watcher_coroutine = job_watcher_logged(
-        request_json["n_inputs"],
         is_background_job,
         request_json["start_time"],
     )
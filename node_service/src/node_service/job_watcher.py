@@ -1,9 +1,10 @@
 import sys
-import pickle
 import traceback
 import asyncio
 import aiohttp
+import math
 import os
+import random
 import ssl
 from time import time
 from uuid import uuid4
@@ -20,18 +21,29 @@ from node_service import (
     REINIT_SELF,
     head_client,
 )
-from node_service.helpers import Logger, debug_log, format_traceback
+from node_service._frames import load_frames
+from node_service.helpers import (
+    COMPRESSION_HEADER,
+    QUEUE_DEPTH_HEADER,
+    Logger,
+    debug_log,
+    decompress,
+    format_traceback,
+    record_transfer_bytes,
+)
 from node_service.lifecycle_endpoints import reboot_containers
 from node_service.worker_client import (
     CPU_PRESSURE_FILE,
     READD_MAX_CPU_STALL_FRACTION,
     READD_MAX_WORKER_MEMORY_USED_FRACTION,
     READD_PRESSURE_COOLDOWN_SECONDS,
+    _max_running_inputs,
     _read_cpu_stall_usec,
     _workers_memory_limit_bytes,
+    take_stragglers,
 )
 
-EMPTY_NEIGHBOR_TIMEOUT_SEC = 120
+EMPTY_PEERS_TIMEOUT_SEC = 120
 CLIENT_CONTACT_TIMEOUT_SEC = 5
 ACK_RETRY_TIMEOUT_SEC = 600
 ACK_RETRY_DELAY_SEC = 15
@@ -46,9 +58,6 @@ REPLACEMENT_RETRY_SEC = 60
 # neighbor for slots, and how far beyond one-worker-per-CPU it may grow.
 TRADE_INTERVAL_SEC = 15
 OVERSUBSCRIBE_MAX_WORKERS_PER_CPU = 2
-# The set of nodes on a job changes rarely, so re-asking the head is cheap to do
-# seldom. Matches the client's wait before it hands a booting node the job.
-PEER_RECHECK_INTERVAL_SEC = 30
 # How long a node can make no progress before it logs its input accounting.
 STALL_REPORT_INTERVAL_SEC = 10
 # Cadence of the slot_state debug event: a continuous record of this node's
@@ -56,7 +65,21 @@ STALL_REPORT_INTERVAL_SEC = 10
 # every change event.
 SLOT_STATE_LOG_INTERVAL_SEC = 60
 
-SEC_NEIGHBOR_HAD_NO_INPUTS = 0
+# Input stealing: a node steals as soon as it has fewer than this many rounds
+# of calls (every worker's running inputs) queued, checking this often, from
+# the deeper-queued of this many random peers (power of two choices). After a
+# steal comes back empty it waits before asking another peer, twice as long
+# after each empty one in a row up to a cap: at the end of a job every node is
+# idle, and they'd otherwise keep asking each other several times a second.
+# While stealing, the job's load map is refreshed from the head this often.
+STEAL_LOW_WATER_ROUNDS = 2
+STEAL_LOAD_MAP_INTERVAL_SEC = 10
+STEAL_POLL_INTERVAL_SEC = 0.05
+STEAL_VICTIM_CHOICES = 2
+STEAL_EMPTY_BACKOFF_SEC = 0.25
+STEAL_MAX_EMPTY_BACKOFF_SEC = 8
+
+SEC_PEERS_HAD_NO_INPUTS = 0
 
 
 def _lifecycle_canceled(job_view: dict) -> bool:
@@ -83,8 +106,93 @@ async def get_neighbor():
     return neighbor_id, neighbor_host
 
 
+async def get_steal_peers() -> list:
+    """The other RUNNING nodes assigned to this job, with the load each last
+    reported to the head. Empty while the head doesn't count this node as
+    one of them."""
+    peers = (await head_client.get_peers(SELF["current_job"]))["peers"]
+    if INSTANCE_NAME not in [peer["instance_name"] for peer in peers]:
+        return []
+    return [peer for peer in peers if peer["instance_name"] != INSTANCE_NAME]
+
+
+def _steal_low_water_mark() -> int:
+    alive_workers = sum(not worker.retired for worker in SELF["workers"])
+    return alive_workers * _max_running_inputs() * STEAL_LOW_WATER_ROUNDS
+
+
+def _choose_victim(peers: list, peer_queue_depths: dict, peer_rates: dict) -> dict:
+    """Of a few random peers, the one whose queue would take longest to drain
+    on its own: its depth (the latest of what it told the head and what it
+    answered the last steal from it) over its results per second. A peer
+    with no known depth counts as the most loaded, so every peer gets asked.
+    Random picks spread stealers over the whole job instead of sending idle
+    capacity around the ring one hop at a time."""
+
+    def seconds_of_work(peer):
+        queue_depth = peer_queue_depths.get(peer["instance_name"], math.inf)
+        results_per_sec = peer_rates.get(peer["instance_name"]) or 0
+        return queue_depth / max(results_per_sec, 1)
+
+    candidates = random.sample(peers, min(STEAL_VICTIM_CHOICES, len(peers)))
+    return max(candidates, key=seconds_of_work)
+
+
+async def _read_transferred_inputs(response) -> list:
+    transfer_bytes = await response.read()
+    n_wire_bytes = len(transfer_bytes)
+    codec = response.headers.get(COMPRESSION_HEADER)
+    if codec:
+        transfer_bytes = await asyncio.to_thread(decompress, transfer_bytes, codec)
+    record_transfer_bytes("inputs_stolen", len(transfer_bytes), n_wire_bytes)
+    return load_frames(transfer_bytes)
+
+
+async def _speculate(session, logger, peers: list, peer_queue_depths: dict):
+    """Speculative execution, once no node has inputs left to hand out: fills
+    this node's idle workers with copies of stragglers, its own first, then a
+    random peer's. Whichever copy of an input finishes first is its result,
+    the node with the other drops it. Copies are queued like any input, but
+    get_inputs never hands them on to a third node."""
+    n_idle_workers = sum(
+        not worker.retired and not worker.in_flight for worker in SELF["workers"]
+    )
+    peers_empty = all(
+        peer_queue_depths.get(peer["instance_name"], math.inf) == 0 for peer in peers
+    )
+    if not n_idle_workers or not peers_empty or not SELF["inputs_queue"].empty():
+        return
+
+    copies = take_stragglers(n_idle_workers)
+    if not copies and peers:
+        peer = random.choice(peers)
+        url = f"{peer['host']}/jobs/{SELF['current_job']}/stragglers"
+        params = {"max_inputs": n_idle_workers}
+        try:
+            async with session.get(
+                url, params=params, headers=SELF["auth_headers"]
+            ) as response:
+                if response.status == 200:
+                    copies = await _read_transferred_inputs(response)
+        except Exception as error:
+            error_name = type(error).__name__
+            await logger.log(
+                f"GET stragglers from {peer['instance_name']} failed: {error_name}: {error}",
+                "WARNING",
+            )
+        for input_index, _ in copies:
+            SELF["speculative_copies"][input_index] = peer["host"]
+
+    for input_index, input_pkl in copies:
+        SELF["inputs_queue"].put_nowait((input_index, input_pkl), len(input_pkl))
+    if copies:
+        await debug_log(
+            "inputs_speculated", input_indexes=[input_index for input_index, _ in copies]
+        )
+
+
 async def _input_steal_loop(session, logger, job_started_at):
-    global SEC_NEIGHBOR_HAD_NO_INPUTS
+    global SEC_PEERS_HAD_NO_INPUTS
 
     # A node traded down to zero slots must stop pulling work in: it has no
     # workers left to run it, and holding inputs would keep it on the job.
@@ -93,38 +201,55 @@ async def _input_steal_loop(session, logger, job_started_at):
         and (time() - job_started_at > 10)
         and SELF["target_parallelism"] > 0
     )
-    # Replacement nodes can join the ring at any point in the job, so the
-    # peer list is re-checked on an interval for the whole job instead of
-    # only while initially-expected nodes are still booting. last_peer_check
-    # starts at 0 so the first active tick fetches the initial neighbor.
-    neighbor_id, neighbor_host = None, None
-    neighbor_had_no_inputs_at = None
+    # Replacement nodes can join the job at any point, so the peer list is
+    # re-checked on an interval for the whole job instead of only while
+    # initially-expected nodes are still booting. last_peer_check starts at 0
+    # so the first steal fetches the initial peers.
+    peers = []
+    peer_queue_depths = {}
+    peer_rates = {}
+    peers_had_no_inputs_at = None
+    empty_backoff_sec = STEAL_EMPTY_BACKOFF_SEC
     last_peer_check = 0.0
 
     while not SELF["job_watcher_stop_event"].is_set():
-        await asyncio.sleep(1)
+        await asyncio.sleep(STEAL_POLL_INTERVAL_SEC)
 
         if not should_steal():
             await asyncio.sleep(1)
             continue
 
-        if time() - last_peer_check > PEER_RECHECK_INTERVAL_SEC:
+        remaining_inputs = SELF["inputs_queue"].qsize()
+        if remaining_inputs >= _steal_low_water_mark():
+            continue
+
+        # Only while stealing: the load map is only read here.
+        if time() - last_peer_check > STEAL_LOAD_MAP_INTERVAL_SEC:
             last_peer_check = time()
             try:
-                neighbor_id, neighbor_host = await get_neighbor()
+                peers = await get_steal_peers()
             except Exception:
-                # Head briefly unreachable: keep the current neighbor and let
+                # Head briefly unreachable: keep the current peers and let
                 # the next interval retry, instead of silently killing
                 # stealing for the rest of the job (this task's exceptions
                 # are never observed).
                 pass
-
-        if not neighbor_id:
+            for peer in peers:
+                if peer["queued_inputs"] is not None:
+                    peer_queue_depths[peer["instance_name"]] = peer["queued_inputs"]
+                peer_rates[peer["instance_name"]] = peer["results_per_sec"]
+
+        if not peers:
+            # Alone on the job: its own stragglers are all it can speculate on.
+            if SELF["speculative"]:
+                await _speculate(session, logger, peers, peer_queue_depths)
+                await asyncio.sleep(STEAL_EMPTY_BACKOFF_SEC)
             continue
 
+        victim = _choose_victim(peers, peer_queue_depths, peer_rates)
+        victim_id, victim_host = victim["instance_name"], victim["host"]
         transfer_id = uuid4().hex
-        remaining_inputs = SELF["inputs_queue"].qsize()
-        get_url = f"{neighbor_host}/jobs/{SELF['current_job']}/get_inputs"
+        get_url = f"{victim_host}/jobs/{SELF['current_job']}/get_inputs"
         get_params = {
             "transfer_id": transfer_id,
             "requester_queue_size": remaining_inputs,
@@ -136,13 +261,20 @@ async def _input_steal_loop(session, logger, job_started_at):
                 get_url, params=get_params, headers=SELF["auth_headers"]
             ) as response:
                 if response.status == 404:
+                    # Off the job: nothing to steal until the peer list drops it.
+                    peer_queue_depths[victim_id] = 0
                     continue
                 if response.status == 200:
-                    items = pickle.loads(await response.read())
+                    queue_depth = response.headers.get(QUEUE_DEPTH_HEADER)
+                    peer_queue_depths[victim_id] = int(queue_depth or 0)
+                    transfer = await _read_transferred_inputs(response)
+                    items = transfer["inputs"]
+                    SELF["input_affinity"].update(transfer["affinity"])
+                    SELF["input_costs"].update(transfer["costs"])
         except Exception as error:
             error_name = type(error).__name__
             await logger.log(
-                f"GET inputs from {neighbor_id} failed: {error_name}: {error}",
+                f"GET inputs from {victim_id} failed: {error_name}: {error}",
                 "WARNING",
             )
 
@@ -154,7 +286,7 @@ async def _input_steal_loop(session, logger, job_started_at):
 
         received = bool(items)
 
-        ack_url = f"{neighbor_host}/jobs/{SELF['current_job']}/ack_transfer"
+        ack_url = f"{victim_host}/jobs/{SELF['current_job']}/ack_transfer"
         ack_params = {
             "transfer_id": transfer_id,
             "received": "true" if received else "false",
@@ -176,7 +308,7 @@ async def _input_steal_loop(session, logger, job_started_at):
 
         if not ack_ok:
             reason = (
-                f"Could not ACK transfer {transfer_id} to {neighbor_id} after "
+                f"Could not ACK transfer {transfer_id} to {victim_id} after "
                 f"{ACK_RETRY_TIMEOUT_SEC}s. Failing job to preserve exactly-once semantics."
             )
             await logger.log(reason, "ERROR")
@@ -189,13 +321,17 @@ async def _input_steal_loop(session, logger, job_started_at):
             return
 
         if received:
-            neighbor_had_no_inputs_at = None
-            SEC_NEIGHBOR_HAD_NO_INPUTS = 0
-            # await logger.log(f"Got {len(items)} more inputs from {neighbor_id}")
+            peers_had_no_inputs_at = None
+            SEC_PEERS_HAD_NO_INPUTS = 0
+            empty_backoff_sec = STEAL_EMPTY_BACKOFF_SEC
+            # await logger.log(f"Got {len(items)} more inputs from {victim_id}")
         else:
-            neighbor_had_no_inputs_at = neighbor_had_no_inputs_at or time()
-            SEC_NEIGHBOR_HAD_NO_INPUTS = time() - neighbor_had_no_inputs_at
-            await asyncio.sleep(1)
+            peers_had_no_inputs_at = peers_had_no_inputs_at or time()
+            SEC_PEERS_HAD_NO_INPUTS = time() - peers_had_no_inputs_at
+            if SELF["speculative"]:
+                await _speculate(session, logger, peers, peer_queue_depths)
+            await asyncio.sleep(empty_backoff_sec)
+            empty_backoff_sec = min(2 * empty_backoff_sec, STEAL_MAX_EMPTY_BACKOFF_SEC)
 
 
 async def _slot_trade_loop(session, logger):
@@ -336,15 +472,14 @@ async def _push_progress() -> dict:
 
 
 async def _job_watcher(
-    n_inputs: int,
     is_background_job: bool,
     job_started_at: float,
     logger: Logger,
     session: aiohttp.ClientSession,
 ):
     # Module-global: reset per-job so prior-job state doesn't leak in.
-    global SEC_NEIGHBOR_HAD_NO_INPUTS
-    SEC_NEIGHBOR_HAD_NO_INPUTS = 0
+    global SEC_PEERS_HAD_NO_INPUTS
+    SEC_PEERS_HAD_NO_INPUTS = 0
 
     # First push registers this node's progress with the head (the
     # `assigned_nodes` entry) and returns the job's current signal set.
@@ -370,12 +505,13 @@ async def _job_watcher(
     while not SELF["job_watcher_stop_event"].is_set():
 
         SELF["current_parallelism"] = sum(
-            not worker.is_idle and not worker.retired for worker in SELF["workers"]
+            worker.n_running_inputs for worker in SELF["workers"] if not worker.retired
         )
         pending_transfer_count = sum(
             len(batch) for batch in SELF["pending_transfers"].values()
         )
         remaining_inputs = SELF["inputs_queue"].qsize() + pending_transfer_count
+        remaining_inputs += SELF["pending_retries"]
         input_queue_empty = remaining_inputs == 0
         all_workers_idle = SELF["current_parallelism"] == 0
         slow_poll = (
@@ -526,6 +662,8 @@ async def _job_watcher(
                 busy_workers=SELF["current_parallelism"],
                 queued_inputs=remaining_inputs,
                 results=SELF["num_results_received"],
+                compression=SELF["compression"],
+                transfer_bytes=SELF["transfer_bytes"],
             )
 
         # A job that stops advancing is only diagnosable if you can see where
@@ -539,6 +677,7 @@ async def _job_watcher(
                 "stall",
                 queued_inputs=SELF["inputs_queue"].qsize(),
                 inputs_in_transfer=pending_transfer_count,
+                inputs_awaiting_retry=SELF["pending_retries"],
                 transfers=list(SELF["pending_transfers"]),
                 busy_workers=SELF["current_parallelism"],
                 results_produced=current_num_results,
@@ -553,9 +692,12 @@ async def _job_watcher(
         if not client_contact_last_1s and SELF["client_heartbeat_received"]:
             client_disconnected = not job_view.get("any_node_client_contact")
         must_be_connected = not is_background_job or not SELF["all_inputs_uploaded"]
+        # A client that already has every result leaving is the job ending,
+        # even with a losing speculative copy still running here.
         if (
             client_disconnected
             and must_be_connected
+            and not job_view.get("client_has_all_results")
             and not (JOB_FAILED or JOB_CANCELED)
         ):
             if _lifecycle_canceled(job_view):
@@ -570,7 +712,7 @@ async def _job_watcher(
                 await logger.log("Client disconnected!")
 
         # Traded down to zero slots and drained? Finish this node's part of
-        # the job immediately instead of waiting out the empty-neighbor
+        # the job immediately instead of waiting out the empty-peers
         # timeout: its slots (and any requeued inputs) live elsewhere now, so
         # the machine is pure idle cost (this is what "packing into fewer
         # machines" frees).
@@ -588,19 +730,17 @@ async def _job_watcher(
             await reset_workers(logger)
             break
 
-        # Neighbor had no inputs for too long?
-        if (
-            SEC_NEIGHBOR_HAD_NO_INPUTS
-            and SEC_NEIGHBOR_HAD_NO_INPUTS > EMPTY_NEIGHBOR_TIMEOUT_SEC
-        ):
+        # Peers had no inputs for too long?
+        if SEC_PEERS_HAD_NO_INPUTS and SEC_PEERS_HAD_NO_INPUTS > EMPTY_PEERS_TIMEOUT_SEC:
             if (
                 SELF["results_queue"].empty()
                 and pending_results_empty
                 and all_workers_idle
+                and not SELF["pending_retries"]
             ):
                 steal_task.cancel()
                 trade_task.cancel()
-                msg = f"Neighbor had no extra inputs for {EMPTY_NEIGHBOR_TIMEOUT_SEC}s"
+                msg = f"Peers had no extra inputs for {EMPTY_PEERS_TIMEOUT_SEC}s"
                 await logger.log(msg + ", done working on job!")
                 await reset_workers(logger)
                 break
@@ -611,10 +751,17 @@ async def _job_watcher(
         all_inputs_processed = all_uploaded and input_queue_empty and all_workers_idle
         if all_inputs_processed and client_disconnected and pending_results_empty:
             job_view = await _push_progress()
-            job_completed = n_inputs == job_view.get("total_num_results")
+            # From the job doc, not assignment: a streamed job's input count
+            # is only known once the client's iterable runs out.
+            n_results = job_view.get("total_num_results")
+            job_completed = job_view.get("n_inputs") == n_results
         elif all_inputs_processed:
             job_view = await _push_progress()
             job_completed = job_view.get("client_has_all_results")
+        elif SELF["speculative"]:
+            # Workers still busy can be running copies the client already got
+            # a result for; resetting them below kills those.
+            job_completed = job_view.get("client_has_all_results")
         if job_completed or JOB_FAILED or JOB_CANCELED:
             steal_task.cancel()
             trade_task.cancel()
@@ -640,7 +787,6 @@ async def _job_watcher(
 
 
 async def job_watcher_logged(
-    n_inputs: int,
     is_background_job: bool,
     job_started_at: float,
 ):
@@ -652,9 +798,9 @@ async def job_watcher_logged(
     ssl_context = ssl.create_default_context(cafile=ca_path) if ca_path else None
     connector = aiohttp.TCPConnector(ssl=ssl_context)
     async with aiohttp.ClientSession(connector=connector) as session:
+        SELF["peer_session"] = session
         try:
             await _job_watcher(
-                n_inputs,
                 is_background_job,
                 job_started_at,
                 logger,
@@ -3,6 +3,7 @@ import requests
 import asyncio
 from typing import Optional, Callable
 import traceback
+import shutil
 
 import aiodocker
 from fastapi import APIRouter, Depends, Response
@@ -22,6 +23,7 @@ from node_service import (
     head_client,
 )
 from node_service.helpers import Logger
+from node_service.shared_ring import SHARED_RING_DIR
 from node_service.worker_client import WorkerClient, verify_worker_cgroup_isolation
 
 router = APIRouter()
@@ -310,6 +312,9 @@ async def reboot_containers(
                     _schedule_container_removal(
                         container.id, logger, add_background_task
                     )
+            # Rings left by workers that never got to close them (a restarted
+            # node_service) would hold on to their memory until the VM reboots.
+            shutil.rmtree(SHARED_RING_DIR, ignore_errors=True)
 
             # start new workers.
             workers = []
@@ -0,0 +1,83 @@
+"""
+The transport between node_service and a worker for large payloads, used by
+both ends: node_service imports it as `node_service.shared_ring`, and every
+worker container gets this file mounted next to worker_server.py as
+`burla_shared_ring` (see WorkerClient._start_container). It runs on whatever
+Python the user's image has, so it only uses the standard library.
+"""
+
+import mmap
+import os
+
+# SharedRing files are in /dev/shm: backed by memory, so the sender's writes
+# never go to disk and the receiver reads straight from the pages they landed in.
+SHARED_RING_DIR = "/dev/shm/burla_shared_rings"
+# Payloads at least this big go through a SharedRing instead of the socket.
+SHARED_RING_THRESHOLD_BYTES = 1024**2
+SHARED_RING_HEADER_BYTES = 64
+SHARED_RING_BYTES = 64 * 1024**2
+
+
+class SharedRing:
+    """One direction of the transport: a memory-mapped file in SHARED_RING_DIR
+    (mounted in both) the sender copies payloads into, so only their position
+    and size go over the socket. The receiver takes them in the order they
+    were sent and stores how far it has read in the header, which tells the
+    sender what it can overwrite. Positions only grow; a payload never wraps
+    around the end, it starts over at the beginning instead.
+
+    node_service creates both of a worker's files for each job (`create`),
+    the worker opens them."""
+
+    def __init__(self, path, create=False):
+        self.path = path
+        if create:
+            # Truncating first zeroes the header and drops the last job's pages.
+            with open(path, "w+b") as file:
+                file.truncate(SHARED_RING_HEADER_BYTES + SHARED_RING_BYTES)
+                self.map = mmap.mmap(file.fileno(), 0)
+        else:
+            with open(path, "r+b") as file:
+                self.map = mmap.mmap(file.fileno(), 0)
+        self.view = memoryview(self.map)
+        self.write_position = 0
+
+    def put(self, frames, size):
+        """Copies `frames` (`size` bytes) in and returns their position, or
+        None when they don't fit (send them over the socket then)."""
+        position = self.write_position
+        offset = position % SHARED_RING_BYTES
+        if offset + size > SHARED_RING_BYTES:
+            position += SHARED_RING_BYTES - offset
+        read_position = int.from_bytes(self.view[:8], "big")
+        if position + size - read_position > SHARED_RING_BYTES:
+            return None
+        offset = SHARED_RING_HEADER_BYTES + position % SHARED_RING_BYTES
+        for frame in frames:
+            self.view[offset : offset + len(frame)] = frame
+            offset += len(frame)
+        self.write_position = position + size
+        return position
+
+    def take(self, position, size):
+        # Copied out, into a writable buffer (arguments unpickle in place from
+        # it): the space is reused as soon as the header says it was read, and
+        # neither end is done with a payload by then. A result waits in the
+        # node's results queue, an input's arguments live as long as its call.
+        offset = SHARED_RING_HEADER_BYTES + position % SHARED_RING_BYTES
+        payload = bytearray(self.view[offset : offset + size])
+        self.view[:8] = (position + size).to_bytes(8, "big")
+        return payload
+
+    def close(self):
+        self.view.release()
+        self.map.close()
+
+    def delete(self):
+        """Closes and deletes the file, which holds on to its memory until
+        then (a node reboot may have deleted it already)."""
+        self.close()
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
@@ -1,8 +1,8 @@
 import asyncio
+import json
 import os
 import pickle
 import signal
-import socket
 import time
 import traceback
 from datetime import datetime, timezone
@@ -10,6 +10,7 @@ from pathlib import Path
 from uuid import uuid4
 
 import aiodocker
+import aiohttp
 import psutil
 from tblib import Traceback
 
@@ -23,6 +24,11 @@ from node_service import (
 )
 from node_service.helpers import debug_log
 from node_service.resource_metrics import record_call_event
+from node_service.shared_ring import (
+    SHARED_RING_DIR,
+    SHARED_RING_THRESHOLD_BYTES,
+    SharedRing,
+)
 
 # Sized so node_service's buffering fits inside its own memory reservation
 # (NODE_SERVICE_RESERVED_MEMORY_GB, 4GB on real VMs): workers own the rest of
@@ -32,12 +38,16 @@ RESULTS_QUEUE_RAM_LIMIT_BYTES = min(
     2 * 1024**3, int(psutil.virtual_memory().total * 0.25)
 )
 
-WORKER_INTERNAL_PORT = 8080
+# Each worker_server.py listens on a Unix socket here, through the worker's
+# /worker_service_storage mount, so the node connects to it directly instead
+# of through a Docker-published port and docker-proxy.
+WORKER_SOCKET_DIR = "/worker_service_storage/worker_sockets"
 LOG_FLUSH_INTERVAL_SECONDS = 1
 MAX_LOG_DOCUMENT_SIZE_BYTES = 100_000
 TRUNCATED_LOG_SUFFIX = "<too-long--remaining-msg-truncated-due-to-length>"
 LOG_START_MARKER_PREFIX = "__burla_input_start__:"
 LOG_END_MARKER_PREFIX = "__burla_input_end__:"
+LOG_LINE_MARKER_PREFIX = "__burla_input_log__:"
 OOM_KILL_MARKER_PREFIX = "__burla_oom_kill__:"
 
 # The first worker on a fresh VM downloads uv from GitHub and installs burla + its deps into
@@ -69,6 +79,27 @@ READD_PRESSURE_COOLDOWN_SECONDS = 30
 READD_MAX_CPU_STALL_FRACTION = 0.05
 READD_MAX_WORKER_MEMORY_USED_FRACTION = 0.75
 
+# Inputs are pipelined to each worker: the next ones are already in its socket
+# while it runs the current ones, so it never idles for a round trip. About
+# this much work is queued beyond the running inputs, and never less than one
+# input (more would park inputs in a worker, where they can't go to an idle
+# worker or node instead).
+PIPELINE_TARGET_SECONDS = 0.01
+MAX_PIPELINED_INPUTS = 256
+
+# A retried input goes back on the queue after this long, doubled for each of
+# its failures before, so a flaky dependency gets time to come back.
+RETRY_BACKOFF_SECONDS = 1
+RETRY_MAX_BACKOFF_SECONDS = 60
+
+# Speculative execution: a running input is a straggler once it has run this
+# many times longer than this node's typical call, and at least this long.
+STRAGGLER_RUNNING_MULTIPLE = 3
+STRAGGLER_MIN_RUNNING_SECONDS = 5
+# Tries at asking the peer a speculative copy came from which result wins.
+CLAIM_RESULT_ATTEMPTS = 3
+CLAIM_RESULT_TIMEOUT = aiohttp.ClientTimeout(total=5)
+
 
 class WorkerOutOfMemoryError(RuntimeError):
     pass
@@ -79,9 +110,11 @@ class WorkerProcessTerminatedError(RuntimeError):
 
 
 class WorkerFunctionError(Exception):
-    def __init__(self, error_info_pkl: bytes, traceback_str: str):
+    def __init__(self, error_info_pkl: bytes, traceback_str: str, retryable: bool):
         self.error_info_pkl = error_info_pkl
         self.traceback_str = traceback_str
+        # Whether the exception is one of the job's `retry_on` types.
+        self.retryable = retryable
         super().__init__(traceback_str)
 
 
@@ -105,6 +138,12 @@ def _is_worker_internal_log_message(message: str) -> bool:
     )
 
 
+def _max_running_inputs() -> int:
+    # Per worker: func_concurrency calls at once, of batch_size inputs each
+    # for vectorized UDFs.
+    return SELF["func_concurrency"] * (SELF["batch_size"] or 1)
+
+
 def _active_dynamic_workers():
     return [worker for worker in SELF["workers"] if not worker.retired]
 
@@ -406,7 +445,13 @@ async def _boot_readded_worker():
     worker = WorkerClient(image, gpu_index=gpu_index)
     try:
         await worker.boot()
-        await worker.load_function(SELF["function_pkl"])
+        await worker.load_function(
+            SELF["function_path"],
+            SELF["batch_size"],
+            SELF["func_concurrency"],
+            SELF["result_sink"],
+            SELF["retry_on"],
+        )
     except Exception as e:
         if worker.container_id is not None:
             asyncio.create_task(
@@ -533,6 +578,7 @@ class JobLogWriter:
         # result). The flush loop only handles the head's persistent copy.
         if not is_error:
             SELF["pending_logs"].append(document)
+            SELF["results_news"].set()
         self.log_buffers[input_index] = {"logs": [], "size_bytes": 0}
 
     def _queue_all_buffers_locked(self):
@@ -571,6 +617,13 @@ class JobLogWriter:
                 stripped_message.removeprefix(LOG_START_MARKER_PREFIX)
             )
             return
+        if stripped_message.startswith(LOG_LINE_MARKER_PREFIX):
+            # A line printed by one of several concurrent calls, which tag
+            # their output instead of printing start markers.
+            tagged_message = message.split(LOG_LINE_MARKER_PREFIX, 1)[1]
+            input_index, _, message = tagged_message.partition(":")
+            self._write_locked(int(input_index), message, timestamp)
+            return
         if stripped_message.startswith(LOG_END_MARKER_PREFIX):
             input_index = int(stripped_message.removeprefix(LOG_END_MARKER_PREFIX))
             self._queue_document_locked(input_index)
@@ -617,10 +670,11 @@ class JobLogWriter:
             }
             self.pending_documents.append(document)
             SELF["pending_logs"].append(document)
+            SELF["results_news"].set()
             self.pending_flush_event.set()
 
     async def finish_input(self, input_index: int):
-        # UDF prints ride the container log stream, which can trail the TCP
+        # UDF prints ride the container log stream, which can trail the socket
         # result by a few ms; wait for the end-of-input marker so this
         # input's logs are client-visible before its result is released.
         # (2s cap: a crashed container never prints the marker.)
@@ -701,6 +755,93 @@ def _worker_boot_timeout_error(logs: str):
     return RuntimeError(message)
 
 
+def _requeue_retry(job_id: str, input_index: int, input_pkl: bytes):
+    # A timer from a job that has since ended: its state is already reset.
+    if SELF["current_job"] != job_id:
+        return
+    SELF["pending_retries"] -= 1
+    SELF["inputs_queue"].put_nowait((input_index, input_pkl), len(input_pkl))
+
+
+def take_stragglers(max_inputs: int) -> list:
+    """Copies of up to `max_inputs` of this node's stragglers, longest running
+    first, to run again speculatively. Each input is only copied once."""
+    active_workers = [worker for worker in SELF["workers"] if not worker.retired]
+    seconds_per_input = sorted(
+        worker.seconds_per_input
+        for worker in active_workers
+        if worker.seconds_per_input is not None
+    )
+    min_running_seconds = STRAGGLER_MIN_RUNNING_SECONDS
+    if seconds_per_input:
+        typical_seconds = seconds_per_input[len(seconds_per_input) // 2]
+        min_running_seconds = max(
+            min_running_seconds, STRAGGLER_RUNNING_MULTIPLE * typical_seconds
+        )
+
+    now = time.perf_counter()
+    stragglers = []
+    for worker in active_workers:
+        for input_index, started_at in worker.call_started_at.items():
+            already_copied = (
+                input_index in SELF["speculated_inputs"]
+                or input_index in SELF["speculative_copies"]
+            )
+            if not already_copied and now - started_at > min_running_seconds:
+                input_pkl = worker.in_flight[input_index]
+                stragglers.append((started_at, input_index, input_pkl))
+    stragglers.sort(key=lambda straggler: straggler[0])
+
+    copies = []
+    for _, input_index, input_pkl in stragglers[:max_inputs]:
+        SELF["speculated_inputs"].add(input_index)
+        copies.append((input_index, input_pkl))
+    return copies
+
+
+def _is_first_result(input_index: int) -> bool:
+    # False for the second result of an input this node ran twice (or that a
+    # peer ran a copy of and claimed first), dropped.
+    if input_index not in SELF["speculated_inputs"]:
+        return True
+    if input_index in SELF["speculated_results"]:
+        return False
+    SELF["speculated_results"].add(input_index)
+    return True
+
+
+async def _deliver_copy_result(job_id: str, result: tuple):
+    """Delivers this node's result for a copy of a peer's input if that peer,
+    which holds the original and so alone can tell which finished first, says
+    it is the first. Only the first is delivered and counted, keeping the
+    job's result totals exact. Otherwise, or if the peer can't be asked, the
+    result is dropped: the peer still owns the input and delivers its own."""
+    input_index = result[0]
+    origin_host = SELF["speculative_copies"][input_index]
+    url = f"{origin_host}/jobs/{job_id}/claim_result"
+    for attempt in range(CLAIM_RESULT_ATTEMPTS):
+        if attempt:
+            await asyncio.sleep(1)
+        try:
+            async with SELF["peer_session"].post(
+                url,
+                params={"input_index": input_index},
+                headers=SELF["auth_headers"],
+                timeout=CLAIM_RESULT_TIMEOUT,
+            ) as response:
+                response.raise_for_status()
+                is_first_result = (await response.json())["first"]
+            break
+        except Exception:
+            continue
+    else:
+        return
+    if is_first_result and SELF["current_job"] == job_id:
+        await SELF["results_queue"].put(result, len(result[2]))
+        SELF["results_news"].set()
+        SELF["num_results_received"] += 1
+
+
 async def retire_workers_for_pressure(
     selected_workers: list[tuple[float, "WorkerClient"]],
     reason: str,
@@ -718,18 +859,15 @@ async def retire_workers_for_pressure(
         if not selected_workers:
             return
 
-        current_inputs = [
-            (worker, worker.current_input) for _, worker in selected_workers
-        ]
+        workers = [worker for _, worker in selected_workers]
         old_parallelism = len(active_workers)
-        new_parallelism = old_parallelism - len(current_inputs)
+        new_parallelism = old_parallelism - len(workers)
         input_indexes = []
-        for worker, current_input in current_inputs:
-            input_index, input_pkl = current_input
-            input_indexes.append(input_index)
+        for worker in workers:
+            input_indexes.extend(worker.in_flight)
             worker.retired = True
             worker.is_idle = True
-            await SELF["inputs_queue"].put((input_index, input_pkl), len(input_pkl))
+            await worker._requeue_in_flight_inputs()
 
         SELF["reboot_containers_after_job"] = True
         SELF["last_pressure_retirement_at"] = time.time()
@@ -746,19 +884,14 @@ async def retire_workers_for_pressure(
             new_parallelism=new_parallelism,
         )
 
-        for worker, _ in current_inputs:
-            worker.current_input = None
-
-        await asyncio.gather(
-            *(worker.retire_for_pressure() for worker, _ in current_inputs)
-        )
+        await asyncio.gather(*(worker.retire_for_pressure() for worker in workers))
 
 
 class WorkerClient:
     def __init__(self, image: str, gpu_index: int | None = None):
         self.gpu_index = gpu_index
         self.container_name = f"worker_{uuid4().hex[:8]}"
-        self.port = None
+        self.socket_path = f"{WORKER_SOCKET_DIR}/{self.container_name}.sock"
         self.image = image
         self.docker = aiodocker.Docker()
         self.is_idle = True
@@ -774,18 +907,59 @@ class WorkerClient:
         self._psutil_process = None
         self.oom_kill_marker_count = 0
         self.retired = False
-        self.current_input = None
+        # {input_index: input_pkl} sent to the worker and not answered yet,
+        # in the order they were sent. The worker runs the first
+        # `_max_running_inputs()` of them, the rest wait in its socket.
+        self.in_flight = {}
+        self.call_attempts = {}  # input_index -> attempt id, running inputs
+        self.call_started_at = {}  # input_index -> time.perf_counter() at start
+        self.last_response_at = None
+        self.seconds_per_input = None  # between answers, so 1 / throughput
+        self.input_ring = None  # large inputs to the worker
+        self.result_ring = None  # large results from it
+
+    @property
+    def current_input(self):
+        return next(iter(self.in_flight.items()), None)
+
+    @property
+    def n_running_inputs(self) -> int:
+        return min(len(self.in_flight), _max_running_inputs())
+
+    def _pipeline_depth(self) -> tuple[int, int]:
+        """(inputs to keep sent to the worker, smallest refill worth sending).
+        Refills wait until they're half the queue behind the running inputs
+        (or a whole batch for vectorized UDFs), so they go out as batches
+        rather than one command per answer."""
+        batch_size = SELF["batch_size"] or 1
+        # At least one, so even a slow UDF's next input is already at the
+        # worker when its call returns.
+        n_queued = 1
+        if self.seconds_per_input is not None:
+            n_queued = max(1, int(PIPELINE_TARGET_SECONDS / self.seconds_per_input))
+        if SELF["batch_size"]:
+            n_queued = max(n_queued, batch_size)
+        n_queued = min(n_queued, MAX_PIPELINED_INPUTS)
+        return _max_running_inputs() + n_queued, max(batch_size, n_queued // 2)
 
     def _worker_server_host_path(self):
         return str(Path(__file__).resolve().parent / "worker_server.py")
 
     async def _start_container(self):
-        binds = [f"{self._worker_server_host_path()}:/opt/burla/worker_server.py"]
+        shared_ring_path = Path(__file__).resolve().parent / "shared_ring.py"
+        # Resolved, since it's a symlink to the client's copy.
+        frames_path = (Path(__file__).parent / "_frames.py").resolve()
+        binds = [
+            f"{self._worker_server_host_path()}:/opt/burla/worker_server.py",
+            # Next to worker_server.py, which imports them. Prefixed so they
+            # can't shadow, or be shadowed by, a module of the user's.
+            f"{shared_ring_path}:/opt/burla/burla_shared_ring.py:ro",
+            f"{frames_path}:/opt/burla/burla_frames.py:ro",
+        ]
 
-        host_config = {
-            "PortBindings": {f"{WORKER_INTERNAL_PORT}/tcp": [{"HostIp": "127.0.0.1"}]},
-            "ShmSize": 16 * 1024**3,
-        }
+        os.makedirs(WORKER_SOCKET_DIR, exist_ok=True)
+        os.makedirs(SHARED_RING_DIR, exist_ok=True)
+        host_config = {"ShmSize": 16 * 1024**3}
 
         host_config["CgroupParent"] = "burla-workers.slice"
         if self.gpu_index is not None:
@@ -802,6 +976,8 @@ class WorkerClient:
                 # environment instead of copying gigabytes between mounts.
                 "/worker_service_storage:/worker_service_storage",
                 "/workspace/shared:/workspace/shared",
+                # The worker opens its SharedRing files at the same paths.
+                f"{SHARED_RING_DIR}:{SHARED_RING_DIR}",
                 # node_auth bind: see NODE_AUTH_DIR in node_service/__init__.py.
                 "/opt/burla/node_auth:/root/.config/burla",
                 # worker_server.py installs burla from this checkout when
@@ -831,7 +1007,7 @@ class WorkerClient:
                 'export PATH="/worker_service_python_env/bin:$PATH"; '
                 "oom_kill_count() { awk '$1 == \"oom_kill\" {print $2}' /sys/fs/cgroup/memory.events; }; "
                 "oom_kills=$(oom_kill_count); "
-                f"while true; do python /opt/burla/worker_server.py {WORKER_INTERNAL_PORT} {__version__}; "
+                f"while true; do python /opt/burla/worker_server.py {self.socket_path} {__version__}; "
                 "next_oom_kills=$(oom_kill_count); "
                 'if [ "$next_oom_kills" != "$oom_kills" ]; then '
                 f"echo '{OOM_KILL_MARKER_PREFIX}'\"$oom_kills->$next_oom_kills\"; "
@@ -845,7 +1021,6 @@ class WorkerClient:
             "Image": self.image,
             "Cmd": command,
             "WorkingDir": "/workspace",
-            "ExposedPorts": {f"{WORKER_INTERNAL_PORT}/tcp": {}},
             "HostConfig": host_config,
             "Labels": {
                 "burla-cluster": BURLA_CLUSTER_NAME,
@@ -874,16 +1049,6 @@ class WorkerClient:
         )
         self.container_id = self.container.id
 
-    async def _get_host_port(self):
-        for _ in range(20):
-            port_info = await self.container.port(WORKER_INTERNAL_PORT)
-            if port_info:
-                return int(port_info[0]["HostPort"])
-            await asyncio.sleep(0.5)
-        raise RuntimeError(
-            f"Failed to get port for container {self.container_name} in 10s"
-        )
-
     async def _get_worker_host_pid(self) -> int:
         # Docker's /top endpoint returns host PIDs of every process in the container.
         # aiodocker doesn't expose a wrapper for it so we call it via the internal client.
@@ -963,21 +1128,19 @@ class WorkerClient:
     async def boot(self):
         await self._start_container()
         self.python_version = await self._get_python_version()
-        self.port = await self._get_host_port()
         boot_started_at = time.perf_counter()
         while True:
             try:
-                self.reader, self.writer = await asyncio.open_connection(
-                    "127.0.0.1", self.port
+                self.reader, self.writer = await asyncio.open_unix_connection(
+                    self.socket_path
                 )
-                worker_socket = self.writer.get_extra_info("socket")
-                worker_socket.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
                 self.writer.write(b"s")
                 await self.writer.drain()
                 await self.reader.readexactly(1)
                 break
             except (
-                ConnectionRefusedError,
+                FileNotFoundError,  # worker_server.py hasn't bound its socket yet
+                ConnectionRefusedError,  # predecessor's socket file, not bound yet
                 ConnectionResetError,
                 asyncio.IncompleteReadError,
             ):
@@ -1021,12 +1184,11 @@ class WorkerClient:
     async def _retire_after_dynamic_worker_failure(
         self,
         input_index: int,
-        input_pkl: bytes,
         error: WorkerOutOfMemoryError | WorkerProcessTerminatedError,
     ):
         async with SELF["dynamic_retire_lock"]:
             # A pressure retirement already requeued this input (it clears
-            # current_input before killing the process). Requeueing or
+            # in_flight before killing the process). Requeueing or
             # delivering here too would run the input twice.
             if self.current_input is None:
                 return None
@@ -1039,11 +1201,22 @@ class WorkerClient:
                 if not worker.retired and worker is not self
             ]
             if not other_active_workers:
+                if self._take_retry(input_index):
+                    # No other worker can rerun the input, so this one does,
+                    # on a fresh container (see `_process_inputs`).
+                    self.retired = False
+                    return None
                 if isinstance(error, WorkerOutOfMemoryError):
                     error = _dynamic_terminal_oom_error()
                 self.retired = True
                 SELF["reboot_containers_after_job"] = True
-                return (input_index, True, self._serialize_error(error))
+                # No worker is left to run this one's other inputs either, and
+                # requeued they would wait forever: they fail the same way.
+                error_pkl = self._serialize_error(error)
+                return [
+                    (failed_index, True, error_pkl, False)
+                    for failed_index in self._drop_in_flight_inputs()
+                ]
 
             old_parallelism = len(other_active_workers) + 1
             new_parallelism = old_parallelism - 1
@@ -1051,7 +1224,7 @@ class WorkerClient:
             self.is_idle = True
             SELF["reboot_containers_after_job"] = True
             SELF["last_pressure_retirement_at"] = time.time()
-            await SELF["inputs_queue"].put((input_index, input_pkl), len(input_pkl))
+            await self._requeue_in_flight_inputs()
 
             reason = (
                 "worker process exit"
@@ -1078,25 +1251,48 @@ class WorkerClient:
     async def retire_for_pressure(self):
         await self._kill_worker_process()
 
-    async def _read_response(self):
+    async def _read_status(self) -> bytes:
         try:
-            status = await self.reader.readexactly(1)
+            return await self.reader.readexactly(1)
         except (ConnectionResetError, asyncio.IncompleteReadError):
             await self._raise_if_worker_failed()
+
+    async def _read_response(self, status: bytes | None = None):
+        if status is None:
+            status = await self._read_status()
         if status == b"s":
             payload_size = int.from_bytes(await self.reader.readexactly(8), "big")
             payload = await self.reader.readexactly(payload_size)
             if payload:
                 return payload
             return None
+        if status == b"m":
+            # A result too big for the socket, waiting in the result ring.
+            location = await self.reader.readexactly(16)
+            position = int.from_bytes(location[:8], "big")
+            size = int.from_bytes(location[8:], "big")
+            return self.result_ring.take(position, size)
         if status == b"e":
             error_size = int.from_bytes(await self.reader.readexactly(8), "big")
             error_response = pickle.loads(await self.reader.readexactly(error_size))
             raise WorkerFunctionError(
-                error_response["error_info_pkl"], error_response["traceback_str"]
+                error_response["error_info_pkl"],
+                error_response["traceback_str"],
+                error_response["retryable"],
             )
         raise Exception(f"unknown response status: {status}")
 
+    async def _log_failure(self, input_index: int, traceback_str: str, retry: bool):
+        # A retried failure is only a warning: the input hasn't failed yet.
+        if self.log_writer is None:
+            return
+        if retry:
+            n_failures = SELF["input_failures"][input_index]
+            message = f"Retrying (retry {n_failures} of {SELF['retries']}) after:\n"
+            await self.log_writer.write_warning(input_index, message + traceback_str)
+        else:
+            await self.log_writer.write_error(input_index, traceback_str)
+
     def _serialize_error(self, error: Exception):
         if isinstance(error, WorkerFunctionError):
             return error.error_info_pkl
@@ -1107,72 +1303,242 @@ class WorkerClient:
             {"traceback_str": traceback_str, "is_infrastructure_error": True}
         )
 
+    def _record_call_starts(self):
+        # Exact call tracking: an attempt starts when its input is among the
+        # ones the worker is running and ends when it stops for any reason
+        # (answer, worker death, requeue, cancel). Attempt ids lead with how
+        # many times the input has been retried.
+        job_id = SELF["current_job"]
+        for input_index in list(self.in_flight)[: _max_running_inputs()]:
+            if input_index not in self.call_attempts:
+                n_retries = SELF["input_failures"].get(input_index, 0)
+                attempt = f"{n_retries}-{uuid4().hex[:12]}"
+                self.call_attempts[input_index] = attempt
+                self.call_started_at[input_index] = time.perf_counter()
+                record_call_event("start", job_id, input_index, attempt)
+
+    def _record_call_end(self, input_index: int):
+        self.call_started_at.pop(input_index, None)
+        attempt = self.call_attempts.pop(input_index, None)
+        if attempt is not None:
+            record_call_event("end", SELF["current_job"], input_index, attempt)
+
+    def _drop_in_flight_inputs(self) -> dict:
+        for input_index in list(self.call_attempts):
+            self._record_call_end(input_index)
+        dropped_inputs = self.in_flight
+        self.in_flight = {}
+        return dropped_inputs
+
+    async def _requeue_in_flight_inputs(self):
+        # For when this worker won't answer them: another worker can.
+        for input_index, input_pkl in self._drop_in_flight_inputs().items():
+            await SELF["inputs_queue"].put((input_index, input_pkl), len(input_pkl))
+
+    def _take_retry(self, input_index: int) -> bool:
+        """Uses up one of the job's `retries` for `input_index`, False when it
+        has none left."""
+        n_failures = SELF["input_failures"].get(input_index, 0)
+        if n_failures >= SELF["retries"]:
+            return False
+        SELF["input_failures"][input_index] = n_failures + 1
+        return True
+
+    async def _retry_input(self, input_index: int, input_pkl: bytes):
+        """Puts a failed input back on the inputs queue, after its backoff, for
+        any worker (or node stealing inputs) to run again. The backoff runs on
+        a timer so this worker goes on answering its other inputs; it counts
+        in `pending_retries` meanwhile so the node doesn't look drained."""
+        n_failures = SELF["input_failures"][input_index]
+        backoff_seconds = min(
+            RETRY_BACKOFF_SECONDS * 2 ** (n_failures - 1), RETRY_MAX_BACKOFF_SECONDS
+        )
+        await debug_log(
+            "input_retried",
+            input_index=input_index,
+            retry=n_failures,
+            backoff_seconds=backoff_seconds,
+        )
+        SELF["pending_retries"] += 1
+        asyncio.get_running_loop().call_later(
+            backoff_seconds,
+            _requeue_retry,
+            SELF["current_job"],
+            input_index,
+            input_pkl,
+        )
+
+    async def _reboot_after_failure(self) -> bool:
+        """Replaces this worker's container with a fresh one running the job's
+        function, after an infrastructure failure left it in an unknown state.
+        False if the new one fails to boot."""
+        try:
+            await self._delete_container()
+            await self.boot()
+            await self.load_function(
+                SELF["function_path"],
+                SELF["batch_size"],
+                SELF["func_concurrency"],
+                SELF["result_sink"],
+                SELF["retry_on"],
+            )
+        except Exception as e:
+            await debug_log("worker_reboot_failed", error=f"{type(e).__name__}: {e}")
+            return False
+        self.oom_kill_marker_count = 0
+        return True
+
+    def _take_queued_inputs(self, n_inputs: int, taken: list) -> list:
+        # A speculative copy of an input this worker is still running (or just
+        # `taken`) stays queued for another worker: rerunning it here can't
+        # finish sooner, and `in_flight` holds one call per input.
+        taken_indexes = {input_index for input_index, _ in taken}
+        inputs = []
+        skipped = []
+        while len(inputs) < n_inputs and not SELF["inputs_queue"].empty():
+            input_with_index = SELF["inputs_queue"].get_nowait()
+            input_index = input_with_index[0]
+            if input_index in self.in_flight or input_index in taken_indexes:
+                skipped.append(input_with_index)
+            else:
+                inputs.append(input_with_index)
+                taken_indexes.add(input_index)
+        for input_with_index in skipped:
+            SELF["inputs_queue"].put_nowait(input_with_index, len(input_with_index[1]))
+        return inputs
+
+    async def _read_input_index(self) -> int:
+        # Answers to `b` commands lead with their input's index: with
+        # func_concurrency > 1 they arrive in completion order.
+        try:
+            input_index_bytes = await self.reader.readexactly(8)
+        except (ConnectionResetError, asyncio.IncompleteReadError):
+            await self._raise_if_worker_failed()
+        return int.from_bytes(input_index_bytes, "big")
+
+    async def _queue_partial_result(self, input_index: int):
+        """Queues an item a generator UDF yielded for `input_index`, which is
+        still running. Stops reading from the worker while the results queue
+        is full, so once its socket fills the UDF blocks at its next yield."""
+        result_size = int.from_bytes(await self.reader.readexactly(8), "big")
+        result_pkl = await self.reader.readexactly(result_size)
+        result = (input_index, False, result_pkl, True)
+        await SELF["results_queue"].put(result, result_size)
+        SELF["results_news"].set()
+        while SELF["results_queue"].size_bytes > RESULTS_QUEUE_RAM_LIMIT_BYTES:
+            await asyncio.sleep(0.1)
+
     async def _process_inputs(self):
         while True:
-            self.is_idle = True
-            while SELF["results_queue"].size_bytes > RESULTS_QUEUE_RAM_LIMIT_BYTES:
-                await asyncio.sleep(0.1)
-            input_index, input_pkl = await SELF["inputs_queue"].get()
-
-            self.is_idle = False
-            self.current_input = (input_index, input_pkl)
+            new_inputs = []
+            if not self.in_flight:
+                self.is_idle = True
+                while SELF["results_queue"].size_bytes > RESULTS_QUEUE_RAM_LIMIT_BYTES:
+                    await asyncio.sleep(0.1)
+                new_inputs.append(await SELF["inputs_queue"].get())
+                self.is_idle = False
+                self.last_response_at = time.perf_counter()
+            pipeline_depth, min_refill = self._pipeline_depth()
+            n_wanted = pipeline_depth - len(self.in_flight) - len(new_inputs)
+            results_queue_full = (
+                SELF["results_queue"].size_bytes > RESULTS_QUEUE_RAM_LIMIT_BYTES
+            )
+            if n_wanted >= min_refill and not results_queue_full:
+                new_inputs.extend(self._take_queued_inputs(n_wanted, new_inputs))
+            self.in_flight.update(new_inputs)
+            self._record_call_starts()
             await self._ensure_log_writer()
-            # Exact call tracking: this is the moment the input is handed to
-            # the worker, and the finally below is the moment this attempt
-            # stops for any reason (result, error, worker death, cancel).
-            job_id = SELF["current_job"]
-            attempt = uuid4().hex[:12]
-            record_call_event("start", job_id, input_index, attempt)
+
+            # Blamed if the worker dies before answering anything.
+            input_index = self.current_input[0]
             stop_after_result = False
+            # Retrying an infrastructure failure also reboots the worker.
+            retry = False
+            reboot = False
             try:
-                result_pkl = await self.call_function(input_index, input_pkl)
-                result = (input_index, False, result_pkl)
+                if new_inputs:
+                    self.send_inputs(new_inputs)
+                input_index = await self._read_input_index()
+                status = await self._read_status()
+                while status == b"p":
+                    await self._queue_partial_result(input_index)
+                    input_index = await self._read_input_index()
+                    status = await self._read_status()
+                # Empty for a generator UDF: its items were the partial results.
+                result_pkl = await self._read_response(status) or b""
+                result = (input_index, False, result_pkl, False)
             except asyncio.CancelledError:
                 raise
             except WorkerFunctionError as error:
-                if self.log_writer is not None:
-                    await self.log_writer.write_error(input_index, error.traceback_str)
-                result = (input_index, True, error.error_info_pkl)
+                retry = error.retryable and self._take_retry(input_index)
+                await self._log_failure(input_index, error.traceback_str, retry)
+                result = (input_index, True, error.error_info_pkl, False)
             except (WorkerOutOfMemoryError, WorkerProcessTerminatedError) as error:
                 if SELF["dynamic_func_ram"]:
-                    result = await self._retire_after_dynamic_worker_failure(
-                        input_index, input_pkl, error
+                    results = await self._retire_after_dynamic_worker_failure(
+                        input_index, error
                     )
-                    if result is None:
+                    if results is not None:
+                        # Terminal: no other worker is left to retry these inputs.
+                        # Deliver here, bypassing the `self.retired` early-return
+                        # below: the RAM monitor races this handler (it retires a
+                        # worker the moment its process disappears) and used to
+                        # win, swallowing the error and hanging the job.
+                        for result in results:
+                            # A copy's input belongs to the peer it came from.
+                            if result[0] in SELF["speculative_copies"]:
+                                continue
+                            if _is_first_result(result[0]):
+                                await SELF["results_queue"].put(result, len(result[2]))
+                                SELF["results_news"].set()
+                                SELF["num_results_received"] += 1
                         return
-                    # Terminal: no other worker is left to retry this input.
-                    # Deliver here, bypassing the `self.retired` early-return
-                    # below: the RAM monitor races this handler (it retires a
-                    # worker the moment its process disappears) and used to
-                    # win, swallowing the error and hanging the job.
-                    await SELF["results_queue"].put(result, len(result[2]))
-                    SELF["num_results_received"] += 1
-                    return
+                    if self.retired:
+                        return
+                    # Kept as the last worker to rerun its input.
+                    retry = reboot = True
                 else:
-                    if self.log_writer is not None:
-                        await self.log_writer.write_error(
-                            input_index, self._traceback_string(error)
-                        )
-                    result = (input_index, True, self._serialize_error(error))
+                    retry = reboot = self._take_retry(input_index)
+                traceback_str = self._traceback_string(error)
+                await self._log_failure(input_index, traceback_str, retry)
+                result = (input_index, True, self._serialize_error(error), False)
                 stop_after_result = True
             except BaseException as error:
-                if self.log_writer is not None:
-                    await self.log_writer.write_error(
-                        input_index, self._traceback_string(error)
-                    )
-                result = (input_index, True, self._serialize_error(error))
+                retry = reboot = self._take_retry(input_index)
+                traceback_str = self._traceback_string(error)
+                await self._log_failure(input_index, traceback_str, retry)
+                result = (input_index, True, self._serialize_error(error), False)
             finally:
-                record_call_event("end", job_id, input_index, attempt)
+                self._record_call_end(input_index)
                 if self.log_writer is not None:
                     await self.log_writer.finish_input(input_index)
-                self.current_input = None
 
             if self.retired:
-                self.current_input = None
                 return
-            await SELF["results_queue"].put(result, len(result[2]))
-            SELF["num_results_received"] += 1
+            input_pkl = self.in_flight.pop(input_index)
+            now = time.perf_counter()
+            seconds = now - self.last_response_at
+            self.last_response_at = now
+            if self.seconds_per_input is None:
+                self.seconds_per_input = seconds
+            else:
+                self.seconds_per_input = 0.8 * self.seconds_per_input + 0.2 * seconds
+            if reboot:
+                await self._requeue_in_flight_inputs()
+                retry = await self._reboot_after_failure()
+                stop_after_result = not retry
+            if retry:
+                await self._retry_input(input_index, input_pkl)
+                continue
+            if input_index in SELF["speculative_copies"]:
+                # Asking the peer takes a round trip; this worker moves on.
+                asyncio.create_task(_deliver_copy_result(SELF["current_job"], result))
+            elif _is_first_result(input_index):
+                await SELF["results_queue"].put(result, len(result[2]))
+                SELF["results_news"].set()
+                SELF["num_results_received"] += 1
             if stop_after_result:
+                await self._requeue_in_flight_inputs()
                 return
 
     async def install_packages(self, packages: dict):
@@ -1186,11 +1552,36 @@ class WorkerClient:
         except (BrokenPipeError, ConnectionResetError):
             await self._raise_if_worker_failed()
 
-    async def load_function(self, function_bytes: bytes):
+    async def load_function(
+        self,
+        function_path: str,
+        batch_size: int | None,
+        func_concurrency: int,
+        result_sink: str | None,
+        retry_on: list[str],
+    ):
+        # Workers read the function from the shared payload cache themselves
+        # instead of every worker receiving its own copy over the socket.
+        # Fresh rings per job: whatever the last one left in them is stale.
+        self._close_rings()
+        os.makedirs(SHARED_RING_DIR, exist_ok=True)
+        ring_path = f"{SHARED_RING_DIR}/{self.container_name}"
+        self.input_ring = SharedRing(f"{ring_path}-inputs", create=True)
+        self.result_ring = SharedRing(f"{ring_path}-results", create=True)
+        function_settings = {
+            "function_path": function_path,
+            "batch_size": batch_size,
+            "func_concurrency": func_concurrency,
+            "result_sink": result_sink,
+            "retry_on": retry_on,
+            "input_ring_path": f"{ring_path}-inputs",
+            "result_ring_path": f"{ring_path}-results",
+        }
+        payload = json.dumps(function_settings).encode()
         try:
             self.writer.write(b"l")
-            self.writer.write(len(function_bytes).to_bytes(8, "big"))
-            self.writer.write(function_bytes)
+            self.writer.write(len(payload).to_bytes(8, "big"))
+            self.writer.write(payload)
             await self.writer.drain()
             await self._read_response()
             if self.process_inputs_task is None:
@@ -1198,18 +1589,36 @@ class WorkerClient:
         except (BrokenPipeError, ConnectionResetError):
             await self._raise_if_worker_failed()
 
-    async def call_function(self, input_index: int, argument_bytes: bytes):
-        try:
-            payload = pickle.dumps(
-                {"input_index": input_index, "argument_bytes": argument_bytes}
-            )
-            self.writer.write(b"c")
-            self.writer.write(len(payload).to_bytes(8, "big"))
-            self.writer.write(payload)
-            await self.writer.drain()
-            return await self._read_response()
-        except (BrokenPipeError, ConnectionResetError):
-            await self._raise_if_worker_failed()
+    def send_inputs(self, inputs: list):
+        """Queues `inputs` on the worker as one `b` command without waiting
+        for it: the worker answers each one separately, in order. Each input's
+        frames are written as-is after its index and size (no wrapping pickle)
+        so the worker unpickles their out-of-band buffers in place. Large ones
+        go through the input ring instead, and only their position is sent.
+
+        Never waits for the socket to drain: the transport sends the command
+        in the background while `_process_inputs` goes on reading answers. A
+        worker running one call at a time doesn't read its socket while it
+        sends a result, so waiting here for it to take a large refill (with
+        its answers piling up unread) would deadlock both sides once their
+        socket buffers fill. `_pipeline_depth` bounds what can be waiting."""
+        entries = []
+        for input_index, input_pkl in inputs:
+            position = None
+            if len(input_pkl) >= SHARED_RING_THRESHOLD_BYTES:
+                position = self.input_ring.put([input_pkl], len(input_pkl))
+            size = len(input_pkl).to_bytes(8, "big")
+            if position is None:
+                entry = [b"s", size, input_pkl]
+            else:
+                entry = [b"m", size, position.to_bytes(8, "big")]
+            entries.append([input_index.to_bytes(8, "big"), *entry])
+        # A dead worker surfaces on the next read instead.
+        self.writer.write(b"b")
+        payload_size = sum(len(part) for entry in entries for part in entry)
+        self.writer.write(payload_size.to_bytes(8, "big"))
+        for entry in entries:
+            self.writer.writelines(entry)
 
     async def reset(self):
         if self.process_inputs_task is not None:
@@ -1219,9 +1628,11 @@ class WorkerClient:
             except asyncio.CancelledError:
                 pass
             self.process_inputs_task = None
+        self._drop_in_flight_inputs()
+        self.seconds_per_input = None
         if not self.is_idle:
             # Worker is mid-UDF. The worker_server.py main thread is blocked inside the
-            # user's function and can't service the 'r' byte over TCP until the call returns.
+            # user's function and can't service the 'r' byte over its socket until the call returns.
             # Waiting on the UDF can take arbitrarily long, so kill the container and
             # boot a fresh one instead.
             await self._restart_container()
@@ -1240,17 +1651,16 @@ class WorkerClient:
         reconnect_started_at = time.perf_counter()
         while True:
             try:
-                self.reader, self.writer = await asyncio.open_connection(
-                    "127.0.0.1", self.port
+                self.reader, self.writer = await asyncio.open_unix_connection(
+                    self.socket_path
                 )
-                worker_socket = self.writer.get_extra_info("socket")
-                worker_socket.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
                 self.writer.write(b"s")
                 await self.writer.drain()
                 await self.reader.readexactly(1)
                 break
             except (
-                ConnectionRefusedError,
+                FileNotFoundError,  # worker_server.py hasn't bound its socket yet
+                ConnectionRefusedError,  # predecessor's socket file, not bound yet
                 ConnectionResetError,
                 asyncio.IncompleteReadError,
             ):
@@ -1292,6 +1702,13 @@ class WorkerClient:
             pass
         await self._reconnect()
 
+    def _close_rings(self):
+        for ring in (self.input_ring, self.result_ring):
+            if ring is not None:
+                ring.delete()
+        self.input_ring = None
+        self.result_ring = None
+
     async def _kill_worker_process(self):
         if self.writer is not None:
             try:
@@ -1312,6 +1729,8 @@ class WorkerClient:
             await self.log_writer.stop()
             self.log_writer = None
         os.killpg(self.worker_host_pid, signal.SIGKILL)
+        self._close_rings()
+        Path(self.socket_path).unlink(missing_ok=True)
         container_id = self.container_id
         self.container = None
         self.container_id = None
@@ -1339,6 +1758,8 @@ class WorkerClient:
             await self.log_writer.stop()
             self.log_writer = None
         await self.container.delete(force=True)
+        self._close_rings()
+        Path(self.socket_path).unlink(missing_ok=True)
         self.container = None
         self.container_id = None
         self.worker_host_pid = None
@@ -1,6 +1,9 @@
+import asyncio
+import contextvars
 import hashlib
 import importlib
 import importlib.metadata
+import inspect
 import io
 import json
 import os
@@ -73,8 +76,29 @@ if installed_burla_version != target_burla_version:
 import cloudpickle
 from tblib import Traceback
 
+# Mounted next to this file from node_service (its shared_ring.py).
+from burla_shared_ring import SHARED_RING_THRESHOLD_BYTES, SharedRing
+
+# Mounted next to this file from the client (its burla/_frames.py).
+from burla_frames import dump_frames, load_frames
+
 LOG_START_MARKER_PREFIX = "__burla_input_start__:"
 LOG_END_MARKER_PREFIX = "__burla_input_end__:"
+LOG_LINE_MARKER_PREFIX = "__burla_input_log__:"
+SMALL_RESPONSE_BYTES = 64 * 1024
+
+
+# The loaded job's rings, opened at `l`, its result sink directory and
+# the names of the exception types its inputs are retried on.
+input_ring = None
+result_ring = None
+result_sink = None
+retry_on = []
+
+SHARED_WORKSPACE_PATH = "/workspace/shared"
+# Whether the result sink's mount can rename files (mount-s3 can't), found out
+# at the first sunk result.
+result_sink_renames = True
 
 
 def kill_all_other_processes():
@@ -92,12 +116,16 @@ def kill_all_other_processes():
 
 
 def receive_exactly(connection, byte_count):
-    payload = b""
-    while len(payload) < byte_count:
-        chunk = connection.recv(byte_count - len(payload))
-        if not chunk:
-            return payload
-        payload += chunk
+    # Writable, so arguments unpickled in place from it (see `load_frames`)
+    # are too.
+    payload = bytearray(byte_count)
+    view = memoryview(payload)
+    received = 0
+    while received < byte_count:
+        chunk_size = connection.recv_into(view[received:])
+        if not chunk_size:
+            return payload[:received]
+        received += chunk_size
     return payload
 
 
@@ -146,7 +174,7 @@ def _subprocess_output(result):
 
 
 # Read by node_service to answer the client's install-progress poll (path
-# duplicated in job_endpoints.py): this worker's TCP socket is blocked inside
+# duplicated in job_endpoints.py): this worker's socket is blocked inside
 # the `i` command for the whole install, so progress leaves the container
 # through this bind-mounted file instead.
 INSTALLING_PACKAGE_PATH = "/worker_service_storage/installing_package.txt"
@@ -418,17 +446,411 @@ def load_function_payload(payload):
     return cloudpickle.loads(function_pkl), module_names, module_path
 
 
+def is_retryable(e):
+    # Matched by name: the client sends names, since unpickling the classes
+    # could import user code the node doesn't have.
+    type_names = {f"{cls.__module__}.{cls.__qualname__}" for cls in type(e).__mro__}
+    return not type_names.isdisjoint(retry_on)
+
+
+def error_response_frames(e):
+    tb_dict = Traceback(e.__traceback__).to_dict()
+    error_info = dict(type=type(e), exception=e, traceback_dict=tb_dict)
+    error_response = {
+        "error_info_pkl": pickle.dumps(error_info),
+        "traceback_str": "".join(
+            traceback.format_exception(type(e), e, e.__traceback__)
+        ),
+        "retryable": is_retryable(e),
+    }
+    return [pickle.dumps(error_response)]
+
+
+send_lock = threading.Lock()
+
+
+def send_response(connection, status, response_frames, input_index=None):
+    response_size = sum(len(frame) for frame in response_frames)
+    with send_lock:
+        # Inside the lock: the node takes results out of the ring in the order
+        # they're sent, which must be the order they were put in.
+        if (
+            status == b"s"
+            and input_index is not None
+            and response_size >= SHARED_RING_THRESHOLD_BYTES
+        ):
+            position = result_ring.put(response_frames, response_size)
+            if position is not None:
+                status = b"m"
+                response_frames = [
+                    position.to_bytes(8, "big") + response_size.to_bytes(8, "big")
+                ]
+                response_size = 16
+        response_prefix = status + response_size.to_bytes(8, "big")
+        if input_index is not None:
+            # Answers to `b` commands lead with their input: with func_concurrency
+            # > 1 they're sent in completion order, not the order they came in.
+            response_prefix = input_index.to_bytes(8, "big") + response_prefix
+        if response_size < SMALL_RESPONSE_BYTES:
+            # One send: each frame would otherwise wake the node's reader.
+            connection.sendall(b"".join([response_prefix, *response_frames]))
+        else:
+            # Large buffers go straight from the return value's memory.
+            connection.sendall(response_prefix)
+            for frame in response_frames:
+                connection.sendall(frame)
+
+
+# The input of the call running in this thread (thread pool) or task
+# (coroutine UDFs), None on the main thread.
+current_input_index = contextvars.ContextVar("current_input_index", default=None)
+
+
+class TaggedOutput(io.TextIOBase):
+    """Replaces sys.stdout/sys.stderr once calls run concurrently. Start/end
+    markers can't say which of several running calls printed a line, so each
+    complete line a call prints is tagged with its input index instead.
+    Output from anything that isn't running a call passes through untagged."""
+
+    def __init__(self, stream):
+        self.stream = stream
+        self.partial_lines = {}  # input_index -> text after its last newline
+
+    def write(self, text):
+        input_index = current_input_index.get()
+        if input_index is None:
+            return self.stream.write(text)
+        buffered_text = self.partial_lines.pop(input_index, "") + text
+        *lines, partial_line = buffered_text.split("\n")
+        if partial_line:
+            self.partial_lines[input_index] = partial_line
+        for line in lines:
+            self.stream.write(f"{LOG_LINE_MARKER_PREFIX}{input_index}:{line}\n")
+        return len(text)
+
+    def finish_line(self):
+        if current_input_index.get() in self.partial_lines:
+            self.write("\n")
+
+    def flush(self):
+        self.stream.flush()
+
+    def fileno(self):
+        return self.stream.fileno()
+
+    def isatty(self):
+        return self.stream.isatty()
+
+
+class CoroutineRunner:
+    """Runs calls of an `async def` UDF on one event loop that lives as long
+    as the job's function is loaded, at most `concurrency` at a time. Same
+    `submit` as the ThreadPoolExecutor used for sync UDFs."""
+
+    def __init__(self, concurrency):
+        self.loop = asyncio.new_event_loop()
+        self.semaphore = asyncio.Semaphore(concurrency)
+        self.thread = threading.Thread(target=self.loop.run_forever, daemon=True)
+        self.thread.start()
+
+    async def _run(self, call, *args):
+        async with self.semaphore:
+            await call(*args)
+
+    def submit(self, call, *args):
+        asyncio.run_coroutine_threadsafe(self._run(call, *args), self.loop)
+
+    def shutdown(self):
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join()
+        self.loop.close()
+
+
+def start_call(input_index):
+    if threading.current_thread() is threading.main_thread():
+        print(f"{LOG_START_MARKER_PREFIX}{input_index}", flush=True)
+    else:
+        current_input_index.set(input_index)
+
+
+def end_call(input_indexes):
+    if threading.current_thread() is not threading.main_thread():
+        sys.stdout.finish_line()
+        sys.stderr.finish_line()
+        current_input_index.set(None)
+    for input_index in input_indexes:
+        print(f"{LOG_END_MARKER_PREFIX}{input_index}", flush=True)
+
+
+def batch_inputs(request_payload):
+    """(input index, argument frames) for each input in a `b` command, which
+    packs them as 8-byte index, 1-byte location, 8-byte length, then the
+    frames (location `s`, socket) or their 8-byte position in `input_ring`
+    (location `m`)."""
+    payload = memoryview(request_payload)
+    offset = 0
+    while offset < len(payload):
+        input_index = int.from_bytes(payload[offset : offset + 8], "big")
+        location = payload[offset + 8 : offset + 9]
+        input_size = int.from_bytes(payload[offset + 9 : offset + 17], "big")
+        offset += 17
+        if location == b"m":
+            position = int.from_bytes(payload[offset : offset + 8], "big")
+            yield input_index, input_ring.take(position, input_size)
+            offset += 8
+        else:
+            yield input_index, payload[offset : offset + input_size]
+            offset += input_size
+
+
+def send_error(connection, input_indexes, e):
+    response_frames = error_response_frames(e)
+    for input_index in input_indexes:
+        send_response(connection, b"e", response_frames, input_index)
+
+
+def sink_result(return_value, name):
+    """Writes a result to the job's `result_sink` directory in the shared
+    workspace bucket and returns its path, which goes back instead. Bytes are
+    written as-is, anything else pickled. Written to a temporary file first
+    and renamed into place, so a reader never sees a partial result."""
+    global result_sink_renames
+    if isinstance(return_value, (bytes, bytearray, memoryview)):
+        path, data = f"{result_sink}/{name}", return_value
+    else:
+        path, data = f"{result_sink}/{name}.pkl", cloudpickle.dumps(return_value)
+    if result_sink_renames:
+        temporary_path = f"{path}.{uuid4().hex}.tmp"
+        with open(temporary_path, "wb") as file:
+            file.write(data)
+        try:
+            os.replace(temporary_path, path)
+            return path
+        except OSError:
+            # No renames on this mount, but it only uploads a file once it's
+            # closed, so writing in place is just as atomic for readers.
+            result_sink_renames = False
+            os.remove(temporary_path)
+    with open(path, "wb") as file:
+        file.write(data)
+    return path
+
+
+async def send_off_loop(send, *args):
+    # Sinking results is a blocking write to a FUSE mount: done in a thread so
+    # it doesn't stall the other calls on an `async def` UDF's event loop.
+    if result_sink is None:
+        send(*args)
+    else:
+        await asyncio.to_thread(send, *args)
+
+
+def send_result(connection, input_index, return_value):
+    try:
+        if result_sink is not None:
+            return_value = sink_result(return_value, str(input_index))
+        response_frames = dump_frames(return_value, cloudpickle)
+    except BaseException as e:
+        send_error(connection, [input_index], e)
+    else:
+        send_response(connection, b"s", response_frames, input_index)
+
+
+def split_vectorized_return_value(return_value, n_inputs):
+    """Each input's own slice of a vectorized call's return value, taken by
+    position: `.iloc` rows for pandas, since indexing a DataFrame gives its
+    columns."""
+    if len(return_value) != n_inputs:
+        raise ValueError(
+            f"Function returned {len(return_value)} results for a batch of "
+            f"{n_inputs} inputs. With `batch_size` set it must return "
+            "one result per input, in order."
+        )
+    rows = getattr(return_value, "iloc", return_value)
+    return [rows[i] for i in range(n_inputs)]
+
+
+def send_vectorized_results(connection, input_indexes, return_value):
+    try:
+        return_values = split_vectorized_return_value(return_value, len(input_indexes))
+    except BaseException as e:
+        send_error(connection, input_indexes, e)
+        return
+    for input_index, return_value in zip(input_indexes, return_values):
+        send_result(connection, input_index, return_value)
+
+
+# A vectorized call gets a list of arguments and its prints are attributed to
+# the first input; an exception is every input's error. The `_async` variants
+# are the same calls for `async def` UDFs, run by a CoroutineRunner.
+
+
+def call_one(connection, loaded_function, inputs):
+    [(input_index, argument_frames)] = inputs
+    try:
+        argument = load_frames(argument_frames)
+        start_call(input_index)
+        try:
+            return_value = loaded_function(argument)
+        finally:
+            end_call([input_index])
+    except BaseException as e:
+        send_error(connection, [input_index], e)
+    else:
+        send_result(connection, input_index, return_value)
+
+
+def call_vectorized(connection, loaded_function, inputs):
+    input_indexes = [input_index for input_index, _ in inputs]
+    try:
+        arguments = [load_frames(argument_frames) for _, argument_frames in inputs]
+        start_call(input_indexes[0])
+        try:
+            return_value = loaded_function(arguments)
+        finally:
+            end_call(input_indexes)
+    except BaseException as e:
+        send_error(connection, input_indexes, e)
+    else:
+        send_vectorized_results(connection, input_indexes, return_value)
+
+
+async def call_one_async(connection, loaded_function, inputs):
+    [(input_index, argument_frames)] = inputs
+    try:
+        argument = load_frames(argument_frames)
+        start_call(input_index)
+        try:
+            return_value = await loaded_function(argument)
+        finally:
+            end_call([input_index])
+    except BaseException as e:
+        send_error(connection, [input_index], e)
+    else:
+        await send_off_loop(send_result, connection, input_index, return_value)
+
+
+async def call_vectorized_async(connection, loaded_function, inputs):
+    input_indexes = [input_index for input_index, _ in inputs]
+    try:
+        arguments = [load_frames(argument_frames) for _, argument_frames in inputs]
+        start_call(input_indexes[0])
+        try:
+            return_value = await loaded_function(arguments)
+        finally:
+            end_call(input_indexes)
+    except BaseException as e:
+        send_error(connection, input_indexes, e)
+    else:
+        await send_off_loop(
+            send_vectorized_results, connection, input_indexes, return_value
+        )
+
+
+# Generator UDFs send each item they yield as its own `p` (partial) answer,
+# then an empty result once they're exhausted. A full socket (the node stops
+# reading while its results queue is full) blocks them at their next yield.
+
+
+def send_item(connection, input_index, item_number, item):
+    if result_sink is not None:
+        item = sink_result(item, f"{input_index}-{item_number}")
+    send_response(connection, b"p", dump_frames(item, cloudpickle), input_index)
+
+
+def call_generator(connection, loaded_function, inputs):
+    [(input_index, argument_frames)] = inputs
+    try:
+        argument = load_frames(argument_frames)
+        start_call(input_index)
+        try:
+            for item_number, item in enumerate(loaded_function(argument)):
+                send_item(connection, input_index, item_number, item)
+        finally:
+            end_call([input_index])
+    except BaseException as e:
+        send_error(connection, [input_index], e)
+    else:
+        send_response(connection, b"s", [], input_index)
+
+
+async def call_async_generator(connection, loaded_function, inputs):
+    [(input_index, argument_frames)] = inputs
+    try:
+        argument = load_frames(argument_frames)
+        start_call(input_index)
+        try:
+            item_number = 0
+            async for item in loaded_function(argument):
+                await send_off_loop(
+                    send_item, connection, input_index, item_number, item
+                )
+                item_number += 1
+        finally:
+            end_call([input_index])
+    except BaseException as e:
+        send_error(connection, [input_index], e)
+    else:
+        send_response(connection, b"s", [], input_index)
+
+
+def new_executor(loaded_function, func_concurrency):
+    """What runs the job's calls off the main thread, or None to run them on
+    it one at a time."""
+    is_coroutine = inspect.iscoroutinefunction(loaded_function)
+    is_async = is_coroutine or inspect.isasyncgenfunction(loaded_function)
+    if func_concurrency == 1 and not is_async:
+        return None
+    if not isinstance(sys.stdout, TaggedOutput):
+        sys.stdout = TaggedOutput(sys.stdout)
+        sys.stderr = TaggedOutput(sys.stderr)
+    if is_async:
+        return CoroutineRunner(func_concurrency)
+    return ThreadPoolExecutor(func_concurrency, thread_name_prefix="burla-call")
+
+
+def call_batch(connection, loaded_function, batch_size, executor, request_payload):
+    # One response per input, sent the moment it finishes, so the node can
+    # hand results on (and top the batch back up) while the rest still run.
+    # With an executor (see `new_executor`) calls run on it and this returns
+    # right away, so the next `b` command queues up behind them.
+    inputs = list(batch_inputs(request_payload))
+    is_async = inspect.iscoroutinefunction(loaded_function)
+    if batch_size:
+        call = call_vectorized_async if is_async else call_vectorized
+        groups = [inputs[i : i + batch_size] for i in range(0, len(inputs), batch_size)]
+    else:
+        if inspect.isasyncgenfunction(loaded_function):
+            call = call_async_generator
+        elif inspect.isgeneratorfunction(loaded_function):
+            call = call_generator
+        else:
+            call = call_one_async if is_async else call_one
+        groups = [[input_] for input_ in inputs]
+    for group in groups:
+        if executor is None:
+            call(connection, loaded_function, group)
+        else:
+            executor.submit(call, connection, loaded_function, group)
+
+
 # Become a session + process group leader so the node_service can kill this worker together with
 # any subprocess the user's UDF spawned via a single os.killpg from the host. Runs after uv/pip
 # setup so subprocess.run above still inherits the container's original session cleanly.
 os.setsid()
 
-port = int(sys.argv[1])
-with socket.create_server(("0.0.0.0", port)) as listener:
+# In /worker_service_storage, where node_service connects to it directly.
+socket_path = sys.argv[1]
+if os.path.lexists(socket_path):
+    os.remove(socket_path)  # left by the worker_server.py this one replaces
+with socket.socket(socket.AF_UNIX) as listener:
+    listener.bind(socket_path)
+    listener.listen()
     connection, _ = listener.accept()
     with connection:
-        connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
         loaded_function = None
+        batch_size = None
+        executor = None
         local_module_names = []
         local_module_path = None
         ping = receive_exactly(connection, 1)
@@ -440,11 +862,24 @@ with socket.create_server(("0.0.0.0", port)) as listener:
             payload_size = int.from_bytes(receive_exactly(connection, 8), "big")
             request_payload = receive_exactly(connection, payload_size)
 
-            response_payload = b""
+            if command == b"b":
+                call_batch(
+                    connection, loaded_function, batch_size, executor, request_payload
+                )
+                continue
+            response_frames = []
             try:
                 if command == b"r":
                     kill_all_other_processes()
                     loaded_function = None
+                    if executor is not None:
+                        executor.shutdown()
+                        executor = None
+                    for ring in (input_ring, result_ring):
+                        if ring is not None:
+                            ring.close()
+                    input_ring = result_ring = result_sink = None
+                    retry_on = []
                     for module_name in local_module_names:
                         sys.modules.pop(module_name, None)
                     if local_module_path is not None:
@@ -457,40 +892,42 @@ with socket.create_server(("0.0.0.0", port)) as listener:
                     auth_module = sys.modules.get("burla._auth")
                     if auth_module is not None:
                         auth_module._get_auth_info.cache_clear()
+                    # Broadcast values can be GBs, don't hold the last job's.
+                    broadcast_module = sys.modules.get("burla._broadcast")
+                    if broadcast_module is not None:
+                        broadcast_module._loaded_values.clear()
                 if command == b"i":
                     # {canonical dist name: uv requirement string}, the
                     # client's entire environment, pinned exactly.
                     packages = pickle.loads(request_payload)
-                    response_payload = pickle.dumps(
-                        install_client_environment(packages)
-                    )
+                    response_frames = [
+                        pickle.dumps(install_client_environment(packages))
+                    ]
                 if command == b"l":
+                    function_settings = json.loads(request_payload)
+                    batch_size = function_settings["batch_size"]
+                    input_ring = SharedRing(function_settings["input_ring_path"])
+                    result_ring = SharedRing(function_settings["result_ring_path"])
+                    result_sink = function_settings["result_sink"]
+                    if result_sink is not None:
+                        # Resolved, so neither `..` nor a symlink can point it
+                        # outside the shared workspace.
+                        result_sink = os.path.realpath(result_sink)
+                        if not result_sink.startswith(SHARED_WORKSPACE_PATH + os.sep):
+                            raise ValueError(
+                                f"`result_sink` must be in {SHARED_WORKSPACE_PATH}"
+                            )
+                        os.makedirs(result_sink, exist_ok=True)
+                    retry_on = function_settings["retry_on"]
+                    with open(function_settings["function_path"], "rb") as file:
+                        function_payload = file.read()
                     loaded_function, local_module_names, local_module_path = (
-                        load_function_payload(request_payload)
+                        load_function_payload(function_payload)
+                    )
+                    executor = new_executor(
+                        loaded_function, function_settings["func_concurrency"]
                     )
-                if command == b"c":
-                    request = pickle.loads(request_payload)
-                    input_index = request["input_index"]
-                    argument = cloudpickle.loads(request["argument_bytes"])
-                    try:
-                        print(f"{LOG_START_MARKER_PREFIX}{input_index}", flush=True)
-                        return_value = loaded_function(argument)
-                    finally:
-                        print(f"{LOG_END_MARKER_PREFIX}{input_index}", flush=True)
-                    response_payload = cloudpickle.dumps(return_value)
             except BaseException as e:
-                tb_dict = Traceback(e.__traceback__).to_dict()
-                error_info = dict(type=type(e), exception=e, traceback_dict=tb_dict)
-                response_payload = pickle.dumps(
-                    {
-                        "error_info_pkl": pickle.dumps(error_info),
-                        "traceback_str": "".join(
-                            traceback.format_exception(type(e), e, e.__traceback__)
-                        ),
-                    }
-                )
-                status = b"e"
+                send_response(connection, b"e", error_response_frames(e))
             else:
-                status = b"s"
-            response_size = len(response_payload).to_bytes(8, "big")
-            connection.sendall(status + response_size + response_payload)
+                send_response(connection, b"s", response_frames)
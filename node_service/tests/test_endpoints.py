@@ -88,6 +88,20 @@ def test_ack_transfer_404_when_wrong_job_id(node_http_client, any_ready_node):
         client.close()
 
 
+@pytest.mark.parametrize("payload_hash", ["not-a-hash", "AB" * 32, "ab" * 31])
+def test_payloads_400_when_hash_is_not_a_sha256_hexdigest(
+    node_http_client, any_ready_node, payload_hash
+):
+    client = node_http_client(any_ready_node["instance_name"])
+    try:
+        resp = client.get(f"/payloads/{payload_hash}")
+        assert resp.status_code == 400
+        files = {"payload": b"x"}
+        resp = client.post(f"/payloads/{payload_hash}", files=files)
+        assert resp.status_code == 400
+    finally:
+        client.close()
+
 def test_shutdown_requires_cluster_token(
     node_http_client, any_ready_node, main_http_client
 ):
@@ -45,6 +45,7 @@ def test_input_steal_between_nodes(
     wait_for_fixture,
 ):
     import httpx
+    from burla._frames import dump_frames, load_frames
 
     # Stealing is only meaningful between two nodes.
     cluster_with_n_nodes(2)
@@ -124,7 +125,7 @@ def test_input_steal_between_nodes(
                     params={"transfer_id": transfer_id, "requester_queue_size": 0},
                 )
                 assert response.status_code == 200, response.text
-                items = pickle.loads(response.content)
+                items = load_frames(response.content)["inputs"]
                 assert isinstance(items, list)
                 if items:
                     url_a, url_b = donor_url, receiver_url
@@ -138,19 +139,22 @@ def test_input_steal_between_nodes(
                 break
             time.sleep(0.5)
         assert items, "neither node retained queued inputs long enough to test stealing"
+        # Donors report what they have left, which stealers pick victims by.
+        assert int(response.headers["X-Burla-Queue-Depth"]) >= 0
 
         # 2. Idempotency: same transfer_id returns same batch.
         resp_a2 = node_client.get(
             f"{url_a}/jobs/{job_id}/get_inputs",
             params={"transfer_id": transfer_id, "requester_queue_size": 0},
         )
-        items2 = pickle.loads(resp_a2.content)
+        items2 = load_frames(resp_a2.content)["inputs"]
         assert (
             items == items2
         ), "get_inputs with the same transfer_id must be idempotent"
 
         # 3. Hand-carry to B via POST /jobs/{id}/inputs.
-        payload = pickle.dumps(items)
+        chunk = [(index, pickle.PickleBuffer(pkl)) for index, pkl in items]
+        payload = b"".join(dump_frames(chunk))
         resp_b = node_client.post(
             f"{url_b}/jobs/{job_id}/inputs",
             files={"inputs_pkl_with_idx": ("inputs", payload)},
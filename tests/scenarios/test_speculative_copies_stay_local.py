@@ -0,0 +1,124 @@
+"""
+Scenario: speculative copies across three nodes.
+
+Stragglers get copied to idle nodes, and idle nodes also steal from each
+other. A copy stolen on to a third node would be run and counted there
+without the first-result bookkeeping that keeps its input from being counted
+twice. Here a third node keeps trying to steal while copies are queued: none
+of the straggling inputs may come back from get_inputs, and the head's result
+counters must add up to exactly one per input.
+"""
+
+from __future__ import annotations
+
+import ssl
+import threading
+import time
+from uuid import uuid4
+
+import pytest
+
+pytestmark = [pytest.mark.e2e, pytest.mark.slow]
+
+N_INPUTS = 30
+STRAGGLING_INPUTS = {0, 1, 2}
+
+
+def _local_url(host: str) -> str:
+    # See test_input_steal_semantics.py.
+    if "node_" not in host:
+        return host
+    return f"http://localhost:{host.rsplit(':', 1)[-1]}"
+
+
+@pytest.mark.timeout(600)
+def test_speculative_copies_are_not_stolen(
+    rpm_subprocess,
+    local_dev_cluster,
+    cluster_with_n_nodes,
+    main_http_client,
+    burla_auth_headers,
+    wait_for_fixture,
+):
+    import httpx
+    from burla._frames import load_frames
+
+    cluster_with_n_nodes(3)
+    state = main_http_client.get("/v1/cluster/state").json()
+
+    # Each straggling input's first call hangs, so only a copy can finish it.
+    marker_dir = f"/workspace/shared/burla-tests/speculative-{uuid4().hex[:8]}"
+    source = (
+        "import os, time\n"
+        "def test_function(i):\n"
+        f"    os.makedirs('{marker_dir}', exist_ok=True)\n"
+        f"    marker = '{marker_dir}/' + str(i)\n"
+        f"    if i in {sorted(STRAGGLING_INPUTS)} and not os.path.exists(marker):\n"
+        "        open(marker, 'w').close()\n"
+        "        time.sleep(600)\n"
+        "    return i\n"
+    )
+    result_box: dict = {}
+
+    def _run():
+        result_box["result"] = rpm_subprocess(
+            source, list(range(N_INPUTS)), timeout_seconds=300, speculative=True
+        )
+
+    rpm_thread = threading.Thread(target=_run, daemon=True)
+    rpm_thread.start()
+
+    def _running_nodes():
+        nodes = main_http_client.get("/v1/cluster/nodes").json()["nodes"]
+        running = [n for n in nodes if n.get("status") == "RUNNING" and n.get("current_job")]
+        return running if running else None
+
+    nodes = wait_for_fixture(_running_nodes, timeout=60)
+    job_id = nodes[0]["current_job"]
+    urls = [_local_url(node["host"]) for node in nodes]
+    verify = (
+        ssl.create_default_context(cadata=state["cluster_ca"])
+        if urls[0].startswith("https://")
+        else True
+    )
+
+    # Only once every other input is done: before that a straggling input may
+    # still be queued as an ordinary input, which is fair game for a stealer.
+    def _only_stragglers_left():
+        stats = main_http_client.get(f"/v1/jobs/{job_id}/result-stats").json()
+        return stats["n_results"] >= N_INPUTS - len(STRAGGLING_INPUTS) or None
+
+    wait_for_fixture(_only_stragglers_left, timeout=120)
+    stolen_stragglers = set()
+    with httpx.Client(headers=burla_auth_headers, timeout=10, verify=verify) as client:
+        attempt = 0
+        while rpm_thread.is_alive():
+            for url in urls:
+                transfer_id = f"test-speculative-steal-{attempt}"
+                attempt += 1
+                response = client.get(
+                    f"{url}/jobs/{job_id}/get_inputs",
+                    params={"transfer_id": transfer_id, "requester_queue_size": 0},
+                )
+                if response.status_code != 200:
+                    continue
+                inputs = load_frames(response.content)["inputs"]
+                stolen_stragglers.update(
+                    index for index, _ in inputs if index in STRAGGLING_INPUTS
+                )
+                # Not received: the donor puts them back.
+                client.post(
+                    f"{url}/jobs/{job_id}/ack_transfer",
+                    params={"transfer_id": transfer_id, "received": "false"},
+                )
+            time.sleep(0.2)
+    rpm_thread.join()
+
+    result = result_box["result"]
+    assert result["ok"], result.get("traceback")
+    assert sorted(result["outputs"]) == list(range(N_INPUTS))
+    assert not stolen_stragglers, f"copies handed to a third node: {stolen_stragglers}"
+    stats = main_http_client.get(f"/v1/jobs/{job_id}/result-stats").json()
+    assert stats["n_results"] == N_INPUTS, (
+        f"n_results {stats['n_results']} != n_inputs {N_INPUTS}"
+    )
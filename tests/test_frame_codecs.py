@@ -0,0 +1,41 @@
+"""
+The client's burla/_frames.py is the only frame codec: node_service imports it
+through a symlink and worker containers get it mounted. Frames must survive a
+roundtrip with their out-of-band buffers, and truncated ones must be rejected.
+
+Loaded by path, so neither the client's nor node_service's dependencies are
+needed. No cluster needed.
+"""
+
+from __future__ import annotations
+
+import importlib.util
+import pickle
+from pathlib import Path
+
+import pytest
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+FRAMES_PATH = REPO_ROOT / "client/src/burla/_frames.py"
+_spec = importlib.util.spec_from_file_location("burla_frames", FRAMES_PATH)
+frames = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(frames)
+
+
+def test_node_service_uses_the_client_codec():
+    node_service_frames = REPO_ROOT / "node_service/src/node_service/_frames.py"
+    assert node_service_frames.resolve() == FRAMES_PATH
+
+
+def test_frames_roundtrip():
+    obj = {"small": 1, "large": pickle.PickleBuffer(bytearray(range(256)) * 64)}
+    loaded = frames.load_frames(b"".join(frames.dump_frames(obj)))
+    assert loaded["small"] == 1
+    assert bytes(loaded["large"]) == bytes(range(256)) * 64
+
+
+def test_truncated_frames_raise():
+    obj = pickle.PickleBuffer(bytearray(4096))
+    data = b"".join(frames.dump_frames(obj))
+    with pytest.raises(pickle.UnpicklingError, match="truncated"):
+        frames.load_frames(data[:-1])
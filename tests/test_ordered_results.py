@@ -0,0 +1,64 @@
+"""
+With `ordered=True` the client holds finished results in OrderedResults until
+every earlier input's result is in, and only uploads inputs inside its window.
+Results are fed in out of order here, so the release order doesn't depend on
+how long any call took.
+
+Loaded by path, so the client's dependencies aren't needed. No cluster needed.
+"""
+
+from __future__ import annotations
+
+import importlib.util
+from pathlib import Path
+from queue import Queue
+
+RESULTS_PATH = Path(__file__).resolve().parent.parent / "client/src/burla/_results.py"
+_spec = importlib.util.spec_from_file_location("burla_results", RESULTS_PATH)
+results = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(results)
+
+
+def _drain(queue: Queue) -> list:
+    return [queue.get_nowait() for _ in range(queue.qsize())]
+
+
+def test_results_wait_for_earlier_inputs():
+    queue = Queue()
+    ordered = results.OrderedResults(queue, window=10)
+    for input_index in [3, 1, 2]:
+        ordered.put(input_index, f"result-{input_index}")
+    assert _drain(queue) == []
+    ordered.put(0, "result-0")
+    assert _drain(queue) == ["result-0", "result-1", "result-2", "result-3"]
+    ordered.put(5, "result-5")
+    ordered.put(4, "result-4")
+    assert _drain(queue) == ["result-4", "result-5"]
+
+
+def test_window_follows_the_oldest_missing_result():
+    ordered = results.OrderedResults(Queue(), window=4)
+    assert ordered.accepts(3)
+    assert not ordered.accepts(4)
+    for input_index in [1, 2, 3]:
+        ordered.put(input_index, input_index)
+    # Input 0 is still holding them up, so the window hasn't moved.
+    assert not ordered.accepts(4)
+    ordered.put(0, 0)
+    assert ordered.accepts(7)
+    assert not ordered.accepts(8)
+
+
+def test_generator_items_are_released_in_input_order():
+    queue = Queue()
+    ordered = results.OrderedResults(queue, window=10)
+    ordered.put_item(1, "1a")
+    ordered.put_item(0, "0a")
+    ordered.put_item(2, "2a")
+    ordered.put_item(1, "1b")
+    assert _drain(queue) == ["0a"]
+    ordered.put(0, results.NO_RESULT)
+    assert _drain(queue) == ["1a", "1b"]
+    ordered.put(2, results.NO_RESULT)
+    ordered.put(1, results.NO_RESULT)
+    assert _drain(queue) == ["2a"]
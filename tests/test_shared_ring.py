@@ -0,0 +1,55 @@
+"""
+node_service/shared_ring.py is the one SharedRing both node_service and the
+worker use (it's mounted into worker containers), so a payload put in at one
+end must come out whole at the other, including across the ring's end.
+
+Loaded by path, since importing node_service runs its startup code. No
+cluster needed.
+"""
+
+from __future__ import annotations
+
+import importlib.util
+from pathlib import Path
+
+SHARED_RING_PATH = (
+    Path(__file__).resolve().parent.parent
+    / "node_service/src/node_service/shared_ring.py"
+)
+_spec = importlib.util.spec_from_file_location("burla_shared_ring", SHARED_RING_PATH)
+shared_ring = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(shared_ring)
+
+
+def test_payloads_cross_between_ends(tmp_path):
+    path = str(tmp_path / "ring")
+    sender = shared_ring.SharedRing(path, create=True)
+    receiver = shared_ring.SharedRing(path)
+    try:
+        # Over a third of the ring each, so positions wrap around its end.
+        size = shared_ring.SHARED_RING_BYTES // 3 + 7
+        for i in range(8):
+            frames = [bytes([i]) * 5, bytes([i + 1]) * (size - 5)]
+            position = sender.put(frames, size)
+            assert position is not None
+            assert receiver.take(position, size) == b"".join(frames)
+    finally:
+        receiver.close()
+        sender.delete()
+    assert not Path(path).exists()
+
+
+def test_put_refuses_what_the_receiver_has_not_read(tmp_path):
+    path = str(tmp_path / "ring")
+    sender = shared_ring.SharedRing(path, create=True)
+    receiver = shared_ring.SharedRing(path)
+    try:
+        size = shared_ring.SHARED_RING_BYTES // 2
+        first = sender.put([b"a" * size], size)
+        assert sender.put([b"b" * size], size) is not None
+        assert sender.put([b"c" * size], size) is None
+        receiver.take(first, size)
+        assert sender.put([b"c" * size], size) is not None
+    finally:
+        receiver.close()
+        sender.delete()
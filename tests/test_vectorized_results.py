@@ -0,0 +1,60 @@
+"""
+A vectorized (`batch_size`) call returns one value for the whole batch, which
+worker_server.py splits into each input's result by position. DataFrames are
+the case to get right: indexing one gives its columns, not its rows.
+
+The function is lifted out of worker_server.py by source, since importing it
+runs its startup code. No cluster needed.
+"""
+
+from __future__ import annotations
+
+import ast
+from pathlib import Path
+
+import pytest
+
+WORKER_SERVER_PATH = (
+    Path(__file__).resolve().parent.parent
+    / "node_service/src/node_service/worker_server.py"
+)
+
+
+def _load_split():
+    tree = ast.parse(WORKER_SERVER_PATH.read_text())
+    functions = [
+        node
+        for node in tree.body
+        if isinstance(node, ast.FunctionDef)
+        and node.name == "split_vectorized_return_value"
+    ]
+    namespace = {}
+    module = ast.Module(functions, type_ignores=[])
+    exec(compile(module, str(WORKER_SERVER_PATH), "exec"), namespace)
+    return namespace["split_vectorized_return_value"]
+
+
+split_vectorized_return_value = _load_split()
+
+
+def test_list_is_split_per_input():
+    assert split_vectorized_return_value(["a", "b", "c"], 3) == ["a", "b", "c"]
+
+
+def test_dataframe_is_split_into_rows():
+    pandas = pytest.importorskip("pandas")
+    frame = pandas.DataFrame({"x": [1, 2, 3], "y": ["a", "b", "c"]}, index=[10, 20, 30])
+    rows = split_vectorized_return_value(frame, 3)
+    assert [row["x"] for row in rows] == [1, 2, 3]
+    assert [row["y"] for row in rows] == ["a", "b", "c"]
+
+
+def test_series_is_split_by_position():
+    pandas = pytest.importorskip("pandas")
+    series = pandas.Series([1.5, 2.5], index=["p", "q"])
+    assert split_vectorized_return_value(series, 2) == [1.5, 2.5]
+
+
+def test_wrong_length_raises():
+    with pytest.raises(ValueError, match="returned 2 results for a batch of 3"):
+        split_vectorized_return_value([1, 2], 3)